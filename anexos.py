@@ -0,0 +1,98 @@
+import os
+import re
+import uuid
+import base64
+from email.utils import getaddresses, parseaddr
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# Bytes do arquivo lidos por vez: múltiplo de 57, para que cada bloco vire
+# linhas completas de 76 caracteres em base64
+TAMANHO_BLOCO = 57 * 1024
+
+# Folga por anexo para os cabeçalhos da parte MIME (tipo, nome do arquivo, separador)
+CABECALHO_ANEXO = 512
+
+def tamanho_base64(tamanho):
+    """Tamanho em bytes do conteúdo codificado em base64, com linhas de 76 caracteres e CRLF"""
+    linhas = -(-tamanho // 57)
+    return 4 * -(-tamanho // 3) + 2 * linhas
+
+def tamanho_anexo(caminho):
+    """Estimativa do que um arquivo ocupa como anexo de uma mensagem"""
+    return tamanho_base64(os.path.getsize(caminho)) + CABECALHO_ANEXO
+
+class MensagemAnexos:
+    """Mensagem de email com anexos codificados a partir do disco durante o envio
+
+    Cabeçalhos e corpo são montados com o pacote email, mas cada anexo entra na
+    estrutura apenas como um marcador; blocos() percorre a mensagem substituindo
+    os marcadores pelo arquivo codificado em base64, um bloco por vez. Assim a
+    memória usada no envio não depende do tamanho dos anexos e tamanho() é
+    conhecido antes de qualquer leitura dos arquivos.
+    """
+
+    def __init__(self, remetente, para, assunto, corpo, anexos=(), cc=None):
+        self.anexos = list(anexos)
+
+        self.estrutura = MIMEMultipart()
+        self.estrutura['From'] = remetente
+        self.estrutura['To'] = para
+        if cc:
+            self.estrutura['Cc'] = cc
+        self.estrutura['Subject'] = assunto
+        self.estrutura.attach(MIMEText(corpo, 'plain'))
+
+        marcadores = []
+        for caminho in self.anexos:
+            parte = MIMEBase('application', 'pdf')
+            parte['Content-Transfer-Encoding'] = 'base64'
+            parte.add_header('Content-Disposition', 'attachment', filename=os.path.basename(caminho))
+            marcador = f"ANEXO{uuid.uuid4().hex}"
+            parte.set_payload(marcador)
+            self.estrutura.attach(parte)
+            marcadores.append(marcador)
+
+        # Mensagem serializada (CRLF, como no envio SMTP) sem o conteúdo dos anexos
+        esqueleto = self.estrutura.as_bytes(policy=self.estrutura.policy.clone(linesep='\r\n'))
+        if marcadores:
+            self.trechos = re.split('|'.join(marcadores).encode('ascii'), esqueleto)
+        else:
+            self.trechos = [esqueleto]
+
+    def __getitem__(self, nome):
+        return self.estrutura[nome]
+
+    def remetente(self):
+        """Endereço do remetente no envelope SMTP"""
+        return parseaddr(self.estrutura['From'])[1]
+
+    def destinatarios(self):
+        """Endereços de To e Cc"""
+        cabecalhos = self.estrutura.get_all('To', []) + self.estrutura.get_all('Cc', [])
+        return [endereco for _, endereco in getaddresses(cabecalhos)]
+
+    def tamanho(self):
+        """Tamanho exato da mensagem serializada, calculado pelo tamanho dos arquivos"""
+        return (sum(len(trecho) for trecho in self.trechos)
+                + sum(tamanho_base64(os.path.getsize(caminho)) for caminho in self.anexos))
+
+    def blocos(self, tamanho_bloco=TAMANHO_BLOCO):
+        """Gera a mensagem serializada em blocos de bytes, lendo os anexos aos poucos
+
+        Todo bloco começa no início de uma linha.
+        """
+        yield self.trechos[0]
+        for caminho, trecho in zip(self.anexos, self.trechos[1:]):
+            with open(caminho, 'rb') as f:
+                while True:
+                    bloco = f.read(tamanho_bloco)
+                    if not bloco:
+                        break
+                    yield base64.encodebytes(bloco).replace(b'\n', b'\r\n')
+            yield trecho
+
+    def as_bytes(self):
+        """Mensagem completa em memória (apenas para mensagens pequenas e testes)"""
+        return b''.join(self.blocos())
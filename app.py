@@ -1,9 +1,16 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import sqlite3
 import os
 import datetime
 import json
 import re
+import io
+import database
+import paginacao
+import numeracao
+import cadastros
+import importacao
+from consulta_historica import ORDEM_RELEVANCIA, termo_para_fts
 
 app = Flask(__name__)
 
@@ -14,38 +21,13 @@ def init_db():
     """Inicializa o banco de dados com o schema definido"""
     if not os.path.exists(DB_PATH):
         conn = sqlite3.connect(DB_PATH)
-        with open('schema.sql', 'r') as f:
-            conn.executescript(f.read())
+        database.aplicar_schemas(conn)
         conn.close()
         print("Banco de dados inicializado com sucesso!")
 
 def get_db_connection():
-    """Cria uma conexão com o banco de dados"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def gerar_id_chamado():
-    """Gera um ID único para o chamado no formato RAC+número sequencial"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Obtém o último ID de chamado
-    cursor.execute("SELECT MAX(id_chamado) FROM chamado")
-    result = cursor.fetchone()[0]
-    
-    conn.close()
-    
-    # Se não houver chamados, começa do 1
-    if result is None:
-        return "RAC0001"
-    
-    # Extrai o número do último RAC e incrementa
-    ultimo_numero = int(result.replace("RAC", ""))
-    novo_numero = ultimo_numero + 1
-    
-    # Formata o novo ID com zeros à esquerda
-    return f"RAC{novo_numero:04d}"
+    """Obtém a conexão compartilhada da thread (usar com `with`)"""
+    return database.get_db_connection(DB_PATH)
 
 # Rotas da API para o sistema de chamados
 
@@ -54,66 +36,42 @@ def iniciar_chamado():
     """Inicia um novo chamado com as informações básicas"""
     data = request.json
     
-    # Verifica se o cliente já existe
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT id_cliente FROM cliente WHERE nome = ?", (data['cliente'],))
-    cliente = cursor.fetchone()
-    
-    # Se o cliente não existir, cria um novo
-    if cliente is None:
-        cursor.execute("""
-            INSERT INTO cliente (nome, contato, telefone, email)
-            VALUES (?, ?, ?, ?)
-        """, (data['cliente'], data['solicitante'], data.get('telefone', ''), data.get('email', '')))
-        id_cliente = cursor.lastrowid
-    else:
-        id_cliente = cliente[0]
-    
-    # Busca o ID do plantonista
-    cursor.execute("SELECT id_plantonista FROM plantonista WHERE nome = ?", (data['plantonista'],))
-    plantonista = cursor.fetchone()
-    
-    # Se o plantonista não existir, cria um novo
-    if plantonista is None:
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Ids de cliente, plantonista e categoria pelo cache de cadastros
+        # (clientes e plantonistas novos são criados na mesma transação)
+        cache = cadastros.obter_cache(DB_PATH)
+        id_cliente = cache.id_cliente(conn, data['cliente'], contato=data['solicitante'],
+                                      telefone=data.get('telefone', ''), email=data.get('email', ''))
+        id_plantonista = cache.id_plantonista(conn, data['plantonista'],
+                                              email=data.get('email_plantonista', ''),
+                                              telefone=data.get('telefone_plantonista', ''))
+        id_categoria = cache.id_categoria(conn, data['categoria']) or 1  # Usa categoria padrão se não encontrar
+        
+        # Reserva o número do RAC na mesma transação do INSERT
+        numero_rac = numeracao.proximo_numero_rac(conn)
+        
+        # Cria o novo chamado
         cursor.execute("""
-            INSERT INTO plantonista (nome, email, telefone)
-            VALUES (?, ?, ?)
-        """, (data['plantonista'], data.get('email_plantonista', ''), data.get('telefone_plantonista', '')))
-        id_plantonista = cursor.lastrowid
-    else:
-        id_plantonista = plantonista[0]
-    
-    # Busca o ID da categoria
-    cursor.execute("SELECT id_categoria FROM categoria WHERE nome = ?", (data['categoria'],))
-    categoria = cursor.fetchone()
-    id_categoria = categoria[0] if categoria else 1  # Usa categoria padrão se não encontrar
-    
-    # Gera o ID do chamado
-    id_chamado = gerar_id_chamado()
-    
-    # Cria o novo chamado
-    cursor.execute("""
-        INSERT INTO chamado (
-            id_chamado, id_cliente, id_plantonista, id_categoria,
-            tipo, prioridade, descricao, status
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        id_chamado, id_cliente, id_plantonista, id_categoria,
-        data.get('tipo', 'Suporte Técnico'), 
-        data.get('prioridade', 'Média'),
-        data['motivo'],
-        'Aberto'
-    ))
-    
-    conn.commit()
-    conn.close()
+            INSERT INTO chamado (
+                numero_rac, id_cliente, id_plantonista, id_categoria,
+                tipo, prioridade, descricao, status
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            numero_rac, id_cliente, id_plantonista, id_categoria,
+            data.get('tipo', 'Suporte Técnico'),
+            data.get('prioridade', 'Média'),
+            data['motivo'],
+            'Aberto'
+        ))
+        id_chamado = cursor.lastrowid
     
     return jsonify({
         'status': 'success',
         'message': 'Chamado iniciado com sucesso',
-        'id_chamado': id_chamado
+        'id_chamado': id_chamado,
+        'numero_rac': numero_rac
     })
 
 @app.route('/api/chamado/<id_chamado>/atualizar', methods=['POST'])
@@ -121,12 +79,9 @@ def atualizar_chamado(id_chamado):
     """Atualiza as informações de um chamado existente"""
     data = request.json
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     # Campos que podem ser atualizados
     campos_atualizaveis = [
-        'ambiente', 'tempo_ocorrencia', 'analise', 
+        'ambiente', 'tempo_ocorrencia', 'analise',
         'procedimentos', 'solucao', 'status',
         'observacoes', 'recomendacoes'
     ]
@@ -149,23 +104,21 @@ def atualizar_chamado(id_chamado):
     # Adiciona o ID do chamado aos valores
     valores.append(id_chamado)
     
-    # Executa a atualização
-    cursor.execute(f"""
-        UPDATE chamado
-        SET {', '.join(campos)}
-        WHERE id_chamado = ?
-    """, valores)
-    
-    # Se o status for alterado para 'Resolvido', atualiza a data de fechamento
-    if 'status' in data and data['status'] == 'Resolvido':
-        cursor.execute("""
+    with get_db_connection() as conn:
+        # Executa a atualização
+        conn.execute(f"""
             UPDATE chamado
-            SET data_fechamento = CURRENT_TIMESTAMP
-            WHERE id_chamado = ? AND data_fechamento IS NULL
-        """, (id_chamado,))
-    
-    conn.commit()
-    conn.close()
+            SET {', '.join(campos)}
+            WHERE id_chamado = ?
+        """, valores)
+        
+        # Se o status for alterado para 'Resolvido', atualiza a data de fechamento
+        if 'status' in data and data['status'] == 'Resolvido':
+            conn.execute("""
+                UPDATE chamado
+                SET data_fechamento = CURRENT_TIMESTAMP
+                WHERE id_chamado = ? AND data_fechamento IS NULL
+            """, (id_chamado,))
     
     return jsonify({
         'status': 'success',
@@ -175,29 +128,24 @@ def atualizar_chamado(id_chamado):
 @app.route('/api/chamado/<id_chamado>', methods=['GET'])
 def obter_chamado(id_chamado):
     """Obtém os detalhes de um chamado específico"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Consulta que une as tabelas para obter todas as informações do chamado
-    cursor.execute("""
-        SELECT 
-            c.id_chamado, c.data_hora, c.tipo, c.prioridade, 
-            c.descricao, c.ambiente, c.tempo_ocorrencia,
-            c.analise, c.procedimentos, c.solucao, c.status,
-            c.tempo_atendimento, c.observacoes, c.recomendacoes,
-            c.data_fechamento,
-            cl.nome as cliente, cl.cnpj_cpf, cl.contato, cl.telefone, cl.email,
-            p.nome as plantonista,
-            cat.nome as categoria
-        FROM chamado c
-        JOIN cliente cl ON c.id_cliente = cl.id_cliente
-        JOIN plantonista p ON c.id_plantonista = p.id_plantonista
-        JOIN categoria cat ON c.id_categoria = cat.id_categoria
-        WHERE c.id_chamado = ?
-    """, (id_chamado,))
-    
-    chamado = cursor.fetchone()
-    conn.close()
+    with get_db_connection() as conn:
+        # Consulta que une as tabelas para obter todas as informações do chamado
+        chamado = conn.execute("""
+            SELECT
+                c.id_chamado, c.numero_rac, c.data_hora, c.tipo, c.prioridade,
+                c.descricao, c.ambiente, c.tempo_ocorrencia,
+                c.analise, c.procedimentos, c.solucao, c.status,
+                c.tempo_atendimento, c.observacoes, c.recomendacoes,
+                c.data_fechamento,
+                cl.nome as cliente, cl.cnpj_cpf, cl.contato, cl.telefone, cl.email,
+                p.nome as plantonista,
+                cat.nome as categoria
+            FROM chamado c
+            JOIN cliente cl ON c.id_cliente = cl.id_cliente
+            JOIN plantonista p ON c.id_plantonista = p.id_plantonista
+            JOIN categoria cat ON c.id_categoria = cat.id_categoria
+            WHERE c.id_chamado = ?
+        """, (id_chamado,)).fetchone()
     
     if chamado is None:
         return jsonify({
@@ -215,62 +163,85 @@ def obter_chamado(id_chamado):
 
 @app.route('/api/chamados', methods=['GET'])
 def listar_chamados():
-    """Lista todos os chamados com filtros opcionais"""
-    # Parâmetros de filtro
-    cliente = request.args.get('cliente')
-    status = request.args.get('status')
-    data_inicio = request.args.get('data_inicio')
-    data_fim = request.args.get('data_fim')
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Constrói a query com filtros
-    query = """
-        SELECT 
-            c.id_chamado, c.data_hora, c.status,
-            cl.nome as cliente, 
-            p.nome as plantonista,
-            c.descricao
-        FROM chamado c
-        JOIN cliente cl ON c.id_cliente = cl.id_cliente
-        JOIN plantonista p ON c.id_plantonista = p.id_plantonista
+    """Lista os chamados com filtros opcionais, paginados por cursor
+
+    Parâmetros de paginação: `limit` (padrão 50) e `after` (valor de `proximo`
+    da página anterior). Com `stream=1` todos os registros são enviados em uma
+    única resposta, escrita à medida que saem do cursor.
     """
+    try:
+        limite, cursor, streaming = paginacao.ler_parametros(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     
-    filtros = []
-    parametros = []
-    
-    if cliente:
-        filtros.append("cl.nome LIKE ?")
-        parametros.append(f"%{cliente}%")
-    
-    if status:
-        filtros.append("c.status = ?")
-        parametros.append(status)
+    query, parametros = paginacao.montar_consulta_chamados(request.args, cursor)
     
-    if data_inicio:
-        filtros.append("date(c.data_hora) >= date(?)")
-        parametros.append(data_inicio)
+    if streaming:
+        if limite:
+            query += " LIMIT ?"
+            parametros.append(limite)
+        
+        def gerar():
+            with get_db_connection() as conn:
+                linhas = conn.execute(query, parametros)
+                yield from paginacao.gerar_json({'status': 'success'}, 'chamados', linhas)
+        
+        return Response(gerar(), mimetype='application/json')
     
-    if data_fim:
-        filtros.append("date(c.data_hora) <= date(?)")
-        parametros.append(data_fim)
+    # Busca um registro a mais para saber se existe próxima página
+    limite = limite or paginacao.LIMITE_PADRAO
+    query += " LIMIT ?"
+    parametros.append(limite + 1)
     
-    if filtros:
-        query += " WHERE " + " AND ".join(filtros)
+    with get_db_connection() as conn:
+        chamados = conn.execute(query, parametros).fetchall()
     
-    query += " ORDER BY c.data_hora DESC"
+    chamados_list, proximo = paginacao.montar_pagina(chamados, limite)
     
-    cursor.execute(query, parametros)
-    chamados = cursor.fetchall()
-    conn.close()
+    return jsonify({
+        'status': 'success',
+        'chamados': chamados_list,
+        'proximo': proximo
+    })
+
+@app.route('/api/chamados/importar', methods=['POST'])
+def importar_chamados():
+    """Importa chamados históricos em massa a partir do corpo da requisição
+
+    O corpo é lido em fluxo, em CSV (`formato=csv` ou Content-Type text/csv)
+    ou JSON Lines (padrão), e gravado em lotes pequenos com os triggers e
+    índices ativos (o site e o bot continuam gravando durante a carga).
+    Retorna os totais, a vazão (linhas/s) e as primeiras linhas rejeitadas
+    com o motivo.
+    """
+    formato = request.args.get('formato') or ('csv' if request.mimetype == 'text/csv' else 'jsonl')
+    if formato not in ('csv', 'jsonl'):
+        return jsonify({
+            'status': 'error',
+            'message': f'Formato de importação não suportado: {formato}'
+        }), 400
     
-    # Converte a lista de objetos Row para lista de dicionários
-    chamados_list = [dict(chamado) for chamado in chamados]
+    arquivo = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    importador = importacao.ImportadorChamados(DB_PATH, tamanho_lote=importacao.TAMANHO_LOTE_CONCORRENTE)
+    try:
+        resultado = importador.importar(importacao.ler_registros(arquivo, formato))
+    except (ValueError, sqlite3.Error) as e:
+        # Os lotes gravados antes da falha permanecem
+        return jsonify({
+            'status': 'error',
+            'message': f'Falha na importação: {e}'
+        }), 500
     
     return jsonify({
         'status': 'success',
-        'chamados': chamados_list
+        'importados': resultado['importados'],
+        'total_rejeitados': len(resultado['rejeitados']),
+        'rejeitados': resultado['rejeitados'][:100],
+        'segundos': resultado['segundos'],
+        'linhas_por_segundo': resultado['linhas_por_segundo']
     })
 
 @app.route('/api/busca', methods=['GET'])
@@ -284,32 +255,29 @@ def buscar_chamados():
             'message': 'Termo de busca não fornecido'
         }), 400
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Busca em vários campos relevantes
-    cursor.execute("""
-        SELECT 
-            c.id_chamado, c.data_hora, c.status,
-            cl.nome as cliente, 
-            p.nome as plantonista,
-            c.descricao, c.solucao
-        FROM chamado c
-        JOIN cliente cl ON c.id_cliente = cl.id_cliente
-        JOIN plantonista p ON c.id_plantonista = p.id_plantonista
-        WHERE 
-            c.descricao LIKE ? OR
-            c.ambiente LIKE ? OR
-            c.analise LIKE ? OR
-            c.procedimentos LIKE ? OR
-            c.solucao LIKE ? OR
-            c.observacoes LIKE ? OR
-            c.recomendacoes LIKE ?
-        ORDER BY c.data_hora DESC
-    """, tuple([f"%{termo}%"] * 7))
-    
-    resultados = cursor.fetchall()
-    conn.close()
+    expressao = termo_para_fts(termo)
+    if not expressao:
+        return jsonify({
+            'status': 'success',
+            'resultados': []
+        })
+    
+    with get_db_connection() as conn:
+        # Busca no índice textual, ordenando pela relevância (bm25)
+        resultados = conn.execute(f"""
+            SELECT
+                c.id_chamado, c.numero_rac, c.data_hora, c.status,
+                cl.nome as cliente,
+                p.nome as plantonista,
+                c.descricao, c.solucao,
+                snippet(chamado_fts, -1, '<mark>', '</mark>', '...', 12) as trecho
+            FROM chamado_fts
+            JOIN chamado c ON c.id_chamado = chamado_fts.rowid
+            JOIN cliente cl ON c.id_cliente = cl.id_cliente
+            JOIN plantonista p ON c.id_plantonista = p.id_plantonista
+            WHERE chamado_fts MATCH ?
+            ORDER BY {ORDEM_RELEVANCIA}
+        """, (expressao,)).fetchall()
     
     # Converte a lista de objetos Row para lista de dicionários
     resultados_list = [dict(resultado) for resultado in resultados]
@@ -1,7 +1,11 @@
 import os
-from flask import Flask, request, jsonify, render_template, send_file
+from flask import Flask, Response, request, jsonify, render_template
 import sqlite3
-import pandas as pd
+import database
+import paginacao
+import estatisticas_projeto
+import exportacao
+import cadastros
 from datetime import datetime
 
 app = Flask(__name__)
@@ -12,10 +16,8 @@ app.template_folder = 'templates'
 DB_PATH = 'chamados.db'
 
 def get_db_connection():
-    """Cria uma conexão com o banco de dados"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Obtém a conexão compartilhada da thread (usar com `with`)"""
+    return database.get_db_connection(DB_PATH)
 
 # Rota principal
 @app.route('/')
@@ -31,9 +33,8 @@ def projetos_page():
 @app.route('/api/projetos', methods=['GET'])
 def listar_projetos():
     """Lista todos os projetos cadastrados"""
-    conn = get_db_connection()
-    projetos = conn.execute('SELECT * FROM projeto ORDER BY sigla').fetchall()
-    conn.close()
+    with get_db_connection() as conn:
+        projetos = conn.execute('SELECT * FROM projeto ORDER BY sigla').fetchall()
     
     # Converter para lista de dicionários
     projetos_list = [dict(projeto) for projeto in projetos]
@@ -57,28 +58,22 @@ def criar_projeto():
                 'message': f'Campo obrigatório não fornecido: {field}'
             }), 400
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute("""
-            INSERT INTO projeto (sigla, nome, descricao, gerente, email_gerente, telefone_gerente)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            data['sigla'],
-            data['nome'],
-            data.get('descricao', ''),
-            data['gerente'],
-            data.get('email_gerente', ''),
-            data.get('telefone_gerente', '')
-        ))
-        
-        conn.commit()
-        
-        # Retorna o ID do projeto criado
-        projeto_id = cursor.lastrowid
-        
-        conn.close()
+        with get_db_connection() as conn:
+            cursor = conn.execute("""
+                INSERT INTO projeto (sigla, nome, descricao, gerente, email_gerente, telefone_gerente)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                data['sigla'],
+                data['nome'],
+                data.get('descricao', ''),
+                data['gerente'],
+                data.get('email_gerente', ''),
+                data.get('telefone_gerente', '')
+            ))
+            
+            # Retorna o ID do projeto criado
+            projeto_id = cursor.lastrowid
         
         return jsonify({
             'status': 'success',
@@ -87,7 +82,6 @@ def criar_projeto():
         })
         
     except sqlite3.IntegrityError:
-        conn.close()
         return jsonify({
             'status': 'error',
             'message': 'Já existe um projeto com esta sigla'
@@ -95,38 +89,72 @@ def criar_projeto():
 
 @app.route('/api/projetos/<int:id_projeto>', methods=['GET'])
 def obter_projeto(id_projeto):
-    """Obtém detalhes de um projeto específico"""
-    conn = get_db_connection()
-    projeto = conn.execute('SELECT * FROM projeto WHERE id_projeto = ?', (id_projeto,)).fetchone()
+    """Obtém detalhes de um projeto específico e seus chamados (paginados por cursor)"""
+    try:
+        limite, cursor, streaming = paginacao.ler_parametros(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    with get_db_connection() as conn:
+        projeto = conn.execute('SELECT * FROM projeto WHERE id_projeto = ?', (id_projeto,)).fetchone()
     
     if projeto is None:
-        conn.close()
         return jsonify({
             'status': 'error',
             'message': 'Projeto não encontrado'
         }), 404
     
     # Busca chamados associados a este projeto
-    chamados = conn.execute('''
-        SELECT c.id_chamado, c.data_hora, c.status, cl.nome as cliente, 
+    query = '''
+        SELECT c.id_chamado, c.numero_rac, c.data_hora, c.status, cl.nome as cliente, 
                p.nome as plantonista, c.descricao
         FROM chamado c
         JOIN cliente cl ON c.id_cliente = cl.id_cliente
         JOIN plantonista p ON c.id_plantonista = p.id_plantonista
         WHERE c.id_projeto = ?
-        ORDER BY c.data_hora DESC
-    ''', (id_projeto,)).fetchall()
+    '''
+    parametros = [id_projeto]
+    
+    if cursor:
+        query += " AND " + paginacao.FILTRO_CURSOR
+        parametros.extend(cursor)
     
-    conn.close()
+    query += " ORDER BY " + paginacao.ORDEM_CURSOR
     
     # Converter para dicionários
     projeto_dict = dict(projeto)
-    chamados_list = [dict(chamado) for chamado in chamados]
+    
+    if streaming:
+        if limite:
+            query += " LIMIT ?"
+            parametros.append(limite)
+        
+        def gerar():
+            with get_db_connection() as conn:
+                linhas = conn.execute(query, parametros)
+                envelope = {'status': 'success', 'projeto': projeto_dict}
+                yield from paginacao.gerar_json(envelope, 'chamados', linhas)
+        
+        return Response(gerar(), mimetype='application/json')
+    
+    # Busca um registro a mais para saber se existe próxima página
+    limite = limite or paginacao.LIMITE_PADRAO
+    query += " LIMIT ?"
+    parametros.append(limite + 1)
+    
+    with get_db_connection() as conn:
+        chamados = conn.execute(query, parametros).fetchall()
+    
+    chamados_list, proximo = paginacao.montar_pagina(chamados, limite)
     
     return jsonify({
         'status': 'success',
         'projeto': projeto_dict,
-        'chamados': chamados_list
+        'chamados': chamados_list,
+        'proximo': proximo
     })
 
 @app.route('/api/projetos/<int:id_projeto>', methods=['PUT'])
@@ -134,19 +162,6 @@ def atualizar_projeto(id_projeto):
     """Atualiza informações de um projeto existente"""
     data = request.json
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Verifica se o projeto existe
-    projeto = cursor.execute('SELECT * FROM projeto WHERE id_projeto = ?', (id_projeto,)).fetchone()
-    
-    if projeto is None:
-        conn.close()
-        return jsonify({
-            'status': 'error',
-            'message': 'Projeto não encontrado'
-        }), 404
-    
     # Campos que podem ser atualizados
     campos_atualizaveis = [
         'nome', 'descricao', 'gerente', 'email_gerente', 
@@ -162,25 +177,31 @@ def atualizar_projeto(id_projeto):
             campos.append(f"{campo} = ?")
             valores.append(data[campo])
     
-    if not campos:
-        conn.close()
-        return jsonify({
-            'status': 'error',
-            'message': 'Nenhum campo para atualizar'
-        }), 400
-    
-    # Adiciona o ID do projeto aos valores
-    valores.append(id_projeto)
-    
-    # Executa a atualização
-    cursor.execute(f"""
-        UPDATE projeto
-        SET {', '.join(campos)}
-        WHERE id_projeto = ?
-    """, valores)
-    
-    conn.commit()
-    conn.close()
+    with get_db_connection() as conn:
+        # Verifica se o projeto existe
+        projeto = conn.execute('SELECT * FROM projeto WHERE id_projeto = ?', (id_projeto,)).fetchone()
+        
+        if projeto is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Projeto não encontrado'
+            }), 404
+        
+        if not campos:
+            return jsonify({
+                'status': 'error',
+                'message': 'Nenhum campo para atualizar'
+            }), 400
+        
+        # Adiciona o ID do projeto aos valores
+        valores.append(id_projeto)
+        
+        # Executa a atualização
+        conn.execute(f"""
+            UPDATE projeto
+            SET {', '.join(campos)}
+            WHERE id_projeto = ?
+        """, valores)
     
     return jsonify({
         'status': 'success',
@@ -190,24 +211,18 @@ def atualizar_projeto(id_projeto):
 @app.route('/api/projetos/<int:id_projeto>', methods=['DELETE'])
 def desativar_projeto(id_projeto):
     """Desativa um projeto (não exclui do banco)"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Verifica se o projeto existe
-    projeto = cursor.execute('SELECT * FROM projeto WHERE id_projeto = ?', (id_projeto,)).fetchone()
-    
-    if projeto is None:
-        conn.close()
-        return jsonify({
-            'status': 'error',
-            'message': 'Projeto não encontrado'
-        }), 404
-    
-    # Desativa o projeto em vez de excluí-lo
-    cursor.execute('UPDATE projeto SET ativo = 0 WHERE id_projeto = ?', (id_projeto,))
-    
-    conn.commit()
-    conn.close()
+    with get_db_connection() as conn:
+        # Verifica se o projeto existe
+        projeto = conn.execute('SELECT * FROM projeto WHERE id_projeto = ?', (id_projeto,)).fetchone()
+        
+        if projeto is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Projeto não encontrado'
+            }), 404
+        
+        # Desativa o projeto em vez de excluí-lo
+        conn.execute('UPDATE projeto SET ativo = 0 WHERE id_projeto = ?', (id_projeto,))
     
     return jsonify({
         'status': 'success',
@@ -216,105 +231,46 @@ def desativar_projeto(id_projeto):
 
 @app.route('/api/projetos/estatisticas', methods=['GET'])
 def estatisticas_projetos():
-    """Retorna estatísticas dos projetos"""
-    conn = get_db_connection()
-    
-    # Total de chamados por projeto
-    chamados_por_projeto = conn.execute('''
-        SELECT p.sigla, p.nome, COUNT(c.id_chamado) as total_chamados
-        FROM projeto p
-        LEFT JOIN chamado c ON p.id_projeto = c.id_projeto
-        GROUP BY p.id_projeto
-        ORDER BY total_chamados DESC
-    ''').fetchall()
-    
-    # Tempo médio de atendimento por projeto
-    tempo_medio_por_projeto = conn.execute('''
-        SELECT p.sigla, p.nome, AVG(c.tempo_atendimento) as tempo_medio
-        FROM projeto p
-        LEFT JOIN chamado c ON p.id_projeto = c.id_projeto
-        WHERE c.tempo_atendimento IS NOT NULL
-        GROUP BY p.id_projeto
-        ORDER BY tempo_medio DESC
-    ''').fetchall()
-    
-    # Status dos chamados por projeto
-    status_por_projeto = conn.execute('''
-        SELECT p.sigla, c.status, COUNT(c.id_chamado) as total
-        FROM projeto p
-        LEFT JOIN chamado c ON p.id_projeto = c.id_projeto
-        WHERE c.id_chamado IS NOT NULL
-        GROUP BY p.id_projeto, c.status
-        ORDER BY p.sigla, c.status
-    ''').fetchall()
-    
-    conn.close()
-    
-    # Converter para dicionários
-    chamados_por_projeto_list = [dict(item) for item in chamados_por_projeto]
-    tempo_medio_por_projeto_list = [dict(item) for item in tempo_medio_por_projeto]
-    status_por_projeto_list = [dict(item) for item in status_por_projeto]
+    """Retorna estatísticas dos projetos (mantidas incrementalmente por triggers)"""
+    with get_db_connection() as conn:
+        estatisticas = estatisticas_projeto.obter_estatisticas(conn)
     
     return jsonify({
         'status': 'success',
-        'chamados_por_projeto': chamados_por_projeto_list,
-        'tempo_medio_por_projeto': tempo_medio_por_projeto_list,
-        'status_por_projeto': status_por_projeto_list
+        **estatisticas
+    })
+
+def resposta_csv(query, parametros, prefixo):
+    """Envia o resultado da consulta como CSV, escrito direto do cursor na resposta"""
+    def gerar():
+        with get_db_connection() as conn:
+            yield from exportacao.gerar_csv(conn.execute(query, parametros))
+    
+    # Nome de arquivo com timestamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return Response(gerar(), mimetype='text/csv', headers={
+        'Content-Disposition': f'attachment; filename={prefixo}_{timestamp}.csv'
     })
 
 @app.route('/api/projetos/exportar', methods=['GET'])
 def exportar_projetos():
     """Exporta a lista de projetos para CSV"""
-    conn = get_db_connection()
-    
-    # Busca todos os projetos
-    projetos = conn.execute('''
-        SELECT p.sigla, p.nome, p.gerente, p.email_gerente, p.telefone_gerente,
-               COUNT(c.id_chamado) as total_chamados
-        FROM projeto p
-        LEFT JOIN chamado c ON p.id_projeto = c.id_projeto
-        WHERE p.ativo = 1
-        GROUP BY p.id_projeto
-        ORDER BY p.sigla
-    ''').fetchall()
-    
-    conn.close()
-    
-    # Converte para DataFrame do pandas
-    df = pd.DataFrame([dict(projeto) for projeto in projetos])
-    
-    # Cria diretório para exportações se não existir
-    if not os.path.exists('exportacoes'):
-        os.makedirs('exportacoes')
-    
-    # Gera nome de arquivo com timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    csv_path = f'exportacoes/projetos_{timestamp}.csv'
-    
-    # Salva como CSV
-    df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-    
-    # Retorna o arquivo para download
-    return send_file(csv_path, as_attachment=True, download_name=f'projetos_{timestamp}.csv')
+    return resposta_csv(exportacao.CONSULTA_PROJETOS, [], 'projetos')
+
+@app.route('/api/chamados/exportar', methods=['GET'])
+def exportar_chamados():
+    """Exporta os chamados para CSV (filtros: id_projeto, status, data_inicio, data_fim)"""
+    query, parametros = exportacao.montar_consulta_chamados(request.args)
+    return resposta_csv(query, parametros, 'chamados')
 
 # Rota para obter a lista de plantonistas do grupo
 @app.route('/api/plantonistas', methods=['GET'])
 def listar_plantonistas():
     """Lista todos os plantonistas cadastrados"""
     # Dados do grupo de WhatsApp fornecido pelo usuário
-    plantonistas = [
-        {"nome": "Aurélio", "telefone": "+5511977123444", "status": "Ativo"},
-        {"nome": "Caio", "telefone": "", "status": "Ativo"},
-        {"nome": "Carlos", "telefone": "", "status": "Ativo"},
-        {"nome": "Flávio", "telefone": "", "status": "Ativo"},
-        {"nome": "Igor", "telefone": "", "status": "Ativo"},
-        {"nome": "Pedro", "telefone": "", "status": "Ativo"},
-        {"nome": "Plantão", "telefone": "", "status": "Ativo"}
-    ]
-    
     return jsonify({
         'status': 'success',
-        'plantonistas': plantonistas
+        'plantonistas': cadastros.PLANTONISTAS_GRUPO
     })
 
 # Função para inicializar o banco de dados
@@ -323,16 +279,10 @@ def init_db():
     if not os.path.exists(DB_PATH):
         conn = sqlite3.connect(DB_PATH)
         
-        # Executa o schema principal
-        with open('schema.sql', 'r') as f:
-            conn.executescript(f.read())
-        
-        # Executa o schema de projetos
-        with open('schema_projeto.sql', 'r') as f:
-            conn.executescript(f.read())
+        # Executa os schemas (principal, projetos, busca textual...)
+        database.aplicar_schemas(conn)
             
         # Cria diretórios necessários
-        os.makedirs('exportacoes', exist_ok=True)
         os.makedirs('relatorios', exist_ok=True)
         os.makedirs('static/img', exist_ok=True)
             
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+from jinja2 import Environment, FileSystemLoader
+from weasyprint import HTML, CSS
+from pdf_generator import CSS_RELATORIO, logo_manager
+from renderizador_pdf import RenderizadorPDF
+
+# Uso: python benchmark_relatorio.py [quantidade_de_relatorios]
+# Compara o custo por relatório da renderização antiga (ambiente Jinja2, template
+# e CSS recriados a cada relatório) com o RenderizadorPDF reaproveitado
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Chamado de exemplo, no formato retornado por obter_dados_chamado
+CHAMADO_EXEMPLO = {
+    'id_chamado': 1, 'numero_rac': 'RAC0001', 'data_formatada': '15/03/2025',
+    'hora_inicio': '09:30', 'hora_fim': '11:05', 'tempo_formatado': '1h 35min',
+    'tipo': 'Suporte Técnico', 'prioridade': 'Alta', 'status': 'Resolvido',
+    'descricao': 'Servidor de arquivos indisponível para todos os setores. ' * 4,
+    'ambiente': 'Windows Server 2019, compartilhamentos SMB',
+    'tempo_ocorrencia': 'Desde as 08:00',
+    'analise': 'Disco do volume de dados com 100% de uso após falha na rotina de limpeza. ' * 3,
+    'procedimentos': 'Liberação de espaço, reinício do serviço e verificação dos compartilhamentos. ' * 3,
+    'solucao': 'Rotina de limpeza corrigida e alerta de uso de disco configurado. ' * 2,
+    'observacoes': 'Cliente acompanhou o atendimento remotamente.',
+    'recomendacoes': 'Ampliar o volume de dados no próximo trimestre.',
+    'cliente': 'Empresa Exemplo Ltda', 'cnpj_cpf': '12.345.678/0001-90',
+    'contato': 'Maria Souza', 'telefone': '(85) 99999-0000', 'email': 'maria@exemplo.com.br',
+    'plantonista': 'João Pereira', 'categoria': 'Infraestrutura',
+    'projeto_sigla': 'INFRA', 'projeto_nome': 'Infraestrutura',
+    'gerente_projeto': 'Mariana Costa', 'email_gerente': 'mariana.costa@empresa.com.br',
+    'telefone_gerente': '(85) 98765-5678'
+}
+
+def diretorio_templates():
+    """Diretório que contém relatorio_template.html"""
+    templates_dir = os.path.join(BASE_DIR, 'templates')
+    return templates_dir if os.path.exists(templates_dir) else BASE_DIR
+
+def renderizar_antes(templates_dir):
+    """Renderização como era feita antes: tudo recriado a cada relatório"""
+    env = Environment(loader=FileSystemLoader(templates_dir))
+    template = env.get_template('relatorio_template.html')
+    html_content = template.render(chamado=CHAMADO_EXEMPLO, logos={})
+    return HTML(string=html_content, base_url=BASE_DIR).write_pdf(
+        stylesheets=[CSS(string=CSS_RELATORIO)]
+    )
+
+def medir(funcao, quantidade):
+    """Executa a função `quantidade` vezes e retorna o tempo médio em ms"""
+    funcao()  # aquecimento (imports e caches do interpretador)
+    inicio = time.perf_counter()
+    for _ in range(quantidade):
+        funcao()
+    return (time.perf_counter() - inicio) * 1000 / quantidade
+
+if __name__ == "__main__":
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    templates_dir = diretorio_templates()
+
+    inicio = time.perf_counter()
+    renderizador = RenderizadorPDF(templates_dir, CSS_RELATORIO, logos={
+        'esquerdo': logo_manager.logo_left_path,
+        'direito': logo_manager.logo_right_path
+    })
+    custo_inicial = (time.perf_counter() - inicio) * 1000
+
+    antes = medir(lambda: renderizar_antes(templates_dir), quantidade)
+    depois = medir(lambda: renderizador.gerar_pdf(CHAMADO_EXEMPLO), quantidade)
+
+    print(f"Relatórios por medição: {quantidade}")
+    print(f"Antes (template e CSS a cada relatório): {antes:.1f} ms/relatório")
+    print(f"Depois (RenderizadorPDF reaproveitado):  {depois:.1f} ms/relatório")
+    print(f"Criação do renderizador (uma vez por processo): {custo_inicial:.1f} ms")
+    print(f"Ganho por relatório: {antes - depois:.1f} ms ({antes / depois:.2f}x)")
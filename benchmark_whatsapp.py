@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import tempfile
+import requests
+from cliente_whatsapp import ClienteWhatsApp
+from simulador_whatsapp import GatewaySimulado
+
+# Uso: python benchmark_whatsapp.py [quantidade_de_relatorios] [tamanho_do_pdf_em_kb]
+# Compara, contra o gateway simulado, o envio antigo (uma conexão e um upload
+# por mensagem) com o ClienteWhatsApp (conexão reaproveitada e mídia enviada
+# uma vez por arquivo), com cópia para o gerente em ambos
+
+TELEFONES = ['5585999990000', '5585987655678']  # cliente e gerente
+
+def enviar_antes(url, pdf_path):
+    """Envio sem sessão: cada requisição abre uma conexão e o PDF vai a cada destinatário"""
+    for telefone in TELEFONES:
+        with open(pdf_path, 'rb') as f:
+            midia = requests.post(f"{url}/media", data={'messaging_product': 'whatsapp'},
+                                  files={'file': (os.path.basename(pdf_path), f, 'application/pdf')}).json()['id']
+        requests.post(f"{url}/messages", json={
+            'messaging_product': 'whatsapp', 'to': telefone, 'type': 'document',
+            'document': {'id': midia, 'filename': os.path.basename(pdf_path)}
+        }).raise_for_status()
+
+def enviar_depois(cliente, pdf_path):
+    """Envio com o ClienteWhatsApp"""
+    media_id = cliente.obter_midia(pdf_path)
+    for telefone in TELEFONES:
+        cliente.enviar_documento(telefone, media_id, os.path.basename(pdf_path))
+
+def medir(gateway, funcao, pdfs):
+    """Envia todos os PDFs; retorna ms por relatório, uploads e conexões abertas"""
+    uploads, conexoes = len(gateway.uploads), gateway.conexoes
+    inicio = time.perf_counter()
+    for pdf_path in pdfs:
+        funcao(pdf_path)
+    duracao = (time.perf_counter() - inicio) * 1000 / len(pdfs)
+    return duracao, len(gateway.uploads) - uploads, gateway.conexoes - conexoes
+
+if __name__ == "__main__":
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    tamanho_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as temp_dir, GatewaySimulado() as gateway:
+        pdfs = []
+        for numero in range(quantidade):
+            pdf_path = os.path.join(temp_dir, f"RAC{numero:04d}.pdf")
+            with open(pdf_path, 'wb') as f:
+                f.write(os.urandom(tamanho_kb * 1024))
+            pdfs.append(pdf_path)
+
+        antes = medir(gateway, lambda pdf_path: enviar_antes(gateway.url, pdf_path), pdfs)
+        with ClienteWhatsApp({'api_url': gateway.url, 'api_token': 'benchmark'}) as cliente:
+            depois = medir(gateway, lambda pdf_path: enviar_depois(cliente, pdf_path), pdfs)
+
+    print(f"Relatórios: {quantidade} de {tamanho_kb} KB (cliente e gerente)")
+    print(f"Antes (sem sessão, upload por mensagem): {antes[0]:.1f} ms/relatório, "
+          f"{antes[1]} uploads, {antes[2]} conexões")
+    print(f"Depois (ClienteWhatsApp):                {depois[0]:.1f} ms/relatório, "
+          f"{depois[1]} uploads, {depois[2]} conexões")
+    print(f"Ganho por relatório: {antes[0] - depois[0]:.1f} ms ({antes[0] / depois[0]:.2f}x)")
@@ -0,0 +1,81 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import database
+
+# Validade (segundos) e quantidade máxima das respostas guardadas
+TTL_PADRAO = 300
+MAX_ITENS_PADRAO = 256
+
+def versao_historico(conn):
+    """Versão atual do histórico (tabela versao_historico, mantida por triggers)"""
+    return conn.execute("SELECT versao FROM versao_historico WHERE id = 1").fetchone()[0]
+
+class CacheRespostas:
+    """Respostas já formatadas das consultas ao histórico, com validade e limite de tamanho
+
+    Cada resposta fica guardada com a versão do histórico em que foi calculada
+    e só é devolvida enquanto a versão for a mesma, ou seja, enquanto nenhum
+    chamado, cliente ou projeto tiver sido alterado de forma que mude a
+    resposta (em qualquer processo). Respostas com mais de `ttl` segundos
+    expiram e, acima de `max_itens`, as usadas há mais tempo são descartadas.
+    """
+
+    def __init__(self, ttl=TTL_PADRAO, max_itens=MAX_ITENS_PADRAO):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        # chave -> (versao, resposta, guardada_em), da menos para a mais recente
+        self.itens = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+
+    def obter(self, chave, versao):
+        """Resposta guardada para a chave na versão informada, ou None"""
+        with self._lock:
+            item = self.itens.get(chave)
+            if item is None or item[0] != versao or time.monotonic() - item[2] > self.ttl:
+                if item is not None:
+                    del self.itens[chave]
+                self.falhas += 1
+                return None
+            self.itens.move_to_end(chave)
+            self.acertos += 1
+            return item[1]
+
+    def guardar(self, chave, versao, resposta):
+        """Guarda a resposta calculada na versão informada"""
+        with self._lock:
+            self.itens[chave] = (versao, resposta, time.monotonic())
+            self.itens.move_to_end(chave)
+            while len(self.itens) > self.max_itens:
+                self.itens.popitem(last=False)
+
+    def limpar(self):
+        """Descarta todas as respostas guardadas"""
+        with self._lock:
+            self.itens.clear()
+
+    def estatisticas(self):
+        """Contadores de acertos e falhas e a quantidade de respostas guardadas"""
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': round(self.acertos / consultas, 3) if consultas else 0.0,
+                'itens': len(self.itens)
+            }
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def obter_cache(db_path=None):
+    """Cache do processo para o arquivo de banco, criado no primeiro uso"""
+    chave = os.path.abspath(db_path or database.DB_PATH)
+    with _caches_lock:
+        cache = _caches.get(chave)
+        if cache is None:
+            cache = _caches[chave] = CacheRespostas()
+        return cache
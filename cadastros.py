@@ -0,0 +1,136 @@
+import os
+import time
+import string
+import threading
+import database
+
+# Mesma normalização dos índices (lower(trim(...)) do SQLite: só ASCII e espaços)
+_MINUSCULAS = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def normalizar(nome):
+    """Chave de busca de um nome, equivalente a lower(trim(nome)) no SQLite"""
+    return (nome or '').strip(' ').translate(_MINUSCULAS)
+
+# Busca do id pela chave normalizada, por cadastro
+CONSULTAS = {
+    'cliente': "SELECT id_cliente FROM cliente WHERE lower(trim(nome)) = lower(trim(?))",
+    'plantonista': "SELECT id_plantonista FROM plantonista WHERE lower(trim(nome)) = lower(trim(?))",
+    'projeto': "SELECT id_projeto FROM projeto WHERE lower(trim(sigla)) = lower(trim(?))",
+    'categoria': "SELECT id_categoria FROM categoria WHERE lower(trim(nome)) = lower(trim(?))"
+}
+
+# Plantonistas do grupo de WhatsApp do plantão (dados fornecidos pelo usuário)
+PLANTONISTAS_GRUPO = [
+    {"nome": "Aurélio", "telefone": "+5511977123444", "status": "Ativo"},
+    {"nome": "Caio", "telefone": "", "status": "Ativo"},
+    {"nome": "Carlos", "telefone": "", "status": "Ativo"},
+    {"nome": "Flávio", "telefone": "", "status": "Ativo"},
+    {"nome": "Igor", "telefone": "", "status": "Ativo"},
+    {"nome": "Pedro", "telefone": "", "status": "Ativo"},
+    {"nome": "Plantão", "telefone": "", "status": "Ativo"}
+]
+
+class CacheCadastros:
+    """Cache em memória dos ids de clientes, plantonistas, projetos e categorias
+
+    Na abertura de um chamado, os ids já conhecidos saem do cache sem consulta
+    ao banco. Clientes e plantonistas novos são criados em uma única instrução
+    (INSERT ... ON CONFLICT DO NOTHING RETURNING) sobre os índices normalizados
+    de schema_cadastros.sql. Só são guardados ids de registros já existentes,
+    nunca os criados na transação em andamento (que ainda pode ser desfeita).
+
+    Alterações de nome e exclusões, de qualquer processo, mudam a versão do
+    cadastro (tabela versao_cadastro); a versão é conferida no máximo a cada
+    `intervalo_verificacao` segundos e invalidar() descarta o cache na hora.
+    """
+
+    def __init__(self, intervalo_verificacao=5.0):
+        self.intervalo_verificacao = intervalo_verificacao
+        self.ids = {tabela: {} for tabela in CONSULTAS}
+        self.versoes = {}
+        self.ultima_verificacao = None
+        self._lock = threading.Lock()
+
+    def invalidar(self, tabela=None):
+        """Descarta os ids guardados de um cadastro (ou de todos)"""
+        with self._lock:
+            for nome in ([tabela] if tabela else CONSULTAS):
+                self.ids[nome] = {}
+
+    def _verificar_versoes(self, conn):
+        """Descarta os cadastros alterados desde a última verificação"""
+        agora = time.monotonic()
+        if self.ultima_verificacao is not None and agora - self.ultima_verificacao < self.intervalo_verificacao:
+            return
+
+        versoes = dict(conn.execute("SELECT tabela, versao FROM versao_cadastro").fetchall())
+        with self._lock:
+            for tabela, versao in versoes.items():
+                if tabela in self.ids and self.versoes.get(tabela) != versao:
+                    self.ids[tabela] = {}
+            self.versoes = versoes
+            self.ultima_verificacao = agora
+
+    def _buscar_guardado(self, conn, tabela, nome):
+        """Id guardado no cache, sem consultar o banco"""
+        self._verificar_versoes(conn)
+        return self.ids[tabela].get(normalizar(nome))
+
+    def _buscar(self, conn, tabela, nome):
+        """Id guardado ou, se ainda não conhecido, consultado (e guardado)"""
+        id_registro = self._buscar_guardado(conn, tabela, nome)
+        if id_registro is None:
+            linha = conn.execute(CONSULTAS[tabela], (nome,)).fetchone()
+            if linha is not None:
+                id_registro = linha[0]
+                with self._lock:
+                    self.ids[tabela][normalizar(nome)] = id_registro
+        return id_registro
+
+    def _obter_ou_criar(self, conn, tabela, nome, insercao, valores):
+        """Id do registro com o nome, criando-o (em uma instrução) se não existir"""
+        id_registro = self._buscar_guardado(conn, tabela, nome)
+        if id_registro is not None:
+            return id_registro
+
+        linha = conn.execute(insercao, valores).fetchone()
+        if linha is not None:
+            # Criado agora: não entra no cache até a transação ser confirmada
+            return linha[0]
+        return self._buscar(conn, tabela, nome)
+
+    def id_cliente(self, conn, nome, contato=None, telefone=None, email=None):
+        """Id do cliente pelo nome; clientes novos são criados com os dados informados"""
+        return self._obter_ou_criar(conn, 'cliente', nome, """
+            INSERT INTO cliente (nome, contato, telefone, email) VALUES (?, ?, ?, ?)
+            ON CONFLICT (lower(trim(nome))) DO NOTHING
+            RETURNING id_cliente
+        """, (nome, contato, telefone, email))
+
+    def id_plantonista(self, conn, nome, email=None, telefone=None):
+        """Id do plantonista pelo nome; plantonistas novos são criados com os dados informados"""
+        return self._obter_ou_criar(conn, 'plantonista', nome, """
+            INSERT INTO plantonista (nome, email, telefone) VALUES (?, ?, ?)
+            ON CONFLICT (lower(trim(nome))) DO NOTHING
+            RETURNING id_plantonista
+        """, (nome, email, telefone))
+
+    def id_projeto(self, conn, sigla):
+        """Id do projeto pela sigla, ou None se não existir"""
+        return self._buscar(conn, 'projeto', sigla)
+
+    def id_categoria(self, conn, nome):
+        """Id da categoria pelo nome, ou None se não existir"""
+        return self._buscar(conn, 'categoria', nome)
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def obter_cache(db_path=None):
+    """Cache do processo para o arquivo de banco, criado no primeiro uso"""
+    chave = os.path.abspath(db_path or database.DB_PATH)
+    with _caches_lock:
+        cache = _caches.get(chave)
+        if cache is None:
+            cache = _caches[chave] = CacheCadastros()
+        return cache
@@ -0,0 +1,197 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import database
+
+# Respostas do gateway que valem uma nova tentativa no envio de mídia: limite de
+# taxa e indisponibilidade temporária. Repetir o upload no máximo gera outro id
+# de mídia para o mesmo arquivo
+STATUS_REPETIR = (429, 502, 503, 504)
+
+# Nas mensagens (POST /messages, não idempotente) só as respostas que garantem
+# que a mensagem não foi aceita: limite de taxa e serviço indisponível (com
+# Retry-After respeitado). Um 502/504 pode vir depois de a mensagem ser entregue
+STATUS_REPETIR_MENSAGEM = (429, 503)
+
+# Arquivos (hash e id da mídia) lembrados em memória; os mais antigos saem primeiro
+MAX_ARQUIVOS_CACHE = 1024
+
+def hash_arquivo(caminho):
+    """SHA-256 do conteúdo do arquivo, lido em blocos"""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+class ClienteWhatsApp:
+    """Cliente do gateway do WhatsApp (API no formato da WhatsApp Cloud API)
+
+    As requisições usam uma requests.Session com conexões mantidas abertas
+    (keep-alive) e novas tentativas com espera para falhas de conexão e para
+    STATUS_REPETIR (mídia) ou STATUS_REPETIR_MENSAGEM (mensagens). Cada arquivo
+    é enviado ao gateway uma única vez: o id da mídia fica em cache pelo hash
+    do conteúdo (em memória, para os últimos `max_arquivos` arquivos, e, com
+    db_path, na tabela midia_whatsapp) e é reaproveitado para todos os
+    destinatários. Pode ser compartilhado entre threads.
+    """
+
+    def __init__(self, config, db_path=None, tentativas=3, timeout=30, conexoes=10,
+                 max_arquivos=MAX_ARQUIVOS_CACHE):
+        self.api_url = config['api_url'].rstrip('/')
+        self.validade_midia_dias = config.get('validade_midia_dias', 25)
+        self.db_path = db_path
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        if config.get('api_token'):
+            self.session.headers['Authorization'] = f"Bearer {config['api_token']}"
+
+        # Sem novas tentativas após erro de leitura: a mensagem pode já ter sido aceita
+        def adaptador(status):
+            retry = Retry(total=tentativas, read=0, backoff_factor=0.5, status_forcelist=status,
+                          allowed_methods=None, raise_on_status=False)
+            return HTTPAdapter(pool_connections=1, pool_maxsize=conexoes, max_retries=retry)
+
+        padrao = adaptador(STATUS_REPETIR)
+        mensagens = adaptador(STATUS_REPETIR_MENSAGEM)
+        # As mensagens só mudam as novas tentativas: as conexões são as mesmas
+        mensagens.poolmanager = padrao.poolmanager
+        self.session.mount('http://', padrao)
+        self.session.mount('https://', padrao)
+        self.session.mount(f"{self.api_url}/messages", mensagens)
+
+        # hash -> id da mídia e (caminho, mtime, tamanho) -> hash, do menos para o mais recente
+        self.max_arquivos = max_arquivos
+        self.midias = OrderedDict()
+        self.hashes = OrderedDict()
+        self.uploads = 0
+        self._lock = threading.Lock()
+        self._locks_midia = {}
+
+    def _lembrar(self, cache, chave, valor):
+        """Guarda no cache (com o lock obtido), descartando os mais antigos acima do limite"""
+        cache[chave] = valor
+        cache.move_to_end(chave)
+        while len(cache) > self.max_arquivos:
+            cache.popitem(last=False)
+
+    def _hash(self, caminho):
+        """Hash do arquivo, recalculado apenas quando o arquivo muda"""
+        info = os.stat(caminho)
+        chave = (caminho, info.st_mtime_ns, info.st_size)
+        with self._lock:
+            if chave in self.hashes:
+                self.hashes.move_to_end(chave)
+                return self.hashes[chave]
+        hash_conteudo = hash_arquivo(caminho)
+        with self._lock:
+            self._lembrar(self.hashes, chave, hash_conteudo)
+        return hash_conteudo
+
+    def obter_midia(self, caminho):
+        """Id da mídia do arquivo no gateway, enviando o arquivo apenas na primeira vez"""
+        chave = self._hash(caminho)
+        with self._lock:
+            if chave in self.midias:
+                self.midias.move_to_end(chave)
+                return self.midias[chave]
+            lock_midia = self._locks_midia.setdefault(chave, threading.Lock())
+
+        # Envios simultâneos do mesmo arquivo esperam o primeiro upload
+        with lock_midia:
+            with self._lock:
+                media_id = self.midias.get(chave)
+            if media_id is None:
+                media_id = self.buscar_midia(chave)
+            if media_id is None:
+                media_id = self.enviar_arquivo(caminho)
+                self.guardar_midia(chave, media_id)
+            with self._lock:
+                self._lembrar(self.midias, chave, media_id)
+                # Quem chegar depois já encontra o id em self.midias
+                self._locks_midia.pop(chave, None)
+        return media_id
+
+    def buscar_midia(self, chave):
+        """Id de mídia ainda válido registrado no banco para o hash"""
+        if self.db_path is None:
+            return None
+        with database.get_db_connection(self.db_path) as conn:
+            linha = conn.execute("""
+                SELECT media_id FROM midia_whatsapp
+                WHERE hash_arquivo = ? AND data_envio >= datetime('now', ?)
+            """, (chave, f"-{self.validade_midia_dias} days")).fetchone()
+        return linha['media_id'] if linha else None
+
+    def guardar_midia(self, chave, media_id):
+        """Registra no banco o id de mídia devolvido pelo gateway"""
+        if self.db_path is None:
+            return
+        with database.get_db_connection(self.db_path) as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO midia_whatsapp (hash_arquivo, media_id, data_envio)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            """, (chave, media_id))
+
+    def enviar_arquivo(self, caminho, tipo='application/pdf'):
+        """Envia o arquivo ao gateway (POST /media) e retorna o id da mídia"""
+        with open(caminho, 'rb') as f:
+            resposta = self.session.post(
+                f"{self.api_url}/media",
+                data={'messaging_product': 'whatsapp', 'type': tipo},
+                files={'file': (os.path.basename(caminho), f, tipo)},
+                timeout=self.timeout
+            )
+        resposta.raise_for_status()
+        with self._lock:
+            self.uploads += 1
+        return resposta.json()['id']
+
+    def enviar_documento(self, telefone, media_id, nome_arquivo, legenda=None):
+        """Envia um documento já carregado no gateway (POST /messages); retorna o id da mensagem"""
+        documento = {'id': media_id, 'filename': nome_arquivo}
+        if legenda:
+            documento['caption'] = legenda
+
+        resposta = self.session.post(
+            f"{self.api_url}/messages",
+            json={
+                'messaging_product': 'whatsapp',
+                'to': telefone,
+                'type': 'document',
+                'document': documento
+            },
+            timeout=self.timeout
+        )
+        resposta.raise_for_status()
+        return resposta.json()['messages'][0]['id']
+
+    def enviar_texto(self, telefone, texto):
+        """Envia uma mensagem de texto (POST /messages); retorna o id da mensagem"""
+        resposta = self.session.post(
+            f"{self.api_url}/messages",
+            json={
+                'messaging_product': 'whatsapp',
+                'to': telefone,
+                'type': 'text',
+                'text': {'body': texto}
+            },
+            timeout=self.timeout
+        )
+        resposta.raise_for_status()
+        return resposta.json()['messages'][0]['id']
+
+    def fechar(self):
+        """Fecha as conexões abertas com o gateway"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
@@ -0,0 +1,158 @@
+import os
+import json
+import threading
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+from datetime import datetime, timezone
+import database
+
+# Gravação dos resultados no banco (uma instrução por tipo de resultado, via executemany)
+SQL_ENVIADO = """
+    UPDATE relatorio
+    SET enviado = 1, metodo_envio = ?, data_envio = ?, status_envio = 'Enviado', ultimo_erro = NULL
+    WHERE id_relatorio = ?
+"""
+
+SQL_FALHA = """
+    UPDATE relatorio
+    SET tentativas = ?, ultimo_erro = ?, status_envio = ?, proxima_tentativa = datetime(?, ?)
+    WHERE id_relatorio = ?
+"""
+
+class ConfirmacoesEnvio:
+    """Resultados de envio dos relatórios gravados no banco em lote
+
+    Cada resultado é anotado em um diário (arquivo ao lado do banco) assim que
+    o envio termina e gravado no banco junto com os demais, em uma única
+    transação, a cada `tamanho_lote` resultados e no fechamento. Se o processo
+    cair antes da gravação, o diário é reaplicado na próxima abertura, antes de
+    qualquer leitura da fila, e nenhum envio confirmado é refeito. Cada
+    anotação é gravada no disco (fsync) antes de o resultado ser aceito, e o
+    diário só é limpo depois de o lote estar gravado no disco pelo banco.
+
+    Só um despacho por banco de cada vez: a abertura obtém uma trava exclusiva
+    (arquivo `<diário>.trava`) antes de reaplicar o diário e lança ValueError
+    se outro processo já a tiver. Uso:
+
+        with ConfirmacoesEnvio(db_path) as confirmacoes:
+            confirmacoes.registrar_envio(id_relatorio, 'Email')
+    """
+
+    def __init__(self, db_path, diario_path=None, tamanho_lote=100):
+        self.db_path = db_path
+        self.diario_path = diario_path or f"{database.get_pool(db_path).db_path}-envios"
+        self.tamanho_lote = tamanho_lote
+        self.pendentes = []
+        self.transacoes = 0
+        self._lock = threading.Lock()
+
+        self._trava = self.travar()
+        try:
+            self.recuperados = self.recuperar()
+            self._diario = open(self.diario_path, 'a', encoding='utf-8')
+        except BaseException:
+            self._trava.close()
+            raise
+
+    def travar(self):
+        """Obtém a trava exclusiva do despacho (liberada no fechamento ou no fim do processo)"""
+        trava = open(f"{self.diario_path}.trava", 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                trava.close()
+                raise ValueError(f"Outro despacho de relatórios está em andamento ({self.diario_path})")
+        return trava
+
+    def recuperar(self):
+        """Grava no banco os resultados que ficaram no diário; retorna quantos eram"""
+        if not os.path.exists(self.diario_path):
+            return 0
+
+        entradas = []
+        with open(self.diario_path, 'r', encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    entradas.append(json.loads(linha))
+                except ValueError:
+                    # Última linha incompleta (queda durante a escrita): o envio não foi anotado
+                    break
+
+        self.gravar(entradas)
+        os.remove(self.diario_path)
+        return len(entradas)
+
+    def gravar(self, entradas):
+        """Grava os resultados no banco em uma única transação"""
+        if not entradas:
+            return
+
+        enviados = [(e['metodo'], e['momento'], e['id_relatorio'])
+                    for e in entradas if e['status_envio'] == 'Enviado']
+        falhas = [(e['tentativas'], e['erro'], e['status_envio'], e['momento'],
+                   f"+{e['atraso']} seconds", e['id_relatorio'])
+                  for e in entradas if e['status_envio'] != 'Enviado']
+
+        with database.get_db_connection(self.db_path) as conn:
+            # O pool usa synchronous=NORMAL (o último commit pode se perder numa queda de
+            # energia): este vai para o disco antes de o diário ser limpo
+            sincronizar = not conn.in_transaction
+            if sincronizar:
+                conn.execute("PRAGMA synchronous = FULL")
+            try:
+                conn.executemany(SQL_ENVIADO, enviados)
+                conn.executemany(SQL_FALHA, falhas)
+                if sincronizar:
+                    conn.commit()
+            finally:
+                if sincronizar:
+                    conn.execute(f"PRAGMA synchronous = {dict(database.PRAGMAS)['synchronous']}")
+        self.transacoes += 1
+
+    def _registrar(self, entrada):
+        entrada['momento'] = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            # O diário vai para o disco antes de o resultado ser aceito
+            self._diario.write(json.dumps(entrada) + '\n')
+            self._diario.flush()
+            os.fsync(self._diario.fileno())
+            self.pendentes.append(entrada)
+            if len(self.pendentes) >= self.tamanho_lote:
+                self._descarregar()
+
+    def _descarregar(self):
+        """Grava os resultados pendentes e limpa o diário (com o lock obtido)"""
+        self.gravar(self.pendentes)
+        self.pendentes = []
+        self._diario.truncate(0)
+        os.fsync(self._diario.fileno())
+
+    def registrar_envio(self, id_relatorio, metodo):
+        """Registra um relatório enviado pelo método informado"""
+        self._registrar({'id_relatorio': id_relatorio, 'status_envio': 'Enviado', 'metodo': metodo})
+
+    def registrar_falha(self, id_relatorio, tentativas, erro, status_envio, atraso):
+        """Registra uma falha: novas tentativas, erro e próxima tentativa em `atraso` segundos"""
+        self._registrar({
+            'id_relatorio': id_relatorio, 'status_envio': status_envio,
+            'tentativas': tentativas, 'erro': erro, 'atraso': int(atraso)
+        })
+
+    def fechar(self):
+        """Grava os resultados pendentes e remove o diário"""
+        with self._lock:
+            if self._diario.closed:
+                return
+            self._descarregar()
+            self._diario.close()
+            os.remove(self.diario_path)
+            self._trava.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
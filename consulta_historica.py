@@ -1,300 +1,337 @@
 import os
-import sqlite3
+import re
+import database
 import json
+import paginacao
+import cache_consultas
+from estado_conversa import EstadoSQLite
 from datetime import datetime
 
+# Pesos do bm25 por coluna de chamado_fts (descricao, ambiente, analise,
+# procedimentos, solucao, observacoes, recomendacoes, cliente, contato)
+ORDEM_RELEVANCIA = "bm25(chamado_fts, 10.0, 2.0, 5.0, 3.0, 8.0, 1.0, 1.0, 4.0, 2.0)"
+
+# Chamados por resposta no WhatsApp e validade (segundos) da continuação com "mais"
+TAMANHO_PAGINA = 5
+TTL_CURSOR = 30 * 60
+
+# Textos longos vêm truncados do banco, no tamanho exibido nas respostas
+TRECHOS = "substr(c.descricao, 1, 100) as descricao, substr(c.solucao, 1, 150) as solucao"
+
+def termo_para_fts(termo_busca):
+    """Converte o texto digitado em uma expressão MATCH do FTS5
+
+    Cada palavra vira um prefixo entre aspas ("servidor"*), o que evita erros
+    de sintaxe com caracteres especiais e aproxima o comportamento do LIKE.
+    """
+    palavras = re.findall(r'\w+', termo_busca or '')
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+# Prefixos das mensagens de consulta e o comando de cada um
+COMANDOS = {
+    'consultar': 'consultar',
+    'cliente': 'cliente',
+    'projeto': 'projeto',
+    'solucao': 'solucao',
+    'solução': 'solucao'
+}
+
+# Se não for uma consulta válida
+AJUDA = """
+            Para consultar o histórico, use um dos seguintes formatos:
+            
+            - consultar [termo]: Busca chamados com o termo especificado
+            - cliente [nome]: Busca chamados de um cliente específico
+            - projeto [sigla]: Busca chamados de um projeto específico
+            - solução [problema]: Busca soluções para problemas similares
+            - mais: Mostra os próximos resultados da última consulta
+            """
+
+def interpretar_comando(mensagem):
+    """Separa o comando e o termo de uma mensagem de consulta
+
+    Retorna (comando, termo), com o termo sem espaços repetidos, ou
+    (None, None) se a mensagem não for uma consulta.
+    """
+    prefixo, separador, termo = (mensagem or '').partition(' ')
+    comando = COMANDOS.get(prefixo.lower())
+    if comando is None or not separador:
+        return None, None
+    return comando, ' '.join(termo.split())
+
+def e_consulta(mensagem):
+    """Indica se a mensagem é uma consulta ao histórico (inclusive "mais")"""
+    return (mensagem or '').strip().lower() == 'mais' or interpretar_comando(mensagem)[0] is not None
+
+def _para_dicionarios(chamados):
+    """Converte as linhas em dicionários, com a data formatada para exibição"""
+    resultados = []
+    for chamado in chamados:
+        chamado_dict = dict(chamado)
+        
+        # Formata a data para exibição
+        if chamado_dict['data_hora']:
+            data_hora = datetime.strptime(chamado_dict['data_hora'], '%Y-%m-%d %H:%M:%S')
+            chamado_dict['data_formatada'] = data_hora.strftime('%d/%m/%Y %H:%M')
+        else:
+            chamado_dict['data_formatada'] = 'N/A'
+        
+        resultados.append(chamado_dict)
+    return resultados
+
 class ConsultaHistorica:
-    def __init__(self, db_path='chamados.db'):
+    def __init__(self, db_path='chamados.db', cache=None, cursores=None):
         self.db_path = db_path
+        # Respostas já formatadas das consultas via WhatsApp (compartilhado por banco)
+        self.cache = cache if cache is not None else cache_consultas.obter_cache(db_path)
+        # Posição da última página exibida a cada remetente, para o comando "mais"
+        # (no banco, como as conversas do bot: sobrevive a reinícios e serve a vários processos)
+        self.cursores = cursores if cursores is not None else \
+            EstadoSQLite(db_path, ttl=TTL_CURSOR, tabela='consulta_cursor')
     
     def get_db_connection(self):
-        """Cria uma conexão com o banco de dados"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Obtém a conexão compartilhada da thread (usar com `with`)"""
+        return database.get_db_connection(self.db_path)
     
-    def buscar_por_texto(self, termo_busca, limite=20):
-        """Busca chamados que contenham o termo em vários campos"""
-        conn = self.get_db_connection()
-        
-        # Prepara o termo de busca para LIKE
-        termo = f"%{termo_busca}%"
-        
-        # Busca em vários campos relevantes
-        chamados = conn.execute("""
-            SELECT 
-                c.id_chamado, c.data_hora, c.status,
-                cl.nome as cliente, cl.contato as solicitante,
-                p.nome as plantonista,
-                c.descricao, c.analise, c.solucao,
-                proj.sigla as projeto_sigla
-            FROM chamado c
-            JOIN cliente cl ON c.id_cliente = cl.id_cliente
-            JOIN plantonista p ON c.id_plantonista = p.id_plantonista
-            LEFT JOIN projeto proj ON c.id_projeto = proj.id_projeto
-            WHERE 
-                c.descricao LIKE ? OR
-                c.ambiente LIKE ? OR
-                c.analise LIKE ? OR
-                c.procedimentos LIKE ? OR
-                c.solucao LIKE ? OR
-                c.observacoes LIKE ? OR
-                c.recomendacoes LIKE ? OR
-                cl.nome LIKE ? OR
-                cl.contato LIKE ?
-            ORDER BY c.data_hora DESC
-            LIMIT ?
-        """, (termo, termo, termo, termo, termo, termo, termo, termo, termo, limite)).fetchall()
+    def buscar_por_texto(self, termo_busca, limite=20, cursor=None):
+        """Busca chamados que contenham o termo em vários campos (índice FTS5)
+
+        Ordenados pela relevância (bm25, coluna `relevancia`); cursor é
+        (relevancia, id_chamado) do último exibido.
+        """
+        expressao = termo_para_fts(termo_busca)
+        if not expressao:
+            return []
         
-        conn.close()
+        filtro, parametros = "", [expressao]
+        if cursor:
+            # Comparação por extenso: o FTS5 não avalia bm25 em comparações de linha (row value)
+            filtro = f"AND ({ORDEM_RELEVANCIA} > ? OR ({ORDEM_RELEVANCIA} = ? AND chamado_fts.rowid > ?))"
+            parametros.extend((cursor[0], cursor[0], cursor[1]))
         
-        # Converte para lista de dicionários
-        resultados = []
-        for chamado in chamados:
-            chamado_dict = dict(chamado)
-            
-            # Formata a data para exibição
-            if chamado_dict['data_hora']:
-                data_hora = datetime.strptime(chamado_dict['data_hora'], '%Y-%m-%d %H:%M:%S')
-                chamado_dict['data_formatada'] = data_hora.strftime('%d/%m/%Y %H:%M')
-            else:
-                chamado_dict['data_formatada'] = 'N/A'
-            
-            resultados.append(chamado_dict)
+        with self.get_db_connection() as conn:
+            # Busca no índice textual, ordenando pela relevância (bm25)
+            chamados = conn.execute(f"""
+                SELECT 
+                    c.id_chamado, c.numero_rac, c.data_hora, c.status,
+                    cl.nome as cliente, cl.contato as solicitante,
+                    p.nome as plantonista,
+                    {TRECHOS},
+                    proj.sigla as projeto_sigla,
+                    snippet(chamado_fts, -1, '*', '*', '...', 12) as trecho,
+                    {ORDEM_RELEVANCIA} as relevancia
+                FROM chamado_fts
+                JOIN chamado c ON c.id_chamado = chamado_fts.rowid
+                JOIN cliente cl ON c.id_cliente = cl.id_cliente
+                JOIN plantonista p ON c.id_plantonista = p.id_plantonista
+                LEFT JOIN projeto proj ON c.id_projeto = proj.id_projeto
+                WHERE chamado_fts MATCH ? {filtro}
+                ORDER BY {ORDEM_RELEVANCIA}, chamado_fts.rowid
+                LIMIT ?
+            """, (*parametros, limite)).fetchall()
         
-        return resultados
+        return _para_dicionarios(chamados)
     
-    def buscar_por_cliente(self, nome_cliente, limite=20):
-        """Busca chamados de um cliente específico"""
-        conn = self.get_db_connection()
-        
+    def buscar_por_cliente(self, nome_cliente, limite=20, cursor=None):
+        """Busca chamados de um cliente específico (cursor: (data_hora, id_chamado) do último exibido)"""
         # Prepara o termo de busca para LIKE
-        termo = f"%{nome_cliente}%"
-        
-        # Busca chamados do cliente
-        chamados = conn.execute("""
-            SELECT 
-                c.id_chamado, c.data_hora, c.status,
-                cl.nome as cliente, cl.contato as solicitante,
-                p.nome as plantonista,
-                c.descricao, c.analise, c.solucao,
-                proj.sigla as projeto_sigla
-            FROM chamado c
-            JOIN cliente cl ON c.id_cliente = cl.id_cliente
-            JOIN plantonista p ON c.id_plantonista = p.id_plantonista
-            LEFT JOIN projeto proj ON c.id_projeto = proj.id_projeto
-            WHERE cl.nome LIKE ?
-            ORDER BY c.data_hora DESC
-            LIMIT ?
-        """, (termo, limite)).fetchall()
+        filtro, parametros = "", [f"%{nome_cliente}%"]
+        if cursor:
+            filtro = "AND " + paginacao.FILTRO_CURSOR
+            parametros.extend(cursor)
         
-        conn.close()
+        with self.get_db_connection() as conn:
+            # Busca chamados do cliente
+            chamados = conn.execute(f"""
+                SELECT 
+                    c.id_chamado, c.numero_rac, c.data_hora, c.status,
+                    cl.nome as cliente, cl.contato as solicitante,
+                    p.nome as plantonista,
+                    {TRECHOS},
+                    proj.sigla as projeto_sigla
+                FROM chamado c
+                JOIN cliente cl ON c.id_cliente = cl.id_cliente
+                JOIN plantonista p ON c.id_plantonista = p.id_plantonista
+                LEFT JOIN projeto proj ON c.id_projeto = proj.id_projeto
+                WHERE cl.nome LIKE ? {filtro}
+                ORDER BY {paginacao.ORDEM_CURSOR}
+                LIMIT ?
+            """, (*parametros, limite)).fetchall()
         
-        # Converte para lista de dicionários
-        resultados = []
-        for chamado in chamados:
-            chamado_dict = dict(chamado)
-            
-            # Formata a data para exibição
-            if chamado_dict['data_hora']:
-                data_hora = datetime.strptime(chamado_dict['data_hora'], '%Y-%m-%d %H:%M:%S')
-                chamado_dict['data_formatada'] = data_hora.strftime('%d/%m/%Y %H:%M')
-            else:
-                chamado_dict['data_formatada'] = 'N/A'
-            
-            resultados.append(chamado_dict)
-        
-        return resultados
+        return _para_dicionarios(chamados)
     
-    def buscar_por_projeto(self, sigla_projeto, limite=20):
-        """Busca chamados de um projeto específico"""
-        conn = self.get_db_connection()
-        
-        # Busca chamados do projeto
-        chamados = conn.execute("""
-            SELECT 
-                c.id_chamado, c.data_hora, c.status,
-                cl.nome as cliente, cl.contato as solicitante,
-                p.nome as plantonista,
-                c.descricao, c.analise, c.solucao,
-                proj.sigla as projeto_sigla
-            FROM chamado c
-            JOIN cliente cl ON c.id_cliente = cl.id_cliente
-            JOIN plantonista p ON c.id_plantonista = p.id_plantonista
-            JOIN projeto proj ON c.id_projeto = proj.id_projeto
-            WHERE proj.sigla = ?
-            ORDER BY c.data_hora DESC
-            LIMIT ?
-        """, (sigla_projeto, limite)).fetchall()
+    def buscar_por_projeto(self, sigla_projeto, limite=20, cursor=None):
+        """Busca chamados de um projeto específico (cursor: (data_hora, id_chamado) do último exibido)"""
+        filtro, parametros = "", [sigla_projeto]
+        if cursor:
+            filtro = "AND " + paginacao.FILTRO_CURSOR
+            parametros.extend(cursor)
         
-        conn.close()
+        with self.get_db_connection() as conn:
+            # Busca chamados do projeto
+            chamados = conn.execute(f"""
+                SELECT 
+                    c.id_chamado, c.numero_rac, c.data_hora, c.status,
+                    cl.nome as cliente, cl.contato as solicitante,
+                    p.nome as plantonista,
+                    {TRECHOS},
+                    proj.sigla as projeto_sigla
+                FROM chamado c
+                JOIN cliente cl ON c.id_cliente = cl.id_cliente
+                JOIN plantonista p ON c.id_plantonista = p.id_plantonista
+                JOIN projeto proj ON c.id_projeto = proj.id_projeto
+                WHERE proj.sigla = ? {filtro}
+                ORDER BY {paginacao.ORDEM_CURSOR}
+                LIMIT ?
+            """, (*parametros, limite)).fetchall()
         
-        # Converte para lista de dicionários
-        resultados = []
-        for chamado in chamados:
-            chamado_dict = dict(chamado)
-            
-            # Formata a data para exibição
-            if chamado_dict['data_hora']:
-                data_hora = datetime.strptime(chamado_dict['data_hora'], '%Y-%m-%d %H:%M:%S')
-                chamado_dict['data_formatada'] = data_hora.strftime('%d/%m/%Y %H:%M')
-            else:
-                chamado_dict['data_formatada'] = 'N/A'
-            
-            resultados.append(chamado_dict)
-        
-        return resultados
+        return _para_dicionarios(chamados)
     
-    def buscar_solucoes_similares(self, descricao_problema, limite=5):
-        """Busca soluções para problemas similares"""
-        conn = self.get_db_connection()
-        
+    def buscar_solucoes_similares(self, descricao_problema, limite=5, cursor=None):
+        """Busca soluções para problemas similares (cursor: (data_hora, id_chamado) do último exibido)"""
         # Prepara o termo de busca para LIKE
-        termo = f"%{descricao_problema}%"
+        filtro, parametros = "", [f"%{descricao_problema}%"]
+        if cursor:
+            filtro = "AND " + paginacao.FILTRO_CURSOR
+            parametros.extend(cursor)
         
-        # Busca chamados com problemas similares
-        chamados = conn.execute("""
-            SELECT 
-                c.id_chamado, c.descricao, c.solucao,
-                cl.nome as cliente,
-                c.data_hora
-            FROM chamado c
-            JOIN cliente cl ON c.id_cliente = cl.id_cliente
-            WHERE 
-                c.descricao LIKE ? AND
-                c.solucao IS NOT NULL AND
-                c.status = 'Resolvido'
-            ORDER BY c.data_hora DESC
-            LIMIT ?
-        """, (termo, limite)).fetchall()
+        with self.get_db_connection() as conn:
+            # Busca chamados com problemas similares
+            chamados = conn.execute(f"""
+                SELECT 
+                    c.id_chamado, c.numero_rac,
+                    {TRECHOS},
+                    cl.nome as cliente,
+                    c.data_hora
+                FROM chamado c
+                JOIN cliente cl ON c.id_cliente = cl.id_cliente
+                WHERE 
+                    c.descricao LIKE ? AND
+                    c.solucao IS NOT NULL AND
+                    c.status = 'Resolvido'
+                    {filtro}
+                ORDER BY {paginacao.ORDEM_CURSOR}
+                LIMIT ?
+            """, (*parametros, limite)).fetchall()
         
-        conn.close()
+        return _para_dicionarios(chamados)
+    
+    def processar_consulta_whatsapp(self, mensagem, remetente=None):
+        """Processa uma consulta recebida via WhatsApp
+
+        Cada resposta mostra uma página de TAMANHO_PAGINA chamados; "mais"
+        mostra a página seguinte da última consulta do remetente, a partir do
+        cursor guardado (sem refazer as páginas anteriores). Sem remetente não
+        há continuação. As respostas ficam no cache (cache_consultas) pela
+        versão do histórico lida antes da busca: uma alteração de chamado,
+        cliente ou projeto durante a busca muda a versão e a resposta não é
+        reaproveitada.
+        """
+        if (mensagem or '').strip().lower() == 'mais':
+            if remetente is None:
+                return "O comando 'mais' só está disponível nas conversas do WhatsApp."
+            continuacao = self.cursores.obter(remetente)
+            if continuacao is None:
+                return "Não há mais resultados da última consulta. Envie uma nova consulta."
+            comando = continuacao[0]
+            termo, exibidos = continuacao[1]['termo'], continuacao[1]['exibidos']
+            # Gravado em JSON (lista): volta a tupla para a chave do cache
+            cursor = tuple(continuacao[1]['cursor'])
+        else:
+            comando, termo = interpretar_comando(mensagem)
+            if comando is None:
+                return AJUDA
+            cursor, exibidos = None, 0
+
+        chave = (comando, termo, cursor, exibidos)
+        with self.get_db_connection() as conn:
+            versao = cache_consultas.versao_historico(conn)
+        pagina = self.cache.obter(chave, versao)
+        if pagina is None:
+            pagina = self.responder(comando, termo, cursor, exibidos)
+            self.cache.guardar(chave, versao, pagina)
+
+        resposta, proximo, quantidade = pagina
+        if remetente is None:
+            if proximo is not None:
+                resposta += "Há mais resultados. Refine sua busca para resultados mais específicos."
+        elif proximo is None:
+            self.cursores.remover(remetente)
+        else:
+            self.cursores.salvar(remetente, comando,
+                                 {'termo': termo, 'cursor': proximo, 'exibidos': exibidos + quantidade})
+            resposta += "Envie 'mais' para ver os próximos resultados."
+        return resposta
+
+    def responder(self, comando, termo, cursor=None, exibidos=0):
+        """Executa a busca do comando e formata uma página da resposta
+
+        Retorna (resposta, proximo, quantidade): proximo é o cursor da página
+        seguinte, ou None se não houver outra página: (relevancia, id_chamado)
+        do último chamado exibido na busca por texto e (data_hora, id_chamado)
+        nas demais. A relevância (bm25) depende de todo o índice, então um
+        chamado gravado entre as páginas pode deslocar a ordem da continuação.
+        """
+        # Uma linha além da página só para saber se há continuação
+        limite = TAMANHO_PAGINA + 1
         
-        # Converte para lista de dicionários
-        resultados = []
-        for chamado in chamados:
-            chamado_dict = dict(chamado)
-            
-            # Formata a data para exibição
-            if chamado_dict['data_hora']:
-                data_hora = datetime.strptime(chamado_dict['data_hora'], '%Y-%m-%d %H:%M:%S')
-                chamado_dict['data_formatada'] = data_hora.strftime('%d/%m/%Y %H:%M')
-            else:
-                chamado_dict['data_formatada'] = 'N/A'
-            
-            resultados.append(chamado_dict)
+        # Busca por texto
+        if comando == 'consultar':
+            resultados = self.buscar_por_texto(termo, limite, cursor)
+        # Busca por cliente
+        elif comando == 'cliente':
+            resultados = self.buscar_por_cliente(termo, limite, cursor)
+        # Busca por projeto
+        elif comando == 'projeto':
+            resultados = self.buscar_por_projeto(termo, limite, cursor)
+        # Busca por solução
+        elif comando == 'solucao':
+            resultados = self.buscar_solucoes_similares(termo, limite, cursor)
+        else:
+            raise ValueError(f"Comando de consulta desconhecido: {comando}")
         
-        return resultados
-    
-    def processar_consulta_whatsapp(self, mensagem):
-        """Processa uma consulta recebida via WhatsApp"""
-        # Verifica se é uma consulta
-        if mensagem.lower().startswith('consultar '):
-            # Extrai o termo de busca
-            termo = mensagem[10:].strip()
-            
-            # Realiza a busca
-            resultados = self.buscar_por_texto(termo)
-            
-            # Formata a resposta
-            if resultados:
-                resposta = f"Encontrei {len(resultados)} chamados relacionados a '{termo}':\n\n"
-                
-                for i, resultado in enumerate(resultados[:5], 1):
-                    resposta += f"{i}. {resultado['id_chamado']} - {resultado['data_formatada']}\n"
-                    resposta += f"   Cliente: {resultado['cliente']}\n"
-                    resposta += f"   Problema: {resultado['descricao'][:100]}...\n"
-                    if resultado['solucao']:
-                        resposta += f"   Solução: {resultado['solucao'][:100]}...\n"
-                    resposta += "\n"
-                
-                if len(resultados) > 5:
-                    resposta += f"E mais {len(resultados) - 5} resultados. Refine sua busca para resultados mais específicos."
-            else:
-                resposta = f"Não encontrei chamados relacionados a '{termo}'. Tente outros termos."
-            
-            return resposta
+        pagina = resultados[:TAMANHO_PAGINA]
+        proximo = None
+        if len(resultados) > TAMANHO_PAGINA:
+            ultimo = pagina[-1]
+            chave = 'relevancia' if comando == 'consultar' else 'data_hora'
+            proximo = (ultimo[chave], ultimo['id_chamado'])
         
-        # Verifica se é uma busca por cliente
-        elif mensagem.lower().startswith('cliente '):
-            # Extrai o nome do cliente
-            nome_cliente = mensagem[8:].strip()
-            
-            # Realiza a busca
-            resultados = self.buscar_por_cliente(nome_cliente)
-            
-            # Formata a resposta
-            if resultados:
-                resposta = f"Encontrei {len(resultados)} chamados para o cliente '{nome_cliente}':\n\n"
-                
-                for i, resultado in enumerate(resultados[:5], 1):
-                    resposta += f"{i}. {resultado['id_chamado']} - {resultado['data_formatada']}\n"
-                    resposta += f"   Problema: {resultado['descricao'][:100]}...\n"
-                    resposta += f"   Status: {resultado['status']}\n\n"
-                
-                if len(resultados) > 5:
-                    resposta += f"E mais {len(resultados) - 5} chamados."
+        if not pagina:
+            if exibidos:
+                resposta = "Não há mais resultados da última consulta."
+            elif comando == 'consultar':
+                resposta = f"Não encontrei chamados relacionados a '{termo}'. Tente outros termos."
+            elif comando == 'solucao':
+                resposta = f"Não encontrei soluções para problemas similares a '{termo}'."
             else:
-                resposta = f"Não encontrei chamados para o cliente '{nome_cliente}'."
-            
-            return resposta
+                resposta = f"Não encontrei chamados para o {comando} '{termo}'."
+            return resposta, None, 0
         
-        # Verifica se é uma busca por projeto
-        elif mensagem.lower().startswith('projeto '):
-            # Extrai a sigla do projeto
-            sigla_projeto = mensagem[8:].strip()
-            
-            # Realiza a busca
-            resultados = self.buscar_por_projeto(sigla_projeto)
-            
-            # Formata a resposta
-            if resultados:
-                resposta = f"Encontrei {len(resultados)} chamados para o projeto '{sigla_projeto}':\n\n"
-                
-                for i, resultado in enumerate(resultados[:5], 1):
-                    resposta += f"{i}. {resultado['id_chamado']} - {resultado['data_formatada']}\n"
-                    resposta += f"   Cliente: {resultado['cliente']}\n"
-                    resposta += f"   Problema: {resultado['descricao'][:100]}...\n"
-                    resposta += f"   Status: {resultado['status']}\n\n"
-                
-                if len(resultados) > 5:
-                    resposta += f"E mais {len(resultados) - 5} chamados."
-            else:
-                resposta = f"Não encontrei chamados para o projeto '{sigla_projeto}'."
-            
-            return resposta
+        # Formata a resposta
+        if comando == 'consultar':
+            resposta = f"Chamados relacionados a '{termo}':\n\n"
+        elif comando == 'solucao':
+            resposta = "Soluções para problemas similares:\n\n"
+        else:
+            resposta = f"Chamados para o {comando} '{termo}':\n\n"
         
-        # Verifica se é uma busca por solução
-        elif mensagem.lower().startswith('solucao ') or mensagem.lower().startswith('solução '):
-            # Extrai a descrição do problema
-            problema = mensagem[8:].strip()
-            
-            # Realiza a busca
-            resultados = self.buscar_solucoes_similares(problema)
-            
-            # Formata a resposta
-            if resultados:
-                resposta = f"Encontrei {len(resultados)} soluções para problemas similares:\n\n"
-                
-                for i, resultado in enumerate(resultados, 1):
-                    resposta += f"{i}. {resultado['id_chamado']} - {resultado['data_formatada']}\n"
-                    resposta += f"   Problema: {resultado['descricao'][:100]}...\n"
-                    resposta += f"   Solução: {resultado['solucao'][:150]}...\n\n"
+        for i, resultado in enumerate(pagina, exibidos + 1):
+            resposta += f"{i}. {resultado['numero_rac']} - {resultado['data_formatada']}\n"
+            if comando in ('consultar', 'projeto'):
+                resposta += f"   Cliente: {resultado['cliente']}\n"
+            resposta += f"   Problema: {resultado['descricao']}...\n"
+            if comando == 'consultar':
+                resposta += f"   Trecho: {resultado['trecho']}\n"
+                if resultado['solucao']:
+                    resposta += f"   Solução: {resultado['solucao'][:100]}...\n"
+            elif comando == 'solucao':
+                resposta += f"   Solução: {resultado['solucao']}...\n"
             else:
-                resposta = f"Não encontrei soluções para problemas similares a '{problema}'."
-            
-            return resposta
+                resposta += f"   Status: {resultado['status']}\n"
+            resposta += "\n"
         
-        # Se não for uma consulta válida
-        else:
-            return """
-            Para consultar o histórico, use um dos seguintes formatos:
-            
-            - consultar [termo]: Busca chamados com o termo especificado
-            - cliente [nome]: Busca chamados de um cliente específico
-            - projeto [sigla]: Busca chamados de um projeto específico
-            - solução [problema]: Busca soluções para problemas similares
-            """
+        return resposta, proximo, len(pagina)
 
 # Função para testar a consulta histórica
 def test_consulta_historica():
@@ -305,7 +342,7 @@ def test_consulta_historica():
     resultados = consulta.buscar_por_texto("servidor")
     print(f"Encontrados {len(resultados)} resultados para 'servidor'")
     for resultado in resultados[:2]:
-        print(f"- {resultado['id_chamado']} - {resultado['cliente']} - {resultado['descricao'][:50]}...")
+        print(f"- {resultado['numero_rac']} - {resultado['cliente']} - {resultado['descricao'][:50]}...")
     
     # Testa processamento de consulta via WhatsApp
     print("\n=== Teste de processamento de consulta via WhatsApp ===")
@@ -321,6 +358,10 @@ def test_consulta_historica():
         print(f"\nMensagem: {mensagem}")
         resposta = consulta.processar_consulta_whatsapp(mensagem)
         print(f"Resposta: {resposta[:150]}...")
+    
+    estatisticas = consulta.cache.estatisticas()
+    print(f"\nCache: {estatisticas['acertos']} acertos, {estatisticas['falhas']} falhas "
+          f"(taxa de acerto {estatisticas['taxa_acerto']}), {estatisticas['itens']} respostas guardadas")
 
 if __name__ == "__main__":
     test_consulta_historica()
@@ -0,0 +1,206 @@
+import os
+import re
+import sqlite3
+import sys
+import threading
+import weakref
+from contextlib import contextmanager
+
+# Caminho padrão do banco de dados
+DB_PATH = 'chamados.db'
+
+# Tempo máximo (ms) que uma conexão espera por um lock antes de falhar
+BUSY_TIMEOUT_MS = 5000
+
+# Arquivos de schema, na ordem em que devem ser aplicados a um banco novo.
+# Arquivos novos entram sempre no fim: o banco guarda em PRAGMA user_version
+# quantos deles já recebeu
+SCHEMAS = [
+    'schema.sql',
+    'schema_projeto.sql',
+    'schema_busca.sql',
+    'schema_indices.sql',
+    'schema_estatisticas.sql',
+    'schema_rac.sql',
+    'schema_relatorio.sql',
+    'schema_envio.sql',
+    'schema_whatsapp.sql',
+    'schema_conversa.sql',
+    'schema_cadastros.sql',
+    'schema_importacao.sql',
+    'schema_ingestao.sql',
+    'schema_importacao_whatsapp.sql',
+    'schema_historico.sql',
+    'schema_importacao_whatsapp_posicao.sql',
+    'schema_consulta_cursor.sql',
+]
+
+# Schemas dos bancos criados antes do controle de versão (pelo run.sh); os
+# demais podem ser reaplicados e são executados novamente na atualização
+SCHEMAS_INICIAIS = 2
+
+# Colunas adicionadas por ALTER TABLE nos schemas (ignoradas quando já existem)
+_ADICIONA_COLUNA = re.compile(r'^\s*ALTER\s+TABLE\s+(\w+)\s+ADD\s+COLUMN\s+(\w+)', re.IGNORECASE)
+
+# Pragmas aplicados a cada conexão aberta pelo pool
+PRAGMAS = [
+    ('journal_mode', 'WAL'),
+    ('busy_timeout', BUSY_TIMEOUT_MS),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),        # ~16 MB de cache de páginas
+    ('mmap_size', 268435456),      # 256 MB mapeados em memória
+    ('temp_store', 'MEMORY'),
+]
+
+class _PooledConnection(sqlite3.Connection):
+    """Conexão do pool (subclasse apenas para permitir referências fracas)"""
+
+class ConnectionPool:
+    """Mantém uma conexão SQLite reutilizável por thread para um arquivo de banco"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Referências fracas: conexões de threads encerradas são liberadas pelo GC
+        self._connections = weakref.WeakSet()
+        self._geracao = 0
+
+    def _connect(self):
+        """Abre uma nova conexão e aplica os pragmas de desempenho"""
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000,
+                               factory=_PooledConnection)
+        conn.row_factory = sqlite3.Row
+        for nome, valor in PRAGMAS:
+            conn.execute(f"PRAGMA {nome} = {valor}")
+
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Empresta a conexão da thread atual
+
+        Chamadas aninhadas na mesma thread compartilham a conexão e a transação;
+        apenas o bloco mais externo faz commit (ou rollback em caso de erro).
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.geracao != self._geracao:
+            # Primeira utilização na thread ou pool fechado desde então
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.geracao = self._geracao
+            self._local.depth = 0
+
+        self._local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            if self._local.depth == 1 and conn.in_transaction:
+                conn.rollback()
+            raise
+        else:
+            if self._local.depth == 1 and conn.in_transaction:
+                conn.commit()
+        finally:
+            self._local.depth -= 1
+
+    def close_all(self):
+        """Fecha todas as conexões abertas pelo pool"""
+        with self._lock:
+            connections = list(self._connections)
+            self._connections = weakref.WeakSet()
+            self._geracao += 1
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Conexões de outras threads não podem ser fechadas daqui
+                pass
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path=None):
+    """Retorna o pool associado ao arquivo de banco, criando-o se necessário"""
+    chave = os.path.abspath(db_path or DB_PATH)
+    with _pools_lock:
+        pool = _pools.get(chave)
+        if pool is None:
+            pool = ConnectionPool(chave)
+            _pools[chave] = pool
+        return pool
+
+def get_db_connection(db_path=None):
+    """Retorna um gerenciador de contexto com a conexão compartilhada da thread
+
+    Uso:
+        with get_db_connection() as conn:
+            conn.execute(...)
+    """
+    return get_pool(db_path).connection()
+
+def close_all_pools():
+    """Fecha as conexões de todos os pools (útil em testes e no encerramento)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+def _sem_colunas_existentes(conn, script):
+    """Remove do script os ALTER TABLE ... ADD COLUMN de colunas que a tabela já tem"""
+    instrucoes = []
+    atual = ''
+    for linha in script.splitlines(keepends=True):
+        atual += linha
+        if sqlite3.complete_statement(atual):
+            instrucoes.append(atual)
+            atual = ''
+    instrucoes.append(atual)
+
+    def aplicar(instrucao):
+        # Comentários antes da instrução não impedem o reconhecimento do ALTER
+        codigo = '\n'.join(l for l in instrucao.splitlines() if not l.lstrip().startswith('--'))
+        coluna = _ADICIONA_COLUNA.match(codigo)
+        if coluna is None:
+            return True
+        tabela, nome = coluna.groups()
+        return conn.execute("SELECT 1 FROM pragma_table_info(?) WHERE name = ?",
+                            (tabela, nome)).fetchone() is None
+
+    return ''.join(i for i in instrucoes if aplicar(i))
+
+def aplicar_schemas(conn, schemas=None):
+    """Executa os arquivos de schema na conexão
+
+    Com uma lista, executa os arquivos informados. Sem ela, atualiza o banco:
+    aplica os arquivos de SCHEMAS que ele ainda não recebeu (todos, em um banco
+    novo) e registra a versão em PRAGMA user_version. Colunas já existentes
+    não são adicionadas de novo, então os arquivos podem ser reaplicados.
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    if schemas is None:
+        versao = conn.execute("PRAGMA user_version").fetchone()[0]
+        if versao == 0 and conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chamado'").fetchone():
+            # Banco anterior ao controle de versão
+            versao = SCHEMAS_INICIAIS
+        pendentes = SCHEMAS[versao:]
+    else:
+        pendentes = schemas
+
+    for nome in pendentes:
+        with open(os.path.join(base_dir, nome), 'r') as f:
+            conn.executescript(_sem_colunas_existentes(conn, f.read()))
+
+    if schemas is None:
+        conn.execute(f"PRAGMA user_version = {len(SCHEMAS)}")
+
+if __name__ == '__main__':
+    # Atualiza um banco existente: python database.py [chamados.db]
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else DB_PATH)
+    aplicar_schemas(conn)
+    print(f"Banco atualizado (versão {conn.execute('PRAGMA user_version').fetchone()[0]})")
+    conn.close()
@@ -0,0 +1,141 @@
+import time
+import queue
+import threading
+from contextlib import contextmanager
+
+class LimiteTaxa:
+    """Balde de fichas (token bucket): até `taxa` operações por segundo, com rajada
+
+    aguardar() bloqueia a thread até haver uma ficha disponível. Pode ser
+    compartilhado entre threads.
+    """
+
+    def __init__(self, taxa, rajada=1):
+        self.taxa = float(taxa)
+        self.capacidade = float(max(rajada, 1))
+        self.fichas = self.capacidade
+        self.ultima = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        """Consome uma ficha, esperando o tempo necessário; retorna a espera em segundos"""
+        with self._lock:
+            agora = time.monotonic()
+            self.fichas = min(self.capacidade, self.fichas + (agora - self.ultima) * self.taxa)
+            self.ultima = agora
+            self.fichas -= 1
+            # Com saldo negativo, a ficha reservada só fica disponível no futuro
+            espera = -self.fichas / self.taxa if self.fichas < 0 else 0.0
+
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+
+class LimiteBytes:
+    """Limite de bytes em trânsito compartilhado entre threads
+
+    reservar(n) bloqueia até que os envios em andamento somem no máximo
+    `capacidade` bytes com o novo; um envio maior que a capacidade passa
+    sozinho. `pico` registra o maior total reservado ao mesmo tempo.
+    """
+
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self.em_uso = 0
+        self.pico = 0
+        self._condicao = threading.Condition()
+
+    @contextmanager
+    def reservar(self, quantidade):
+        """Reserva `quantidade` bytes enquanto durar o bloco with"""
+        quantidade = min(quantidade, self.capacidade)
+        with self._condicao:
+            self._condicao.wait_for(lambda: self.em_uso + quantidade <= self.capacidade)
+            self.em_uso += quantidade
+            self.pico = max(self.pico, self.em_uso)
+        try:
+            yield
+        finally:
+            with self._condicao:
+                self.em_uso -= quantidade
+                self._condicao.notify_all()
+
+class Canal:
+    """Canal de envio com concorrência limitada, limite de taxa e estatísticas
+
+    Cada vaga de concorrência pode ter um recurso próprio (por exemplo, uma
+    sessão SMTP), criado por `fabrica_recurso` no primeiro uso da vaga e
+    reaproveitado pelos envios seguintes; fechar() encerra os recursos.
+    """
+
+    def __init__(self, nome, concorrencia=1, taxa=None, rajada=1, fabrica_recurso=None):
+        self.nome = nome
+        self.limite = LimiteTaxa(taxa, rajada) if taxa else None
+        self.fabrica_recurso = fabrica_recurso
+        self.latencias = []
+        self._lock = threading.Lock()
+
+        # Fila de vagas: cada get() ocupa uma vaga (e seu recurso) até o put()
+        self._vagas = queue.Queue()
+        for _ in range(concorrencia):
+            self._vagas.put(None)
+        self._recursos = []
+
+    @contextmanager
+    def reservar(self):
+        """Ocupa uma vaga do canal e respeita o limite de taxa; retorna o recurso da vaga"""
+        recurso = self._vagas.get()
+        inicio = None
+        try:
+            if recurso is None and self.fabrica_recurso is not None:
+                recurso = self.fabrica_recurso()
+                with self._lock:
+                    self._recursos.append(recurso)
+            if self.limite is not None:
+                self.limite.aguardar()
+            inicio = time.monotonic()
+            yield recurso
+        finally:
+            if inicio is not None:
+                with self._lock:
+                    self.latencias.append(time.monotonic() - inicio)
+            self._vagas.put(recurso)
+
+    def fechar(self):
+        """Encerra os recursos criados pelas vagas do canal"""
+        with self._lock:
+            recursos, self._recursos = self._recursos, []
+        for recurso in recursos:
+            recurso.fechar()
+
+    def estatisticas(self):
+        """Quantidade de envios e latências (ms) média, p95 e máxima do canal"""
+        with self._lock:
+            latencias = sorted(self.latencias)
+
+        if not latencias:
+            return {'envios': 0}
+
+        return {
+            'envios': len(latencias),
+            'latencia_media_ms': round(sum(latencias) * 1000 / len(latencias), 1),
+            'latencia_p95_ms': round(latencias[int(0.95 * (len(latencias) - 1))] * 1000, 1),
+            'latencia_max_ms': round(latencias[-1] * 1000, 1)
+        }
+
+def resumir(resultados, canais, duracao):
+    """Estatísticas agregadas de um despacho: totais, vazão e latência por canal"""
+    por_metodo = {}
+    for resultado in resultados:
+        por_metodo[resultado['metodo']] = por_metodo.get(resultado['metodo'], 0) + 1
+
+    falhas = por_metodo.get('Falha', 0)
+    return {
+        'total': len(resultados),
+        'enviados': len(resultados) - falhas,
+        'falhas': falhas,
+        'por_metodo': por_metodo,
+        'duracao_s': round(duracao, 3),
+        'relatorios_por_segundo': round(len(resultados) / duracao, 2) if duracao > 0 else None,
+        'canais': {nome: canal.estatisticas() for nome, canal in canais.items()}
+    }
@@ -0,0 +1,125 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+import database
+
+# Conversa sem resposta por mais tempo que isso é descartada (segundos)
+TTL_PADRAO = 24 * 3600
+
+# Máximo de conversas em andamento mantidas pelo armazenamento
+MAX_CONVERSAS_PADRAO = 10000
+
+class EstadoMemoria:
+    """Estado das conversas do bot em memória, com validade e limite de tamanho
+
+    Cada remetente tem o passo atual do formulário e os dados já informados.
+    Conversas paradas há mais de `ttl` segundos expiram e, acima de
+    `max_conversas`, as usadas há mais tempo são descartadas (LRU). Serve para
+    um único processo; para vários, use EstadoSQLite.
+    """
+
+    def __init__(self, ttl=TTL_PADRAO, max_conversas=MAX_CONVERSAS_PADRAO):
+        self.ttl = ttl
+        self.max_conversas = max_conversas
+        # remetente -> (estado, formulario, atualizado_em), da menos para a mais recente
+        self.conversas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, remetente):
+        """Retorna (estado, formulario) da conversa em andamento ou None"""
+        with self._lock:
+            conversa = self.conversas.get(remetente)
+            if conversa is None:
+                return None
+            if time.monotonic() - conversa[2] > self.ttl:
+                del self.conversas[remetente]
+                return None
+            self.conversas.move_to_end(remetente)
+            return conversa[0], dict(conversa[1])
+
+    def salvar(self, remetente, estado, formulario):
+        """Grava o passo atual e os dados do formulário do remetente"""
+        with self._lock:
+            agora = time.monotonic()
+            self.conversas[remetente] = (estado, dict(formulario), agora)
+            self.conversas.move_to_end(remetente)
+
+            # As usadas há mais tempo ficam no início: expiradas e excedentes saem de lá
+            while self.conversas:
+                _, (_, _, atualizado_em) = next(iter(self.conversas.items()))
+                if len(self.conversas) <= self.max_conversas and agora - atualizado_em <= self.ttl:
+                    break
+                self.conversas.popitem(last=False)
+
+    def remover(self, remetente):
+        """Encerra a conversa do remetente"""
+        with self._lock:
+            self.conversas.pop(remetente, None)
+
+class EstadoSQLite:
+    """Estado das conversas do bot na tabela `conversa` do banco
+
+    Sobrevive a reinícios e é compartilhado entre vários processos do bot
+    (por exemplo, atrás de um balanceador). Cada operação é uma consulta pela
+    chave primária (remetente). Conversas expiradas e as excedentes de
+    `max_conversas` (as atualizadas há mais tempo) são removidas a cada
+    `intervalo_limpeza` gravações. `tabela` escolhe outra tabela com as mesmas
+    colunas (ex.: consulta_cursor, com outra validade).
+    """
+
+    def __init__(self, db_path=None, ttl=TTL_PADRAO, max_conversas=MAX_CONVERSAS_PADRAO, intervalo_limpeza=100,
+                 tabela='conversa'):
+        self.db_path = db_path
+        self.tabela = tabela
+        self.ttl = ttl
+        self.max_conversas = max_conversas
+        self.intervalo_limpeza = intervalo_limpeza
+        self._gravacoes = 0
+        self._lock = threading.Lock()
+
+    def obter(self, remetente):
+        """Retorna (estado, formulario) da conversa em andamento ou None"""
+        with database.get_db_connection(self.db_path) as conn:
+            linha = conn.execute(f"""
+                SELECT estado, formulario FROM {self.tabela}
+                WHERE remetente = ? AND atualizado_em >= ?
+            """, (remetente, time.time() - self.ttl)).fetchone()
+        if linha is None:
+            return None
+        return linha['estado'], json.loads(linha['formulario'])
+
+    def salvar(self, remetente, estado, formulario):
+        """Grava o passo atual e os dados do formulário do remetente"""
+        with database.get_db_connection(self.db_path) as conn:
+            conn.execute(f"""
+                INSERT INTO {self.tabela} (remetente, estado, formulario, atualizado_em)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (remetente) DO UPDATE SET
+                    estado = excluded.estado,
+                    formulario = excluded.formulario,
+                    atualizado_em = excluded.atualizado_em
+            """, (remetente, estado, json.dumps(formulario), time.time()))
+
+        with self._lock:
+            self._gravacoes += 1
+            limpar = self._gravacoes % self.intervalo_limpeza == 0
+        if limpar:
+            self.limpar()
+
+    def remover(self, remetente):
+        """Encerra a conversa do remetente"""
+        with database.get_db_connection(self.db_path) as conn:
+            conn.execute(f"DELETE FROM {self.tabela} WHERE remetente = ?", (remetente,))
+
+    def limpar(self):
+        """Remove as conversas expiradas e as excedentes; retorna quantas foram removidas"""
+        with database.get_db_connection(self.db_path) as conn:
+            removidas = conn.execute(f"DELETE FROM {self.tabela} WHERE atualizado_em < ?",
+                                     (time.time() - self.ttl,)).rowcount
+            removidas += conn.execute(f"""
+                DELETE FROM {self.tabela} WHERE remetente IN (
+                    SELECT remetente FROM {self.tabela} ORDER BY atualizado_em DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_conversas,)).rowcount
+        return removidas
@@ -0,0 +1,99 @@
+import sys
+import database
+
+# Agregação completa da tabela chamado (a mesma usada em schema_estatisticas.sql);
+# só é executada na reconstrução e na verificação, nunca nas requisições
+SQL_AGREGACAO = """
+    SELECT id_projeto, IFNULL(status, '') as status, COUNT(*) as total,
+           IFNULL(SUM(tempo_atendimento), 0) as soma_tempo,
+           COUNT(tempo_atendimento) as total_com_tempo
+    FROM chamado
+    WHERE id_projeto IS NOT NULL
+    GROUP BY id_projeto, IFNULL(status, '')
+"""
+
+def obter_estatisticas(conn):
+    """Lê as estatísticas dos projetos da tabela estatistica_projeto"""
+    # Total de chamados por projeto
+    chamados_por_projeto = conn.execute('''
+        SELECT p.sigla, p.nome, IFNULL(SUM(e.total), 0) as total_chamados
+        FROM projeto p
+        LEFT JOIN estatistica_projeto e ON p.id_projeto = e.id_projeto
+        GROUP BY p.id_projeto
+        ORDER BY total_chamados DESC
+    ''').fetchall()
+
+    # Tempo médio de atendimento por projeto
+    tempo_medio_por_projeto = conn.execute('''
+        SELECT p.sigla, p.nome,
+               CAST(SUM(e.soma_tempo) AS REAL) / SUM(e.total_com_tempo) as tempo_medio
+        FROM projeto p
+        JOIN estatistica_projeto e ON p.id_projeto = e.id_projeto
+        GROUP BY p.id_projeto
+        HAVING SUM(e.total_com_tempo) > 0
+        ORDER BY tempo_medio DESC
+    ''').fetchall()
+
+    # Status dos chamados por projeto
+    status_por_projeto = conn.execute('''
+        SELECT p.sigla, e.status, e.total
+        FROM estatistica_projeto e
+        JOIN projeto p ON p.id_projeto = e.id_projeto
+        WHERE e.total > 0
+        ORDER BY p.sigla, e.status
+    ''').fetchall()
+
+    return {
+        'chamados_por_projeto': [dict(item) for item in chamados_por_projeto],
+        'tempo_medio_por_projeto': [dict(item) for item in tempo_medio_por_projeto],
+        'status_por_projeto': [dict(item) for item in status_por_projeto]
+    }
+
+def verificar_estatisticas(conn):
+    """Compara a tabela de estatísticas com a agregação real dos chamados
+
+    Retorna a lista de divergências (vazia quando tudo confere).
+    """
+    divergencias = conn.execute(f'''
+        SELECT 'esperado' as origem, * FROM (
+            {SQL_AGREGACAO}
+            EXCEPT
+            SELECT id_projeto, status, total, soma_tempo, total_com_tempo
+            FROM estatistica_projeto WHERE total > 0
+        )
+        UNION ALL
+        SELECT 'armazenado' as origem, * FROM (
+            SELECT id_projeto, status, total, soma_tempo, total_com_tempo
+            FROM estatistica_projeto WHERE total > 0
+            EXCEPT
+            {SQL_AGREGACAO}
+        )
+    ''').fetchall()
+
+    return [dict(item) for item in divergencias]
+
+def reconstruir_estatisticas(conn):
+    """Recalcula toda a tabela estatistica_projeto a partir dos chamados"""
+    conn.execute('DELETE FROM estatistica_projeto')
+    conn.execute(f'''
+        INSERT INTO estatistica_projeto (id_projeto, status, total, soma_tempo, total_com_tempo)
+        {SQL_AGREGACAO}
+    ''')
+
+# Uso: python estatisticas_projeto.py [verificar|reconstruir] [caminho_do_banco]
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) > 1 else 'verificar'
+    db_path = sys.argv[2] if len(sys.argv) > 2 else 'chamados.db'
+
+    with database.get_db_connection(db_path) as conn:
+        if comando == 'reconstruir':
+            reconstruir_estatisticas(conn)
+            print("Estatísticas dos projetos reconstruídas com sucesso!")
+        else:
+            divergencias = verificar_estatisticas(conn)
+            if divergencias:
+                print(f"Encontradas {len(divergencias)} divergências:")
+                for item in divergencias:
+                    print(f"- {item}")
+                sys.exit(1)
+            print("Estatísticas dos projetos consistentes.")
@@ -0,0 +1,58 @@
+import csv
+import io
+import paginacao
+
+# Tamanho aproximado (em caracteres) de cada bloco enviado na resposta
+TAMANHO_BLOCO = 64 * 1024
+
+# Projetos ativos com o total de chamados (lido da tabela estatistica_projeto)
+CONSULTA_PROJETOS = '''
+    SELECT p.sigla, p.nome, p.gerente, p.email_gerente, p.telefone_gerente,
+           IFNULL(SUM(e.total), 0) as total_chamados
+    FROM projeto p
+    LEFT JOIN estatistica_projeto e ON p.id_projeto = e.id_projeto
+    WHERE p.ativo = 1
+    GROUP BY p.id_projeto
+    ORDER BY p.sigla
+'''
+
+CONSULTA_CHAMADOS = '''
+    SELECT c.id_chamado, c.numero_rac, c.data_hora, c.status, c.prioridade, c.tipo,
+           cl.nome as cliente, p.nome as plantonista, cat.nome as categoria,
+           proj.sigla as projeto, c.descricao, c.solucao,
+           c.tempo_atendimento, c.data_fechamento
+    FROM chamado c
+    JOIN cliente cl ON c.id_cliente = cl.id_cliente
+    JOIN plantonista p ON c.id_plantonista = p.id_plantonista
+    LEFT JOIN categoria cat ON c.id_categoria = cat.id_categoria
+    LEFT JOIN projeto proj ON c.id_projeto = proj.id_projeto
+'''
+
+def montar_consulta_chamados(filtros_busca):
+    """Monta a consulta de exportação de chamados com filtros opcionais
+
+    Usa o mesmo montador da listagem de chamados (paginacao.montar_consulta_chamados),
+    com as colunas da exportação. Retorna (query, parametros).
+    """
+    return paginacao.montar_consulta_chamados(filtros_busca, consulta=CONSULTA_CHAMADOS)
+
+def gerar_csv(cursor):
+    """Converte as linhas de um cursor SQLite em blocos de texto CSV
+
+    O cabeçalho vem de cursor.description e o primeiro bloco começa com o BOM
+    UTF-8, para o Excel reconhecer a codificação (como o antigo utf-8-sig).
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    buffer.write('\ufeff')
+    escritor.writerow([coluna[0] for coluna in cursor.description])
+
+    for linha in cursor:
+        escritor.writerow(linha)
+        if buffer.tell() >= TAMANHO_BLOCO:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
@@ -0,0 +1,100 @@
+import queue
+import threading
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+class FilaPorRemetente:
+    """Fila de mensagens processadas em paralelo, em ordem para cada remetente
+
+    enfileirar() apenas guarda a mensagem e retorna; um pool de `workers`
+    threads chama processar(remetente, mensagem). Mensagens de um mesmo
+    remetente ficam em uma fila própria, consumida por uma thread de cada vez
+    (ordem estrita), enquanto remetentes diferentes são atendidos em paralelo.
+    Depois de `lote` mensagens seguidas, o remetente volta para o fim da fila do
+    pool para não monopolizar uma thread.
+    """
+
+    def __init__(self, processar, workers=8, max_pendentes=10000, lote=20, ids_recentes=10000):
+        self.processar = processar
+        self.max_pendentes = max_pendentes
+        self.lote = lote
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fila-mensagens')
+
+        self.filas = {}
+        self.pendentes = 0
+        self.processadas = 0
+        self.erros = 0
+        # Ids já recebidos (reenvios do provedor são ignorados), limitados aos mais recentes
+        self.ids = OrderedDict()
+        self.max_ids = ids_recentes
+        self._condicao = threading.Condition()
+
+    def enfileirar(self, remetente, mensagem, id_mensagem=None):
+        """Guarda a mensagem para processamento; retorna False se o id já foi recebido
+
+        Lança queue.Full quando há max_pendentes mensagens aguardando.
+        """
+        with self._condicao:
+            if id_mensagem is not None and id_mensagem in self.ids:
+                return False
+            # Recusada antes de registrar o id: o reenvio do provedor será aceito
+            if self.pendentes >= self.max_pendentes:
+                raise queue.Full(f"{self.pendentes} mensagens aguardando processamento")
+            if id_mensagem is not None:
+                self.ids[id_mensagem] = True
+                if len(self.ids) > self.max_ids:
+                    self.ids.popitem(last=False)
+
+            fila = self.filas.get(remetente)
+            agendar = fila is None
+            if agendar:
+                fila = self.filas[remetente] = deque()
+            fila.append(mensagem)
+            self.pendentes += 1
+
+        if agendar:
+            self.executor.submit(self._consumir, remetente)
+        return True
+
+    def _consumir(self, remetente):
+        """Processa as mensagens do remetente em ordem, até `lote` por vez"""
+        for _ in range(self.lote):
+            with self._condicao:
+                fila = self.filas[remetente]
+                if not fila:
+                    del self.filas[remetente]
+                    return
+                mensagem = fila[0]
+
+            try:
+                self.processar(remetente, mensagem)
+            except Exception:
+                traceback.print_exc()
+                with self._condicao:
+                    self.erros += 1
+            finally:
+                with self._condicao:
+                    # A mensagem só sai da fila depois de processada: novas mensagens do
+                    # remetente continuam sendo anexadas a esta fila, e não agendadas em paralelo
+                    fila.popleft()
+                    self.pendentes -= 1
+                    self.processadas += 1
+                    self._condicao.notify_all()
+
+        # Lote esgotado: volta para o fim da fila do pool (ou encerra, se não há mais nada)
+        with self._condicao:
+            if not self.filas[remetente]:
+                del self.filas[remetente]
+                return
+        self.executor.submit(self._consumir, remetente)
+
+    def aguardar(self, timeout=None):
+        """Espera todas as mensagens enfileiradas serem processadas; retorna False no timeout"""
+        with self._condicao:
+            return self._condicao.wait_for(lambda: self.pendentes == 0, timeout)
+
+    def fechar(self):
+        """Processa o que já foi enfileirado e encerra as threads"""
+        self.aguardar()
+        self.executor.shutdown()
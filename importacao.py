@@ -0,0 +1,447 @@
+import re
+import csv
+import sys
+import json
+import time
+import sqlite3
+import itertools
+from contextlib import contextmanager
+from datetime import datetime
+import database
+import numeracao
+from cadastros import CONSULTAS, normalizar
+from estatisticas_projeto import reconstruir_estatisticas
+
+# Chamados gravados por transação (um executemany por lote); com o sistema em
+# uso, lotes menores para não segurar o lock de escrita dos demais processos
+TAMANHO_LOTE_PADRAO = 5000
+TAMANHO_LOTE_CONCORRENTE = 500
+
+# Triggers de INSERT em chamado adiados durante a carga: índice de busca,
+# estatísticas por projeto, avanço da sequência de RACs informados e versão do
+# histórico (cache das consultas)
+TRIGGERS_ADIADOS = ('chamado_fts_insert', 'estatistica_projeto_insert', 'chamado_numero_rac_informado',
+                    'historico_chamado_insert')
+
+# Valores aceitos (sem diferenciar maiúsculas de minúsculas) -> valor gravado
+PRIORIDADES = {valor.lower(): valor for valor in ('Baixa', 'Média', 'Alta', 'Crítica')}
+STATUS = {valor.lower(): valor for valor in ('Aberto', 'Em Andamento', 'Resolvido', 'Pendente', 'Escalado')}
+
+# Formatos de data aceitos além do ISO (AAAA-MM-DD[ HH:MM[:SS]])
+FORMATOS_DATA = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y')
+
+SQL_INSERIR_CHAMADO = """
+    INSERT INTO chamado (
+        numero_rac, id_cliente, id_plantonista, id_categoria, id_projeto, data_hora,
+        tipo, prioridade, descricao, ambiente, tempo_ocorrencia, analise, procedimentos,
+        solucao, status, observacoes, recomendacoes, data_fechamento, tempo_atendimento
+    ) VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?, ?, ?, ?, ?,
+              COALESCE(?, 'Aberto'), ?, ?, ?, ?)
+"""
+
+# Campos de texto copiados como estão para o chamado
+CAMPOS_TEXTO = ('tipo', 'descricao', 'ambiente', 'tempo_ocorrencia', 'analise', 'procedimentos',
+                'solucao', 'observacoes', 'recomendacoes')
+
+def ler_registros(arquivo, formato):
+    """Lê os chamados de um arquivo de texto aberto, um por vez
+
+    formato é 'csv' (cabeçalho na primeira linha, separado por vírgula ou
+    ponto e vírgula) ou 'jsonl' (um objeto JSON por linha). Gera pares
+    (número_da_linha, registro); linhas JSON inválidas geram registro None.
+    """
+    if formato == 'csv':
+        primeira = arquivo.readline().lstrip('\ufeff')
+        separador = ';' if primeira.count(';') > primeira.count(',') else ','
+        leitor = csv.DictReader(itertools.chain([primeira], arquivo), delimiter=separador)
+        for registro in leitor:
+            yield leitor.line_num, registro
+    elif formato == 'jsonl':
+        for numero, linha in enumerate(arquivo, start=1):
+            if not linha.strip():
+                continue
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                registro = None
+            yield numero, registro if isinstance(registro, dict) else None
+    else:
+        raise ValueError(f"Formato de importação não suportado: {formato}")
+
+def formato_do_arquivo(caminho):
+    """Formato de importação pela extensão do arquivo"""
+    return 'csv' if caminho.lower().endswith('.csv') else 'jsonl'
+
+def _texto(registro, *campos):
+    """Primeiro campo preenchido do registro, como texto sem espaços nas pontas"""
+    for campo in campos:
+        valor = registro.get(campo)
+        if valor is not None:
+            valor = (valor if isinstance(valor, str) else str(valor)).strip()
+            if valor:
+                return valor
+    return None
+
+def _data(valor, campo):
+    """Converte a data para o formato do SQLite (AAAA-MM-DD HH:MM:SS)"""
+    if valor is None:
+        return None
+    try:
+        data = datetime.fromisoformat(valor)
+        if len(valor) == 19:
+            # Já no formato AAAA-MM-DD HH:MM:SS (ou com T): só troca o separador
+            return valor[:10] + ' ' + valor[11:]
+    except ValueError:
+        for formato in FORMATOS_DATA:
+            try:
+                data = datetime.strptime(valor, formato)
+                break
+            except ValueError:
+                pass
+        else:
+            raise ValueError(f"{campo} inválida: {valor}")
+    return data.strftime('%Y-%m-%d %H:%M:%S')
+
+def _opcao(valor, opcoes, campo):
+    """Valor gravado para a opção informada, sem diferenciar maiúsculas de minúsculas"""
+    if valor is None:
+        return None
+    opcao = opcoes.get(valor.lower())
+    if opcao is None:
+        raise ValueError(f"{campo} inválido: {valor}")
+    return opcao
+
+def minutos_entre(inicio, fim):
+    """Minutos entre duas datas, arredondados como o ROUND de calcula_tempo_atendimento"""
+    minutos = (datetime.fromisoformat(fim) - datetime.fromisoformat(inicio)).total_seconds() / 60
+    return int(minutos + 0.5) if minutos >= 0 else -int(-minutos + 0.5)
+
+def adiar_manutencao(conn, indices=True):
+    """Remove os triggers de INSERT (e os índices não únicos) de chamado até a restauração
+
+    O SQL de cada objeto removido fica em importacao_adiada.
+    """
+    objetos = conn.execute(f"""
+        SELECT name, type, sql FROM sqlite_master
+        WHERE tbl_name = 'chamado' AND sql IS NOT NULL AND (
+            (type = 'trigger' AND name IN ({', '.join('?' * len(TRIGGERS_ADIADOS))}))
+            OR (type = 'index' AND ? AND sql NOT LIKE 'CREATE UNIQUE%')
+        )
+    """, TRIGGERS_ADIADOS + (indices,)).fetchall()
+
+    for nome, tipo, sql in objetos:
+        conn.execute("INSERT OR REPLACE INTO importacao_adiada (nome, tipo, sql) VALUES (?, ?, ?)",
+                     (nome, tipo, sql))
+        conn.execute(f"DROP {'TRIGGER' if tipo == 'trigger' else 'INDEX'} {nome}")
+    return len(objetos)
+
+def restaurar_manutencao(conn):
+    """Recria o que foi adiado e atualiza o que os triggers teriam mantido
+
+    Indexa na busca textual os chamados ainda ausentes dela, reconstrói as
+    estatísticas por projeto, avança a sequência de RACs até o maior número
+    usado e muda a versão do histórico. Retorna quantos objetos foram recriados.
+    """
+    adiados = conn.execute("SELECT nome, sql FROM importacao_adiada").fetchall()
+    for _, sql in adiados:
+        conn.execute(sql)
+
+    conn.execute("""
+        INSERT INTO chamado_fts (
+            rowid, descricao, ambiente, analise, procedimentos, solucao,
+            observacoes, recomendacoes, cliente, contato
+        )
+        SELECT c.id_chamado, c.descricao, c.ambiente, c.analise, c.procedimentos, c.solucao,
+               c.observacoes, c.recomendacoes, cl.nome, cl.contato
+        FROM chamado c
+        LEFT JOIN cliente cl ON c.id_cliente = cl.id_cliente
+        WHERE NOT EXISTS (SELECT 1 FROM chamado_fts f WHERE f.rowid = c.id_chamado)
+    """)
+    reconstruir_estatisticas(conn)
+    maior = conn.execute("""
+        SELECT MAX(CAST(substr(numero_rac, 4) AS INTEGER)) FROM chamado
+        WHERE numero_rac GLOB 'RAC[0-9]*'
+    """).fetchone()[0]
+    if maior is not None:
+        numeracao.avancar_sequencia_rac(conn, maior)
+
+    if adiados:
+        conn.execute("UPDATE versao_historico SET versao = versao + 1 WHERE id = 1")
+
+    conn.execute("DELETE FROM importacao_adiada")
+    return len(adiados)
+
+class ImportadorChamados:
+    """Importação em massa de chamados históricos (CSV ou JSON Lines)
+
+    Os registros são lidos em fluxo e gravados em lotes de `tamanho_lote`
+    chamados, um executemany por transação. Clientes, plantonistas, projetos e
+    categorias são resolvidos por mapas em memória carregados uma vez
+    (clientes e plantonistas desconhecidos são criados); data_fechamento e
+    tempo_atendimento são gravados já calculados.
+
+    Com adiar=True (cargas pela linha de comando, com o bot e o site parados),
+    o índice de busca, as estatísticas por projeto e os índices não únicos de
+    chamado deixam de ser mantidos linha a linha e são refeitos uma única vez
+    no final; só uma carga desse tipo roda por vez. Sem adiar, os triggers e
+    índices continuam ativos e a carga pode rodar com o sistema em uso.
+
+    Registros inválidos são ignorados e listados em 'rejeitados' com o número
+    da linha e o motivo.
+    """
+
+    def __init__(self, db_path=None, tamanho_lote=TAMANHO_LOTE_PADRAO, adiar=False, adiar_indices=True):
+        self.db_path = db_path
+        self.tamanho_lote = tamanho_lote
+        self.adiar = adiar
+        self.adiar_indices = adiar_indices
+        self.ids = {}
+
+    def carregar_cadastros(self, conn):
+        """Carrega os mapas nome normalizado -> id dos cadastros"""
+        consultas = {
+            'cliente': "SELECT nome, id_cliente FROM cliente",
+            'plantonista': "SELECT nome, id_plantonista FROM plantonista",
+            'projeto': "SELECT sigla, id_projeto FROM projeto",
+            'categoria': "SELECT nome, id_categoria FROM categoria"
+        }
+        self.ids = {
+            tabela: {normalizar(nome): id_registro for nome, id_registro in conn.execute(sql)}
+            for tabela, sql in consultas.items()
+        }
+
+    def _obter_ou_criar(self, conn, tabela, nome, insercao, valores):
+        """Id do mapa ou, se o nome ainda não existe, do registro criado agora"""
+        chave = normalizar(nome)
+        if chave not in self.ids[tabela]:
+            linha = conn.execute(insercao, valores).fetchone()
+            if linha is None:
+                # Criado por outro processo depois da carga dos mapas
+                linha = conn.execute(CONSULTAS[tabela], (nome,)).fetchone()
+            self.ids[tabela][chave] = linha[0]
+        return self.ids[tabela][chave]
+
+    def _id_cliente(self, conn, registro, nome):
+        return self._obter_ou_criar(conn, 'cliente', nome, """
+            INSERT INTO cliente (nome, contato, telefone, email) VALUES (?, ?, ?, ?)
+            ON CONFLICT (lower(trim(nome))) DO NOTHING
+            RETURNING id_cliente
+        """, (nome, _texto(registro, 'contato', 'solicitante'), _texto(registro, 'telefone'),
+              _texto(registro, 'email')))
+
+    def _id_plantonista(self, conn, nome):
+        return self._obter_ou_criar(conn, 'plantonista', nome, """
+            INSERT INTO plantonista (nome) VALUES (?)
+            ON CONFLICT (lower(trim(nome))) DO NOTHING
+            RETURNING id_plantonista
+        """, (nome,))
+
+    @contextmanager
+    def carga(self):
+        """Carrega os mapas e, com adiar, adia a manutenção de chamado até o final
+
+        Lança ValueError se outra carga com adiar estiver em andamento (ou
+        tiver sido interrompida sem restaurar a manutenção).
+        """
+        with database.get_db_connection(self.db_path) as conn:
+            self.carregar_cadastros(conn)
+            if self.adiar:
+                # Lock de escrita antes da verificação: duas cargas não adiam ao mesmo tempo
+                if not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("SELECT 1 FROM importacao_adiada LIMIT 1").fetchone():
+                    raise ValueError("Outra importação está em andamento; se foi interrompida, "
+                                     "execute 'python importacao.py restaurar'")
+                adiar_manutencao(conn, self.adiar_indices)
+        if not self.adiar:
+            yield self
+            return
+        try:
+            yield self
+        finally:
+            with database.get_db_connection(self.db_path) as conn:
+                restaurar_manutencao(conn)
+
+    def converter(self, conn, registro):
+        """Valida o registro e monta (numero_rac, parâmetros do INSERT sem o número)
+
+        Lança ValueError com o motivo quando o registro é inválido.
+        """
+        if registro is None:
+            raise ValueError("linha não é um objeto JSON válido")
+
+        cliente = _texto(registro, 'cliente')
+        plantonista = _texto(registro, 'plantonista')
+        descricao = _texto(registro, 'descricao')
+        for campo, valor in (('cliente', cliente), ('plantonista', plantonista), ('descricao', descricao)):
+            if valor is None:
+                raise ValueError(f"{campo} não informado")
+
+        numero_rac = _texto(registro, 'numero_rac')
+        if numero_rac is not None and not re.fullmatch(r'RAC\d+', numero_rac):
+            raise ValueError(f"numero_rac inválido: {numero_rac}")
+
+        sigla = _texto(registro, 'projeto')
+        id_projeto = None
+        if sigla is not None:
+            id_projeto = self.ids['projeto'].get(normalizar(sigla))
+            if id_projeto is None:
+                raise ValueError(f"projeto desconhecido: {sigla}")
+
+        categoria = _texto(registro, 'categoria')
+        id_categoria = self.ids['categoria'].get(normalizar(categoria)) or 1  # Categoria padrão
+
+        data_hora = _data(_texto(registro, 'data_hora'), 'data_hora')
+        data_fechamento = _data(_texto(registro, 'data_fechamento'), 'data_fechamento')
+        tempo = _texto(registro, 'tempo_atendimento')
+        if tempo is not None:
+            try:
+                tempo_atendimento = int(float(tempo))
+            except (ValueError, OverflowError):
+                raise ValueError(f"tempo_atendimento inválido: {tempo}")
+        elif data_hora and data_fechamento:
+            # O que calcula_tempo_atendimento faria no fechamento do chamado
+            tempo_atendimento = minutos_entre(data_hora, data_fechamento)
+        else:
+            tempo_atendimento = None
+        prioridade = _opcao(_texto(registro, 'prioridade'), PRIORIDADES, 'prioridade')
+        status = _opcao(_texto(registro, 'status'), STATUS, 'status')
+
+        # Cadastros criados só depois de validado todo o registro
+        textos = {campo: _texto(registro, campo) for campo in CAMPOS_TEXTO}
+        return numero_rac, (
+            self._id_cliente(conn, registro, cliente),
+            self._id_plantonista(conn, plantonista),
+            id_categoria,
+            id_projeto,
+            data_hora,
+            textos['tipo'],
+            prioridade,
+            descricao,
+            textos['ambiente'],
+            textos['tempo_ocorrencia'],
+            textos['analise'],
+            textos['procedimentos'],
+            textos['solucao'],
+            status,
+            textos['observacoes'],
+            textos['recomendacoes'],
+            data_fechamento,
+            tempo_atendimento
+        )
+
+    def gravar_lote(self, lote):
+        """Converte e grava um lote de registros em uma transação; retorna (gravados, rejeitados)
+
+        Deve ser chamado dentro de carga(). Em um `with get_db_connection()`
+        externo, o lote entra na transação dele.
+        """
+        rejeitados = []
+        with database.get_db_connection(self.db_path) as conn:
+            # RACs já gravados (por exemplo, ao repetir a importação de um arquivo) são recusados
+            numeros = [numero for numero in (_texto(registro, 'numero_rac') for _, registro in lote if registro) if numero]
+            existentes = {linha[0] for linha in conn.execute(
+                f"SELECT numero_rac FROM chamado WHERE numero_rac IN ({', '.join('?' * len(numeros))})", numeros
+            )} if numeros else set()
+
+            convertidos = []
+            for numero_linha, registro in lote:
+                try:
+                    numero_rac, parametros = self.converter(conn, registro)
+                    if numero_rac in existentes:
+                        raise ValueError(f"numero_rac já existe: {numero_rac}")
+                    if numero_rac:
+                        existentes.add(numero_rac)
+                    convertidos.append((numero_linha, numero_rac, parametros))
+                except ValueError as e:
+                    rejeitados.append({'linha': numero_linha, 'erro': str(e)})
+
+            # Números informados avançam a sequência antes de reservar os que faltam
+            informados = [int(numero[3:]) for _, numero, _ in convertidos if numero]
+            if informados:
+                numeracao.avancar_sequencia_rac(conn, max(informados))
+            faltantes = sum(1 for _, numero, _ in convertidos if not numero)
+            reservados = iter(numeracao.reservar_numeros_rac(conn, faltantes) if faltantes else [])
+            linhas = [(numero_linha, (numero or next(reservados),) + parametros)
+                      for numero_linha, numero, parametros in convertidos]
+
+            conn.execute("SAVEPOINT gravar_lote")
+            try:
+                conn.executemany(SQL_INSERIR_CHAMADO, [valores for _, valores in linhas])
+                gravados = len(linhas)
+            except sqlite3.IntegrityError:
+                # Por exemplo, um RAC gravado por outro processo depois da verificação:
+                # o lote é refeito linha a linha e só as linhas em conflito são recusadas
+                conn.execute("ROLLBACK TO gravar_lote")
+                gravados = 0
+                for numero_linha, valores in linhas:
+                    try:
+                        conn.execute(SQL_INSERIR_CHAMADO, valores)
+                        gravados += 1
+                    except sqlite3.IntegrityError as e:
+                        rejeitados.append({'linha': numero_linha, 'erro': f"não foi possível gravar: {e}"})
+            conn.execute("RELEASE gravar_lote")
+        return gravados, rejeitados
+
+    def importar(self, registros):
+        """Importa os registros (pares (linha, registro), como os de ler_registros)
+
+        Retorna um dicionário com 'importados', 'rejeitados', 'segundos' e
+        'linhas_por_segundo'.
+        """
+        inicio = time.perf_counter()
+        importados = 0
+        rejeitados = []
+
+        with self.carga():
+            registros = iter(registros)
+            while True:
+                lote = list(itertools.islice(registros, self.tamanho_lote))
+                if not lote:
+                    break
+                gravados, recusados = self.gravar_lote(lote)
+                importados += gravados
+                rejeitados.extend(recusados)
+
+        segundos = time.perf_counter() - inicio
+        return {
+            'importados': importados,
+            'rejeitados': rejeitados,
+            'segundos': round(segundos, 3),
+            'linhas_por_segundo': round((importados + len(rejeitados)) / segundos) if segundos else 0
+        }
+
+def importar_arquivo(caminho, db_path=None, formato=None, tamanho_lote=TAMANHO_LOTE_PADRAO, adiar=False):
+    """Importa os chamados de um arquivo CSV ou JSON Lines"""
+    formato = formato or formato_do_arquivo(caminho)
+    with open(caminho, 'r', encoding='utf-8-sig', newline='') as arquivo:
+        return ImportadorChamados(db_path, tamanho_lote, adiar).importar(ler_registros(arquivo, formato))
+
+# Carga pela linha de comando: com o bot e o site parados (a manutenção de chamado é adiada)
+# Uso: python importacao.py <arquivo.csv|arquivo.jsonl> [caminho_do_banco] [tamanho_lote]
+#      python importacao.py restaurar [caminho_do_banco]
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python importacao.py <arquivo.csv|arquivo.jsonl|restaurar> [caminho_do_banco] [tamanho_lote]")
+        sys.exit(2)
+
+    db_path = sys.argv[2] if len(sys.argv) > 2 else 'chamados.db'
+    if sys.argv[1] == 'restaurar':
+        with database.get_db_connection(db_path) as conn:
+            recriados = restaurar_manutencao(conn)
+        print(f"Manutenção restaurada ({recriados} triggers/índices recriados).")
+        sys.exit(0)
+
+    tamanho_lote = int(sys.argv[3]) if len(sys.argv) > 3 else TAMANHO_LOTE_PADRAO
+    try:
+        resultado = importar_arquivo(sys.argv[1], db_path, tamanho_lote=tamanho_lote, adiar=True)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    print(f"Importados: {resultado['importados']} chamados em {resultado['segundos']:.2f}s "
+          f"({resultado['linhas_por_segundo']} linhas/s)")
+    if resultado['rejeitados']:
+        print(f"Rejeitados: {len(resultado['rejeitados'])}")
+        for item in resultado['rejeitados'][:20]:
+            print(f"- linha {item['linha']}: {item['erro']}")
+        sys.exit(1)
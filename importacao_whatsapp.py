@@ -0,0 +1,323 @@
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+from datetime import datetime
+import database
+from cadastros import PLANTONISTAS_GRUPO, normalizar
+from estado_conversa import TTL_PADRAO
+from importacao import ImportadorChamados
+from whatsapp_bot_fixed import CAMPOS_FORMULARIO
+
+# Chamados gravados por transação (junto com a posição na conversa)
+TAMANHO_LOTE_PADRAO = 1000
+
+# Início de mensagem das exportações do WhatsApp, nos formatos do Android
+# ("05/04/2024 07:30 - Nome: texto") e do iPhone ("[05/04/2024, 07:30:12] Nome: texto");
+# linhas sem esse início continuam a mensagem anterior
+_INICIO_MENSAGEM = re.compile(
+    r'^\[?(\d{1,2})/(\d{1,2})/(\d{2,4}),? (\d{1,2}):(\d{2})(?::(\d{2}))?\]?(?: -)? (.*)$'
+)
+
+# Marcas invisíveis de direção de texto e espaços especiais das exportações
+_INVISIVEIS = str.maketrans({'\u200e': None, '\u200f': None, '\u202a': None, '\u202c': None,
+                             '\u202f': ' ', '\xa0': ' '})
+
+def ler_mensagens(arquivo):
+    """Lê as mensagens de uma conversa exportada, uma por vez
+
+    Gera tuplas (linha, data, ordem, remetente, texto): data no formato
+    AAAA-MM-DD HH:MM:SS e ordem entre as mensagens com a mesma data (a
+    exportação do Android não tem segundos). Mensagens de várias linhas são
+    reunidas; mensagens do sistema (sem remetente) são ignoradas. Só a
+    mensagem atual fica em memória.
+    """
+    atual = None
+    ultima_data = None
+    ordem = 0
+
+    for numero, linha in enumerate(arquivo, start=1):
+        linha = linha.rstrip('\r\n').translate(_INVISIVEIS)
+        inicio = _INICIO_MENSAGEM.match(linha)
+        if inicio is None:
+            if atual is not None:
+                atual[4] += '\n' + linha
+            continue
+
+        if atual is not None:
+            yield tuple(atual)
+            atual = None
+
+        dia, mes, ano, hora, minuto, segundo, resto = inicio.groups()
+        remetente, separador, texto = resto.partition(': ')
+        if not separador:
+            continue
+        # Montada direto do texto (sem datetime): é a parte mais repetida da leitura
+        ano = '20' + ano if len(ano) == 2 else ano
+        data = f"{ano}-{mes:0>2}-{dia:0>2} {hora:0>2}:{minuto}:{segundo or '00'}"
+
+        ordem = ordem + 1 if data == ultima_data else 0
+        ultima_data = data
+        atual = [numero, data, ordem, remetente.strip(), texto]
+
+    if atual is not None:
+        yield tuple(atual)
+
+def hash_mensagem(remetente, texto):
+    """Identificação (SHA-256 do remetente e do texto) da última mensagem importada"""
+    return hashlib.sha256(f"{remetente}\n{texto}".encode('utf-8')).hexdigest()
+
+def avancar_formulario(conversa, texto):
+    """Aplica uma mensagem ao formulário do remetente, como WhatsAppIntegration.process_message
+
+    conversa é None ou {'estado': ..., 'formulario': {...}}. Retorna
+    (conversa, formulario_confirmado); o segundo é None até o 'sim' final.
+    """
+    resposta = texto.strip()
+    if resposta.lower() == "novo chamado":
+        return {'estado': CAMPOS_FORMULARIO[0], 'formulario': {}}, None
+    if conversa is None:
+        return None, None
+
+    estado, formulario = conversa['estado'], conversa['formulario']
+    if estado in CAMPOS_FORMULARIO:
+        formulario[estado] = texto
+        posicao = CAMPOS_FORMULARIO.index(estado) + 1
+        conversa['estado'] = CAMPOS_FORMULARIO[posicao] if posicao < len(CAMPOS_FORMULARIO) else 'confirmar'
+    elif estado == 'confirmar':
+        if resposta.lower() == 'sim':
+            return None, formulario
+        if resposta.lower() == 'não':
+            conversa['estado'] = CAMPOS_FORMULARIO[0]
+    return conversa, None
+
+def nome_plantonista(remetente):
+    """Nome do plantonista do grupo pelo telefone do remetente (ou o próprio nome exibido)"""
+    digitos = re.sub(r'\D', '', remetente)
+    if digitos:
+        for plantonista in PLANTONISTAS_GRUPO:
+            if plantonista['telefone'] and re.sub(r'\D', '', plantonista['telefone']) == digitos:
+                return plantonista['nome']
+    return remetente
+
+class ImportadorConversas:
+    """Importação dos chamados registrados nas conversas exportadas do WhatsApp
+
+    A exportação é lida em fluxo, linha a linha (memória constante, mesmo com
+    arquivos de centenas de MB). Os formulários "Novo chamado" são remontados
+    por remetente na mesma sequência de campos do bot (avancar_formulario),
+    sem passar pelo armazenamento de estado nem gravar um chamado por vez: os
+    confirmados são gravados em lotes pelo importacao.ImportadorChamados.
+
+    Cada lote grava também, na tabela importacao_whatsapp, a posição da
+    última mensagem lida (data, ordem e hash) e os formulários em andamento.
+    No modo incremental, uma nova exportação da mesma conversa pula as
+    mensagens até essa mensagem e continua os formulários de onde pararam. adiar tem o mesmo sentido que
+    em ImportadorChamados (só com o sistema parado).
+    """
+
+    def __init__(self, db_path=None, tamanho_lote=TAMANHO_LOTE_PADRAO, ttl=TTL_PADRAO, adiar=False):
+        self.db_path = db_path
+        self.tamanho_lote = tamanho_lote
+        self.adiar = adiar
+        # Formulário sem mensagens do remetente por mais que isso é abandonado, como no bot
+        self.ttl = ttl
+
+    def posicao(self, chat):
+        """(ultima_data, ultima_ordem, ultima_mensagem, ultima_repeticao, conversas) da conversa, ou None"""
+        with database.get_db_connection(self.db_path) as conn:
+            linha = conn.execute("""
+                SELECT ultima_data, ultima_ordem, ultima_mensagem, ultima_repeticao, conversas
+                FROM importacao_whatsapp WHERE chat = ?
+            """, (chat,)).fetchone()
+        if linha is None:
+            return None
+        return (linha['ultima_data'], linha['ultima_ordem'], linha['ultima_mensagem'],
+                linha['ultima_repeticao'], json.loads(linha['conversas']))
+
+    def numerar(self, mensagens):
+        """Acrescenta a cada mensagem a sua repetição: quantas iguais (remetente e texto)
+        vieram antes dela no mesmo minuto"""
+        minuto = None
+        vistas = {}
+        for mensagem in mensagens:
+            _, data, _, remetente, texto = mensagem
+            if data != minuto:
+                minuto = data
+                vistas = {}
+            repeticao = vistas.get((remetente, texto), 0)
+            vistas[(remetente, texto)] = repeticao + 1
+            yield mensagem + (repeticao,)
+
+    def pular_importadas(self, mensagens, anterior, totais):
+        """Pula as mensagens até a última importada (inclusive)
+
+        Antes do minuto da última mensagem tudo é pulado e depois dele nada. No
+        próprio minuto, as mensagens são puladas até a que tem o hash e a
+        repetição gravados; se ela não aparecer (editada, ou posição anterior
+        ao hash), as mensagens guardadas daquele minuto são comparadas pela ordem.
+        """
+        data_limite, ordem_limite, hash_limite, repeticao_limite = anterior[:4]
+        achada = False
+        pendentes = []  # mensagens do minuto da última, até ela ser encontrada
+
+        def pela_ordem():
+            for pendente in pendentes:
+                if pendente[2] <= ordem_limite:
+                    totais['puladas'] += 1
+                else:
+                    yield pendente
+            pendentes.clear()
+
+        for mensagem in mensagens:
+            data = mensagem[1]
+            if data < data_limite:
+                totais['puladas'] += 1
+                continue
+            if data == data_limite and not achada:
+                if hash_limite is not None and mensagem[5] == repeticao_limite and \
+                        hash_mensagem(mensagem[3], mensagem[4]) == hash_limite:
+                    achada = True
+                    totais['puladas'] += len(pendentes) + 1
+                    pendentes.clear()
+                else:
+                    pendentes.append(mensagem)
+                continue
+            yield from pela_ordem()
+            yield mensagem
+        yield from pela_ordem()
+
+    def registro(self, importador, chat, remetente, formulario, data):
+        """Registro do chamado confirmado para o importacao.ImportadorChamados"""
+        observacoes = f"Importado da conversa {chat} ({remetente})"
+        projeto = (formulario.get('projeto') or '').strip()
+        # Sigla desconhecida: o bot grava o chamado sem projeto
+        if projeto and normalizar(projeto) not in importador.ids['projeto']:
+            observacoes += f"; projeto informado: {projeto}"
+            projeto = None
+        return {
+            'cliente': formulario.get('cliente'),
+            'solicitante': formulario.get('solicitante'),
+            'projeto': projeto,
+            'descricao': formulario.get('motivo'),
+            'prioridade': formulario.get('prioridade'),
+            'analise': formulario.get('diagnostico'),
+            'plantonista': nome_plantonista(remetente),
+            'categoria': 'Suporte Técnico',
+            'status': 'Resolvido',
+            'data_hora': data,
+            'observacoes': observacoes
+        }
+
+    def _gravar(self, importador, chat, lote, ultima, conversas):
+        """Grava os chamados do lote e a posição na conversa em uma transação
+
+        ultima é a última mensagem lida (como gerada por numerar).
+        """
+        _, data, ordem, remetente, texto, repeticao = ultima
+        with database.get_db_connection(self.db_path) as conn:
+            gravados, rejeitados = importador.gravar_lote(lote)
+            conn.execute("""
+                INSERT INTO importacao_whatsapp (chat, ultima_data, ultima_ordem, ultima_mensagem,
+                                                 ultima_repeticao, conversas, atualizado_em)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (chat) DO UPDATE SET
+                    ultima_data = excluded.ultima_data,
+                    ultima_ordem = excluded.ultima_ordem,
+                    ultima_mensagem = excluded.ultima_mensagem,
+                    ultima_repeticao = excluded.ultima_repeticao,
+                    conversas = excluded.conversas,
+                    atualizado_em = excluded.atualizado_em
+            """, (chat, data, ordem, hash_mensagem(remetente, texto), repeticao,
+                  json.dumps(conversas, ensure_ascii=False)))
+        return gravados, rejeitados
+
+    def importar(self, arquivo, chat, incremental=True):
+        """Importa os chamados de uma conversa exportada (arquivo de texto aberto)
+
+        chat identifica a conversa entre exportações sucessivas. Com
+        incremental=False a posição registrada é ignorada e a conversa é lida
+        desde o início. Retorna os totais e a vazão (mensagens/s).
+        """
+        inicio = time.perf_counter()
+        totais = {'mensagens': 0, 'puladas': 0, 'importados': 0, 'rejeitados': []}
+
+        anterior = self.posicao(chat) if incremental else None
+        conversas = anterior[4] if anterior else {}
+        ultima = None
+        importador = ImportadorChamados(self.db_path, tamanho_lote=self.tamanho_lote, adiar=self.adiar)
+        lote = []
+
+        mensagens = self.numerar(ler_mensagens(arquivo))
+        if anterior:
+            mensagens = self.pular_importadas(mensagens, anterior, totais)
+
+        with importador.carga():
+            for mensagem in mensagens:
+                numero, data, ordem, remetente, texto, _ = mensagem
+                totais['mensagens'] += 1
+                ultima = mensagem
+
+                conversa = conversas.get(remetente)
+                if conversa is not None and \
+                        (datetime.fromisoformat(data) - datetime.fromisoformat(conversa['ultima'])).total_seconds() > self.ttl:
+                    conversa = None
+
+                conversa, formulario = avancar_formulario(conversa, texto)
+                if conversa is None:
+                    conversas.pop(remetente, None)
+                else:
+                    conversa['ultima'] = data
+                    conversas[remetente] = conversa
+
+                if formulario is not None:
+                    lote.append((numero, self.registro(importador, chat, remetente, formulario, data)))
+                    if len(lote) >= self.tamanho_lote:
+                        gravados, rejeitados = self._gravar(importador, chat, lote, ultima, conversas)
+                        totais['importados'] += gravados
+                        totais['rejeitados'].extend(rejeitados)
+                        lote = []
+
+            if ultima is not None:
+                gravados, rejeitados = self._gravar(importador, chat, lote, ultima, conversas)
+                totais['importados'] += gravados
+                totais['rejeitados'].extend(rejeitados)
+
+        segundos = time.perf_counter() - inicio
+        totais['em_andamento'] = len(conversas)
+        totais['segundos'] = round(segundos, 3)
+        totais['mensagens_por_segundo'] = round((totais['mensagens'] + totais['puladas']) / segundos) if segundos else 0
+        return totais
+
+def importar_exportacao(caminho, db_path=None, chat=None, incremental=True, adiar=False):
+    """Importa um arquivo .txt exportado do WhatsApp (chat: nome do arquivo, por padrão)"""
+    chat = chat or os.path.splitext(os.path.basename(caminho))[0]
+    with open(caminho, 'r', encoding='utf-8-sig', errors='replace') as arquivo:
+        return ImportadorConversas(db_path, adiar=adiar).importar(arquivo, chat, incremental)
+
+# Uso: python importacao_whatsapp.py <conversa.txt> [caminho_do_banco] [nome_da_conversa] [--completo]
+if __name__ == "__main__":
+    argumentos = [arg for arg in sys.argv[1:] if arg != '--completo']
+    if not argumentos:
+        print("Uso: python importacao_whatsapp.py <conversa.txt> [caminho_do_banco] [nome_da_conversa] [--completo]")
+        sys.exit(2)
+
+    db_path = argumentos[1] if len(argumentos) > 1 else 'chamados.db'
+    chat = argumentos[2] if len(argumentos) > 2 else None
+    # Pela linha de comando, com o bot e o site parados: a manutenção de chamado é adiada
+    try:
+        totais = importar_exportacao(argumentos[0], db_path, chat, incremental='--completo' not in sys.argv,
+                                     adiar=True)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    print(f"Mensagens lidas: {totais['mensagens']} (já importadas antes: {totais['puladas']}), "
+          f"{totais['mensagens_por_segundo']} mensagens/s")
+    print(f"Chamados importados: {totais['importados']}; formulários em andamento: {totais['em_andamento']}")
+    if totais['rejeitados']:
+        print(f"Rejeitados: {len(totais['rejeitados'])}")
+        for item in totais['rejeitados'][:20]:
+            print(f"- linha {item['linha']}: {item['erro']}")
+        sys.exit(1)
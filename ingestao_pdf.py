@@ -0,0 +1,308 @@
+import os
+import re
+import sys
+import time
+import zlib
+import hashlib
+from datetime import datetime, timedelta
+import database
+import lote
+from importacao import ImportadorChamados
+
+# Arquivos gravados por transação (chamados e registros de ingestao_pdf)
+TAMANHO_LOTE_PADRAO = 500
+
+# Posição (x, y) do texto de cada campo no modelo do RAC antigo (ver
+# analise_rac_atual.md); cada bloco de texto vai para o campo mais próximo
+POSICOES_RAC = {
+    'numero_rac': (160.16, 707.81),
+    'cliente': (64.35, 650.55),
+    'solicitante': (312.38, 650.55),
+    'descricao': (64.35, 595.28),
+    'analise': (64.35, 424.63),
+    'data': (110.55, 243.78),
+    'hora_inicio': (283.46, 243.78),
+    'hora_fim': (445.89, 243.78),
+    'tecnico': (141.73, 185.67),
+    'contato': (135.21, 107.72),
+    'email': (135.21, 81.64),
+    'telefone': (135.21, 55.28)
+}
+
+# Distância máxima (em pontos) entre um bloco de texto e a posição do campo
+TOLERANCIA = 20
+
+_OPERADORES = re.compile(rb'(-?[\d.]+)\s+(-?[\d.]+)\s+Td|\(((?:\\.|[^\\)])*)\)\s*Tj|T\*|BT|ET', re.S)
+_ESCAPES = re.compile(rb'\\([0-7]{1,3}|.)', re.S)
+_ESCAPES_SIMPLES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+def _texto_pdf(literal):
+    """Decodifica uma string literal de PDF (codificação WinAnsi)"""
+    def escape(m):
+        codigo = m.group(1)
+        if codigo[:1].isdigit():
+            return bytes([int(codigo, 8) & 0xFF])
+        return _ESCAPES_SIMPLES.get(codigo, codigo)
+    return _ESCAPES.sub(escape, literal).decode('cp1252', errors='replace')
+
+def extrair_textos(dados):
+    """Blocos de texto das páginas de um PDF, como [(x, y, [linhas])]
+
+    Lê os operadores de texto (Td, Tj, T*) dos conteúdos das páginas, sem
+    compressão ou com FlateDecode, como os gerados pelo FPDF dos RACs antigos.
+    """
+    blocos = []
+    fim = 0
+    while True:
+        # bytes.find em vez de regex: as imagens de fundo ocupam quase todo o arquivo
+        inicio = dados.find(b'stream', fim)
+        if inicio < 0:
+            break
+        final = dados.find(b'endstream', inicio)
+        if final < 0:
+            break
+        fim = final + len(b'endstream')
+        dicionario = dados[dados.rfind(b'obj', 0, inicio):inicio]
+        if b'/Image' in dicionario:
+            continue
+        # Conteúdo entre a quebra de linha após `stream` e a anterior a `endstream`
+        conteudo = dados[inicio + len(b'stream'):final]
+        conteudo = conteudo[2:] if conteudo.startswith(b'\r\n') else conteudo[1:]
+        if conteudo.endswith(b'\n'):
+            conteudo = conteudo[:-2] if conteudo.endswith(b'\r\n') else conteudo[:-1]
+        if b'/FlateDecode' in dicionario:
+            try:
+                conteudo = zlib.decompress(conteudo)
+            except zlib.error:
+                continue
+
+        bloco = None
+        for operador in _OPERADORES.finditer(conteudo):
+            if operador.group(1) is not None:
+                bloco = (float(operador.group(1)), float(operador.group(2)), [])
+                blocos.append(bloco)
+            elif operador.group(3) is not None and bloco is not None:
+                bloco[2].append(_texto_pdf(operador.group(3)).strip())
+            elif operador.group(0) == b'ET':
+                bloco = None
+    return blocos
+
+def extrair_campos(dados):
+    """Campos do RAC antigo pelo posicionamento dos blocos de texto"""
+    campos = {}
+    for x, y, linhas in extrair_textos(dados):
+        campo, distancia = min(
+            ((nome, abs(x - px) + abs(y - py)) for nome, (px, py) in POSICOES_RAC.items()),
+            key=lambda item: item[1]
+        )
+        texto = ' '.join(linha for linha in linhas if linha)
+        if distancia <= TOLERANCIA and texto:
+            campos[campo] = f"{campos[campo]} {texto}" if campo in campos else texto
+    return campos
+
+def registro_do_rac(campos, caminho):
+    """Converte os campos do RAC em um registro de importacao.ImportadorChamados
+
+    Sem número no PDF, usa o do nome do arquivo (RAC0142.pdf). O RAC antigo é
+    de um atendimento encerrado: status Resolvido, fechado na hora de fim.
+    """
+    numero_rac = campos.get('numero_rac')
+    if not numero_rac:
+        nome = re.match(r'(RAC\d+)', os.path.basename(caminho), re.I)
+        numero_rac = nome.group(1).upper() if nome else None
+
+    data_hora = data_fechamento = None
+    if campos.get('data'):
+        inicio = datetime.strptime(f"{campos['data']} {campos.get('hora_inicio') or '00:00'}", '%d/%m/%Y %H:%M')
+        data_hora = inicio.strftime('%Y-%m-%d %H:%M:%S')
+        if campos.get('hora_fim'):
+            fim = datetime.strptime(f"{campos['data']} {campos['hora_fim']}", '%d/%m/%Y %H:%M')
+            if fim < inicio:
+                # Atendimento que passou da meia-noite
+                fim += timedelta(days=1)
+            data_fechamento = fim.strftime('%Y-%m-%d %H:%M:%S')
+
+    contato = ' '.join(campos[campo] for campo in ('contato', 'email', 'telefone') if campos.get(campo))
+    return {
+        'numero_rac': numero_rac,
+        'cliente': campos.get('cliente'),
+        'solicitante': campos.get('solicitante'),
+        'email': campos.get('email'),
+        'telefone': campos.get('telefone'),
+        'plantonista': campos.get('tecnico'),
+        'descricao': campos.get('descricao'),
+        'analise': campos.get('analise'),
+        'status': 'Resolvido',
+        'data_hora': data_hora,
+        'data_fechamento': data_fechamento,
+        'observacoes': f"Importado de {os.path.basename(caminho)}; contato do relatório: {contato}" if contato
+                       else f"Importado de {os.path.basename(caminho)}"
+    }
+
+# Hashes já registrados em ingestao_pdf, recebidos por cada processo
+_processados = frozenset()
+
+def _inicializar_processo(processados):
+    """Recebe os hashes dos arquivos já processados (uma vez por processo)"""
+    global _processados
+    _processados = processados
+
+def processar_arquivo(caminho):
+    """Lê e interpreta um PDF (executado nos processos do pool)
+
+    Retorna 'caminho', 'hash' e, conforme o caso, 'registro', 'erro' ou
+    'ignorado' (arquivo já processado em uma execução anterior).
+    """
+    resultado = {'caminho': caminho, 'hash': None}
+    try:
+        # Uma única leitura do arquivo para o hash e para a interpretação
+        with open(caminho, 'rb') as f:
+            dados = f.read()
+        resultado['hash'] = hashlib.sha256(dados).hexdigest()
+        if resultado['hash'] in _processados:
+            resultado['ignorado'] = True
+            return resultado
+        if not dados.startswith(b'%PDF'):
+            raise ValueError("arquivo não é um PDF")
+        campos = extrair_campos(dados)
+        if not campos:
+            raise ValueError("nenhum campo do RAC encontrado no PDF")
+        resultado['registro'] = registro_do_rac(campos, caminho)
+    except (OSError, ValueError) as e:
+        resultado['erro'] = str(e)
+    return resultado
+
+class IngestaoPDF:
+    """Ingestão dos RACs antigos em PDF para as tabelas chamado e cliente
+
+    Os PDFs são lidos e interpretados em um pool de processos (lote.py) e os
+    chamados são gravados em lotes pelo importacao.ImportadorChamados, junto
+    com o registro de cada arquivo em ingestao_pdf (pelo hash do conteúdo) na
+    mesma transação. Uma ingestão interrompida, repetida com os mesmos
+    arquivos, não lê de novo os que já foram gravados. adiar tem o mesmo
+    sentido que em ImportadorChamados (só com o sistema parado).
+    """
+
+    def __init__(self, db_path=None, processos=None, tamanho_lote=TAMANHO_LOTE_PADRAO, progresso=None, adiar=False):
+        self.db_path = db_path
+        self.processos = processos
+        self.tamanho_lote = tamanho_lote
+        self.adiar = adiar
+        # progresso(feitos, total, segundos) é chamado a cada lote gravado
+        self.progresso = progresso
+
+    def processados(self):
+        """Hashes dos arquivos que não precisam ser processados de novo"""
+        with database.get_db_connection(self.db_path) as conn:
+            return frozenset(linha[0] for linha in conn.execute(
+                "SELECT hash_arquivo FROM ingestao_pdf WHERE status != 'erro'"
+            ))
+
+    def _gravar(self, importador, resultados):
+        """Grava os chamados e os registros de ingestao_pdf de um lote em uma transação"""
+        registros = [(r['hash'], r['registro']) for r in resultados if 'registro' in r]
+        with database.get_db_connection(self.db_path) as conn:
+            gravados, rejeitados = importador.gravar_lote(registros)
+            motivos = {item['linha']: item['erro'] for item in rejeitados}
+
+            linhas = []
+            for r in resultados:
+                if r['hash'] is None or r.get('ignorado'):
+                    continue
+                erro = r.get('erro') or motivos.get(r['hash'])
+                status = 'erro' if 'erro' in r else ('rejeitado' if erro else 'importado')
+                linhas.append((r['hash'], r['caminho'], (r.get('registro') or {}).get('numero_rac'), status, erro))
+            conn.executemany("""
+                INSERT OR REPLACE INTO ingestao_pdf (hash_arquivo, caminho, numero_rac, status, erro)
+                VALUES (?, ?, ?, ?, ?)
+            """, linhas)
+        return gravados, rejeitados
+
+    def ingerir(self, caminhos):
+        """Processa os arquivos; retorna os totais e a vazão (arquivos/s)"""
+        caminhos = list(caminhos)
+        inicio = time.perf_counter()
+        totais = {'importados': 0, 'rejeitados': 0, 'erros': 0, 'ignorados': 0}
+        importador = ImportadorChamados(self.db_path, tamanho_lote=self.tamanho_lote, adiar=self.adiar)
+
+        resultados = lote.executar_em_fluxo(
+            processar_arquivo, caminhos,
+            processos=self.processos,
+            inicializador=_inicializar_processo,
+            argumentos_inicializador=(self.processados(),),
+            tamanho_bloco=max(1, self.tamanho_lote // 4)
+        )
+
+        feitos = 0
+        pendentes = []
+        vistos = set()
+        with importador.carga():
+            for item in resultados:
+                resultado = item['resultado'] if item['status'] == 'success' else \
+                    {'caminho': item['item'], 'hash': None, 'erro': item['message']}
+                # Cópias de um arquivo já visto nesta execução contam como já processadas
+                if resultado['hash'] in vistos:
+                    resultado['ignorado'] = True
+                elif resultado['hash'] is not None:
+                    vistos.add(resultado['hash'])
+                if resultado.get('ignorado'):
+                    totais['ignorados'] += 1
+                elif 'erro' in resultado:
+                    totais['erros'] += 1
+                pendentes.append(resultado)
+
+                if len(pendentes) >= self.tamanho_lote:
+                    feitos += self._registrar_lote(importador, pendentes, totais)
+                    pendentes = []
+                    if self.progresso:
+                        self.progresso(feitos, len(caminhos), time.perf_counter() - inicio)
+            if pendentes:
+                feitos += self._registrar_lote(importador, pendentes, totais)
+                if self.progresso:
+                    self.progresso(feitos, len(caminhos), time.perf_counter() - inicio)
+
+        segundos = time.perf_counter() - inicio
+        totais['segundos'] = round(segundos, 3)
+        totais['arquivos_por_segundo'] = round(len(caminhos) / segundos, 1) if segundos else 0
+        return totais
+
+    def _registrar_lote(self, importador, resultados, totais):
+        gravados, rejeitados = self._gravar(importador, resultados)
+        totais['importados'] += gravados
+        totais['rejeitados'] += len(rejeitados)
+        return len(resultados)
+
+def listar_pdfs(caminho):
+    """Arquivos PDF do diretório (e subdiretórios), em ordem de nome"""
+    if os.path.isfile(caminho):
+        return [caminho]
+    return sorted(
+        os.path.join(raiz, nome)
+        for raiz, _, nomes in os.walk(caminho)
+        for nome in nomes if nome.lower().endswith('.pdf')
+    )
+
+def mostrar_progresso(feitos, total, segundos):
+    print(f"{feitos}/{total} arquivos ({feitos / segundos:.0f} arquivos/s)", flush=True)
+
+# Uso: python ingestao_pdf.py <diretorio_ou_arquivo> [processos] [caminho_do_banco]
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python ingestao_pdf.py <diretorio_ou_arquivo> [processos] [caminho_do_banco]")
+        sys.exit(2)
+
+    processos = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    db_path = sys.argv[3] if len(sys.argv) > 3 else 'chamados.db'
+
+    # Pela linha de comando, com o bot e o site parados: a manutenção de chamado é adiada
+    ingestao = IngestaoPDF(db_path, processos=processos, progresso=mostrar_progresso, adiar=True)
+    try:
+        totais = ingestao.ingerir(listar_pdfs(sys.argv[1]))
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    print(f"Importados: {totais['importados']}, rejeitados: {totais['rejeitados']}, erros: {totais['erros']}, "
+          f"já processados: {totais['ignorados']} ({totais['segundos']:.1f}s, "
+          f"{totais['arquivos_por_segundo']} arquivos/s)")
+    if totais['rejeitados'] or totais['erros']:
+        print("Veja os detalhes em: SELECT caminho, erro FROM ingestao_pdf WHERE status != 'importado'")
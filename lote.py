@@ -0,0 +1,57 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Número padrão de processos da execução em lote
+PROCESSOS_PADRAO = os.cpu_count() or 1
+
+def _executar_item(funcao, item):
+    """Executa a função para um item, devolvendo o sucesso ou o erro do item"""
+    try:
+        return {'item': item, 'status': 'success', 'resultado': funcao(item)}
+    except Exception as e:
+        return {'item': item, 'status': 'error', 'message': str(e)}
+
+def executar_em_lote(funcao, itens, processos=None, inicializador=None, argumentos_inicializador=()):
+    """Executa funcao(item) para cada item, distribuindo entre vários processos
+
+    Cada processo é criado do zero (contexto 'spawn', sem herdar as conexões
+    SQLite do processo pai) e executa o inicializador uma única vez antes de
+    processar seus itens. Tanto `funcao` quanto `inicializador` precisam ser
+    funções de nível de módulo.
+
+    Retorna, na ordem dos itens, um dicionário por item com 'status'
+    ('success' ou 'error') e 'resultado' ou 'message'.
+    """
+    return list(executar_em_fluxo(funcao, itens, processos, inicializador, argumentos_inicializador))
+
+def executar_em_fluxo(funcao, itens, processos=None, inicializador=None, argumentos_inicializador=(),
+                      tamanho_bloco=None):
+    """Como executar_em_lote, mas gera os resultados (na ordem dos itens) à medida que ficam prontos
+
+    tamanho_bloco limita quantos itens vão de uma vez para cada processo
+    (blocos menores dão notícias de progresso mais frequentes).
+    """
+    itens = list(itens)
+    processos = min(processos or PROCESSOS_PADRAO, len(itens))
+
+    # Com um único processo (ou nenhum item) não compensa criar o pool
+    if processos <= 1:
+        if inicializador is not None and itens:
+            inicializador(*argumentos_inicializador)
+        for item in itens:
+            yield _executar_item(funcao, item)
+        return
+
+    # Blocos de itens por envio reduzem a troca de mensagens entre processos
+    bloco = max(1, len(itens) // (processos * 4))
+    if tamanho_bloco:
+        bloco = min(bloco, tamanho_bloco)
+
+    with ProcessPoolExecutor(
+        max_workers=processos,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=inicializador,
+        initargs=argumentos_inicializador
+    ) as executor:
+        yield from executor.map(_executar_item, [funcao] * len(itens), itens, chunksize=bloco)
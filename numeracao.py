@@ -0,0 +1,35 @@
+# Sequência usada para os números de RAC (ver schema_rac.sql)
+SEQUENCIA_RAC = 'rac'
+
+def formatar_rac(numero):
+    """Formata o número sequencial no padrão RAC0001"""
+    return f"RAC{numero:04d}"
+
+def proximo_numero_rac(conn):
+    """Reserva o próximo número de RAC na transação corrente da conexão
+
+    O UPDATE bloqueia o banco para escrita até o commit, então dois chamados
+    abertos ao mesmo tempo (bot e web) nunca recebem o mesmo número. Deve ser
+    chamado dentro do mesmo `with get_db_connection()` do INSERT do chamado,
+    para que um rollback devolva o número junto com o chamado.
+    """
+    valor = conn.execute(
+        "UPDATE sequencia SET valor = valor + 1 WHERE nome = ? RETURNING valor",
+        (SEQUENCIA_RAC,)
+    ).fetchone()[0]
+    return formatar_rac(valor)
+
+def reservar_numeros_rac(conn, quantidade):
+    """Reserva `quantidade` números de RAC consecutivos em uma única instrução"""
+    ultimo = conn.execute(
+        "UPDATE sequencia SET valor = valor + ? WHERE nome = ? RETURNING valor",
+        (quantidade, SEQUENCIA_RAC)
+    ).fetchone()[0]
+    return [formatar_rac(numero) for numero in range(ultimo - quantidade + 1, ultimo + 1)]
+
+def avancar_sequencia_rac(conn, numero):
+    """Garante que a sequência não reserve números até `numero` (já usados em importações)"""
+    conn.execute(
+        "UPDATE sequencia SET valor = MAX(valor, ?) WHERE nome = ?",
+        (numero, SEQUENCIA_RAC)
+    )
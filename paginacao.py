@@ -0,0 +1,153 @@
+import base64
+import json
+
+# Quantidade de registros por página quando `limit` não é informado
+LIMITE_PADRAO = 50
+
+# Maior página aceita no modo paginado
+LIMITE_MAXIMO = 1000
+
+# Tamanho aproximado (em caracteres) de cada bloco enviado no modo streaming
+TAMANHO_BLOCO = 64 * 1024
+
+# Predicado de keyset para listagens ordenadas por data_hora DESC, id_chamado DESC
+FILTRO_CURSOR = "(c.data_hora, c.id_chamado) < (?, ?)"
+ORDEM_CURSOR = "c.data_hora DESC, c.id_chamado DESC"
+
+# Listagem de chamados da API (colunas exibidas na página)
+CONSULTA_CHAMADOS = """
+    SELECT
+        c.id_chamado, c.numero_rac, c.data_hora, c.status,
+        cl.nome as cliente,
+        p.nome as plantonista,
+        c.descricao
+    FROM chamado c
+    JOIN cliente cl ON c.id_cliente = cl.id_cliente
+    JOIN plantonista p ON c.id_plantonista = p.id_plantonista
+"""
+
+def montar_consulta_chamados(filtros_busca, cursor=None, consulta=None):
+    """Monta a query da listagem de chamados a partir dos filtros informados
+
+    Os filtros comparam as colunas diretamente (sem funções sobre elas) para que
+    o SQLite use os índices compostos de schema_indices.sql. `consulta` é o
+    SELECT (com os aliases c e cl; padrão: CONSULTA_CHAMADOS) e `cursor`, o
+    ponto de continuação da página. Retorna (query, parametros), já com a ordenação.
+    """
+    query = consulta or CONSULTA_CHAMADOS
+
+    filtros = []
+    parametros = []
+
+    if filtros_busca.get('cliente'):
+        filtros.append("cl.nome LIKE ?")
+        parametros.append(f"%{filtros_busca['cliente']}%")
+
+    if filtros_busca.get('id_cliente'):
+        filtros.append("c.id_cliente = ?")
+        parametros.append(filtros_busca['id_cliente'])
+
+    if filtros_busca.get('id_projeto'):
+        filtros.append("c.id_projeto = ?")
+        parametros.append(filtros_busca['id_projeto'])
+
+    if filtros_busca.get('status'):
+        filtros.append("c.status = ?")
+        parametros.append(filtros_busca['status'])
+
+    # data_hora é gravado como 'AAAA-MM-DD HH:MM:SS', então o intervalo de dias
+    # vira uma comparação de texto: [data_inicio, data_fim + 1 dia)
+    if filtros_busca.get('data_inicio'):
+        filtros.append("c.data_hora >= date(?)")
+        parametros.append(filtros_busca['data_inicio'])
+
+    if filtros_busca.get('data_fim'):
+        filtros.append("c.data_hora < date(?, '+1 day')")
+        parametros.append(filtros_busca['data_fim'])
+
+    if cursor:
+        filtros.append(FILTRO_CURSOR)
+        parametros.extend(cursor)
+
+    if filtros:
+        query += " WHERE " + " AND ".join(filtros)
+
+    query += " ORDER BY " + ORDEM_CURSOR
+
+    return query, parametros
+
+def codificar_cursor(data_hora, id_chamado):
+    """Gera o token opaco que aponta para o último registro de uma página"""
+    bruto = json.dumps([data_hora, id_chamado]).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+def decodificar_cursor(token):
+    """Converte o token recebido em `after` de volta para (data_hora, id_chamado)"""
+    try:
+        preenchimento = '=' * (-len(token) % 4)
+        data_hora, id_chamado = json.loads(base64.urlsafe_b64decode(token + preenchimento))
+    except (ValueError, TypeError):
+        raise ValueError('Cursor inválido')
+    return data_hora, id_chamado
+
+def ler_parametros(args):
+    """Lê `limit`, `after` e `stream` da query string
+
+    Retorna (limite, cursor, streaming). `limite` é None quando não informado;
+    no modo paginado o chamador usa LIMITE_PADRAO. Lança ValueError se algum
+    parâmetro for inválido.
+    """
+    limite = args.get('limit')
+    if limite is not None:
+        try:
+            limite = int(limite)
+        except ValueError:
+            raise ValueError('Parâmetro limit deve ser um número inteiro')
+        if limite < 1:
+            raise ValueError('Parâmetro limit deve ser maior que zero')
+
+    after = args.get('after')
+    cursor = decodificar_cursor(after) if after else None
+
+    streaming = args.get('stream', '').lower() in ('1', 'true', 'sim')
+
+    if not streaming and limite is not None and limite > LIMITE_MAXIMO:
+        raise ValueError(f'Parâmetro limit deve ser no máximo {LIMITE_MAXIMO}')
+
+    return limite, cursor, streaming
+
+def montar_pagina(linhas, limite):
+    """Recorta as linhas buscadas com LIMIT limite + 1 e calcula o próximo cursor"""
+    registros = [dict(linha) for linha in linhas[:limite]]
+    proximo = None
+    if len(linhas) > limite:
+        ultimo = registros[-1]
+        proximo = codificar_cursor(ultimo['data_hora'], ultimo['id_chamado'])
+    return registros, proximo
+
+def gerar_json(envelope, chave, linhas):
+    """Serializa `envelope` com a lista `chave` escrita linha a linha
+
+    As linhas vêm direto do cursor do SQLite, então a memória fica constante
+    independentemente do número de registros.
+    """
+    cabecalho = json.dumps(envelope, ensure_ascii=False, default=str)[:-1]
+    separador = ', ' if envelope else ''
+    bloco = [f'{cabecalho}{separador}{json.dumps(chave)}: [']
+    tamanho = len(bloco[0])
+    primeiro = True
+
+    for linha in linhas:
+        item = json.dumps(dict(linha), ensure_ascii=False, default=str)
+        if not primeiro:
+            item = ', ' + item
+        primeiro = False
+
+        bloco.append(item)
+        tamanho += len(item)
+        if tamanho >= TAMANHO_BLOCO:
+            yield ''.join(bloco)
+            bloco, tamanho = [], 0
+
+    bloco.append(']}')
+    yield ''.join(bloco)
@@ -1,8 +1,13 @@
 import os
-import sqlite3
-import jinja2
+import sys
+import functools
+import database
+import lote
+from renderizador_pdf import RenderizadorPDF
 from datetime import datetime
-from weasyprint import HTML, CSS
+
+# Configuração do banco de dados
+DB_PATH = 'chamados.db'
 
 class LogoManager:
     def __init__(self):
@@ -55,6 +60,100 @@ class LogoManager:
 # Inicializa os logos
 logo_manager = LogoManager()
 
+# Folha de estilo dos relatórios PDF
+CSS_RELATORIO = '''
+    @page {
+        size: A4;
+        margin: 2cm;
+        @top-center {
+            content: "Relatório de Atendimento ao Cliente";
+            font-size: 10pt;
+        }
+        @bottom-right {
+            content: "Página " counter(page) " de " counter(pages);
+            font-size: 9pt;
+        }
+    }
+    body {
+        font-family: "Noto Sans", sans-serif;
+        font-size: 11pt;
+        line-height: 1.4;
+    }
+    .header {
+        text-align: center;
+        margin-bottom: 20px;
+    }
+    .logos {
+        display: flex;
+        justify-content: space-between;
+        align-items: center;
+        margin-bottom: 10px;
+    }
+    .logo-left, .logo-right {
+        max-width: 150px;
+        max-height: 60px;
+    }
+    .title {
+        font-size: 18pt;
+        font-weight: bold;
+        margin: 10px 0;
+        color: #003366;
+    }
+    .rac-number {
+        font-size: 14pt;
+        margin-bottom: 20px;
+    }
+    .section {
+        margin-bottom: 15px;
+        border: 1px solid #ddd;
+    }
+    .section-header {
+        background-color: #f0f0f0;
+        padding: 8px;
+        font-weight: bold;
+    }
+    .section-content {
+        padding: 10px;
+    }
+    table {
+        width: 100%;
+        border-collapse: collapse;
+    }
+    table, th, td {
+        border: 1px solid #ddd;
+    }
+    th, td {
+        padding: 8px;
+        text-align: left;
+    }
+    th {
+        background-color: #f0f0f0;
+        width: 30%;
+    }
+    .footer {
+        margin-top: 30px;
+        text-align: center;
+        font-size: 9pt;
+        color: #666;
+        border-top: 1px solid #ddd;
+        padding-top: 10px;
+    }
+'''
+
+# Renderizador do processo atual (criado no primeiro relatório)
+_renderizador = None
+
+def obter_renderizador():
+    """Retorna o renderizador de PDF do processo, criando-o na primeira chamada"""
+    global _renderizador
+    if _renderizador is None:
+        templates_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+        _renderizador = RenderizadorPDF(templates_dir, CSS_RELATORIO, logos={
+            'esquerdo': logo_manager.logo_left_path,
+            'direito': logo_manager.logo_right_path
+        })
+    return _renderizador
+
 def criar_diretorio_relatorios():
     """Cria o diretório para armazenar os relatórios PDF"""
     relatorios_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'relatorios')
@@ -63,37 +162,32 @@ def criar_diretorio_relatorios():
     return relatorios_dir
 
 def get_db_connection():
-    """Cria uma conexão com o banco de dados"""
-    conn = sqlite3.connect('chamados.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Obtém a conexão compartilhada da thread (usar com `with`)"""
+    return database.get_db_connection(DB_PATH)
 
 def obter_dados_chamado(id_chamado):
     """Obtém todos os dados de um chamado específico"""
-    conn = get_db_connection()
-    
-    # Consulta que une as tabelas para obter todas as informações do chamado
-    chamado = conn.execute("""
-        SELECT 
-            c.id_chamado, c.data_hora, c.tipo, c.prioridade, 
-            c.descricao, c.ambiente, c.tempo_ocorrencia,
-            c.analise, c.procedimentos, c.solucao, c.status,
-            c.tempo_atendimento, c.observacoes, c.recomendacoes,
-            c.data_fechamento,
-            cl.nome as cliente, cl.cnpj_cpf, cl.contato, cl.telefone, cl.email,
-            p.nome as plantonista,
-            cat.nome as categoria,
-            proj.sigla as projeto_sigla, proj.nome as projeto_nome,
-            proj.gerente as gerente_projeto, proj.email_gerente, proj.telefone_gerente
-        FROM chamado c
-        JOIN cliente cl ON c.id_cliente = cl.id_cliente
-        JOIN plantonista p ON c.id_plantonista = p.id_plantonista
-        LEFT JOIN categoria cat ON c.id_categoria = cat.id_categoria
-        LEFT JOIN projeto proj ON c.id_projeto = proj.id_projeto
-        WHERE c.id_chamado = ?
-    """, (id_chamado,)).fetchone()
-    
-    conn.close()
+    with get_db_connection() as conn:
+        # Consulta que une as tabelas para obter todas as informações do chamado
+        chamado = conn.execute("""
+            SELECT 
+                c.id_chamado, c.numero_rac, c.data_hora, c.tipo, c.prioridade, 
+                c.descricao, c.ambiente, c.tempo_ocorrencia,
+                c.analise, c.procedimentos, c.solucao, c.status,
+                c.tempo_atendimento, c.observacoes, c.recomendacoes,
+                c.data_fechamento,
+                cl.nome as cliente, cl.cnpj_cpf, cl.contato, cl.telefone, cl.email,
+                p.nome as plantonista,
+                cat.nome as categoria,
+                proj.sigla as projeto_sigla, proj.nome as projeto_nome,
+                proj.gerente as gerente_projeto, proj.email_gerente, proj.telefone_gerente
+            FROM chamado c
+            JOIN cliente cl ON c.id_cliente = cl.id_cliente
+            JOIN plantonista p ON c.id_plantonista = p.id_plantonista
+            LEFT JOIN categoria cat ON c.id_categoria = cat.id_categoria
+            LEFT JOIN projeto proj ON c.id_projeto = proj.id_projeto
+            WHERE c.id_chamado = ?
+        """, (id_chamado,)).fetchone()
     
     if chamado is None:
         return None
@@ -126,170 +220,137 @@ def obter_dados_chamado(id_chamado):
     
     return chamado_dict
 
-def gerar_relatorio_pdf(id_chamado):
-    """Gera um relatório PDF para um chamado específico"""
+def gerar_relatorio_pdf(id_chamado, forcar=False):
+    """Gera um relatório PDF para um chamado específico
+
+    Se os dados do chamado e o layout não mudaram desde a última geração (mesmo
+    hash de conteúdo) e o arquivo ainda existe, retorna o PDF existente sem
+    renderizar novamente. Com forcar=True, o PDF é sempre renderizado.
+    """
     # Obtém os dados do chamado
     chamado_data = obter_dados_chamado(id_chamado)
     
     if chamado_data is None:
         raise ValueError(f"Chamado não encontrado: {id_chamado}")
     
-    # Configura o ambiente Jinja2
-    templates_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
-    env = jinja2.Environment(loader=jinja2.FileSystemLoader(templates_dir))
-    
-    # Carrega o template
-    template = env.get_template('relatorio_template.html')
+    renderizador = obter_renderizador()
+    hash_conteudo = renderizador.calcular_hash(chamado_data)
     
-    # Renderiza o HTML com os dados do chamado
-    html_content = template.render(chamado=chamado_data)
+    # Reaproveita o PDF existente quando o conteúdo não mudou
+    if not forcar:
+        relatorio = obter_relatorio(id_chamado)
+        if (relatorio is not None and relatorio['hash_conteudo'] == hash_conteudo
+                and os.path.exists(relatorio['caminho_pdf'])):
+            return relatorio['caminho_pdf']
     
     # Define o caminho de saída do PDF
     relatorios_dir = criar_diretorio_relatorios()
-    rac_id = chamado_data['id_chamado']
+    rac_id = chamado_data['numero_rac']
     output_path = os.path.join(relatorios_dir, f"{rac_id}.pdf")
     
-    # Gera o PDF
-    HTML(string=html_content).write_pdf(
-        output_path,
-        stylesheets=[
-            CSS(string='''
-                @page {
-                    size: A4;
-                    margin: 2cm;
-                    @top-center {
-                        content: "Relatório de Atendimento ao Cliente";
-                        font-size: 10pt;
-                    }
-                    @bottom-right {
-                        content: "Página " counter(page) " de " counter(pages);
-                        font-size: 9pt;
-                    }
-                }
-                body {
-                    font-family: "Noto Sans", sans-serif;
-                    font-size: 11pt;
-                    line-height: 1.4;
-                }
-                .header {
-                    text-align: center;
-                    margin-bottom: 20px;
-                }
-                .logos {
-                    display: flex;
-                    justify-content: space-between;
-                    align-items: center;
-                    margin-bottom: 10px;
-                }
-                .logo-left, .logo-right {
-                    max-width: 150px;
-                    max-height: 60px;
-                }
-                .title {
-                    font-size: 18pt;
-                    font-weight: bold;
-                    margin: 10px 0;
-                    color: #003366;
-                }
-                .rac-number {
-                    font-size: 14pt;
-                    margin-bottom: 20px;
-                }
-                .section {
-                    margin-bottom: 15px;
-                    border: 1px solid #ddd;
-                }
-                .section-header {
-                    background-color: #f0f0f0;
-                    padding: 8px;
-                    font-weight: bold;
-                }
-                .section-content {
-                    padding: 10px;
-                }
-                table {
-                    width: 100%;
-                    border-collapse: collapse;
-                }
-                table, th, td {
-                    border: 1px solid #ddd;
-                }
-                th, td {
-                    padding: 8px;
-                    text-align: left;
-                }
-                th {
-                    background-color: #f0f0f0;
-                    width: 30%;
-                }
-                .footer {
-                    margin-top: 30px;
-                    text-align: center;
-                    font-size: 9pt;
-                    color: #666;
-                    border-top: 1px solid #ddd;
-                    padding-top: 10px;
-                }
-            ''')
-        ]
-    )
+    # Gera o PDF com o renderizador do processo
+    renderizador.gerar_pdf(chamado_data, output_path)
     
     # Registra o relatório no banco de dados
-    registrar_relatorio(id_chamado, output_path)
+    registrar_relatorio(id_chamado, output_path, hash_conteudo)
     
     return output_path
 
-def registrar_relatorio(id_chamado, pdf_path):
+def obter_relatorio(id_chamado):
+    """Retorna o caminho do PDF e o hash de conteúdo do relatório do chamado"""
+    with get_db_connection() as conn:
+        return conn.execute("""
+            SELECT caminho_pdf, hash_conteudo FROM relatorio WHERE id_chamado = ?
+        """, (id_chamado,)).fetchone()
+
+def registrar_relatorio(id_chamado, pdf_path, hash_conteudo=None):
     """Registra o relatório gerado no banco de dados"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Verifica se já existe um relatório para este chamado
-    cursor.execute("SELECT id_relatorio FROM relatorio WHERE id_chamado = ?", (id_chamado,))
-    relatorio = cursor.fetchone()
-    
-    if relatorio is None:
-        # Insere novo registro
-        cursor.execute("""
-            INSERT INTO relatorio (id_chamado, caminho_pdf, data_geracao)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-        """, (id_chamado, pdf_path))
-    else:
-        # Atualiza registro existente
-        cursor.execute("""
-            UPDATE relatorio
-            SET caminho_pdf = ?, data_geracao = CURRENT_TIMESTAMP
-            WHERE id_chamado = ?
-        """, (pdf_path, id_chamado))
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Verifica se já existe um relatório para este chamado
+        cursor.execute("SELECT id_relatorio FROM relatorio WHERE id_chamado = ?", (id_chamado,))
+        relatorio = cursor.fetchone()
+        
+        if relatorio is None:
+            # Insere novo registro
+            cursor.execute("""
+                INSERT INTO relatorio (id_chamado, caminho_pdf, data_geracao, hash_conteudo)
+                VALUES (?, ?, CURRENT_TIMESTAMP, ?)
+            """, (id_chamado, pdf_path, hash_conteudo))
+        else:
+            # Atualiza registro existente
+            cursor.execute("""
+                UPDATE relatorio
+                SET caminho_pdf = ?, data_geracao = CURRENT_TIMESTAMP, hash_conteudo = ?
+                WHERE id_chamado = ?
+            """, (pdf_path, hash_conteudo, id_chamado))
+
+def buscar_chamados_pendentes():
+    """Retorna os IDs dos chamados resolvidos que ainda não têm relatório"""
+    with get_db_connection() as conn:
+        chamados = conn.execute("""
+            SELECT c.id_chamado
+            FROM chamado c
+            LEFT JOIN relatorio r ON c.id_chamado = r.id_chamado
+            WHERE c.status = 'Resolvido' AND r.id_relatorio IS NULL
+        """).fetchall()
     
-    conn.commit()
-    conn.close()
+    return [chamado['id_chamado'] for chamado in chamados]
+
+def _inicializar_processo(db_path):
+    """Prepara um processo da geração em lote (executado uma vez por processo)
 
-def gerar_relatorios_pendentes():
-    """Gera relatórios para todos os chamados resolvidos sem relatório"""
-    conn = get_db_connection()
+    O processo passa a usar o banco informado; a conexão é aberta no primeiro
+    chamado e reaproveitada nos seguintes pelo pool de database.py.
+    """
+    global DB_PATH
+    DB_PATH = db_path
+
+def gerar_relatorios_em_lote(ids_chamados=None, processos=None, forcar=False):
+    """Gera os relatórios de vários chamados em paralelo, em um pool de processos
+
+    Sem ids_chamados, gera os relatórios pendentes. Relatórios sem mudanças são
+    reaproveitados, a menos que forcar=True. Retorna um item por chamado com
+    'status' ('success' ou 'error') e 'pdf_path' ou 'message'.
+    """
+    if ids_chamados is None:
+        ids_chamados = buscar_chamados_pendentes()
     
-    # Busca chamados resolvidos que não têm relatório
-    chamados = conn.execute("""
-        SELECT c.id_chamado
-        FROM chamado c
-        LEFT JOIN relatorio r ON c.id_chamado = r.id_chamado
-        WHERE c.status = 'Resolvido' AND r.id_relatorio IS NULL
-    """).fetchall()
+    resultados = lote.executar_em_lote(
+        functools.partial(gerar_relatorio_pdf, forcar=forcar), ids_chamados,
+        processos=processos,
+        inicializador=_inicializar_processo,
+        argumentos_inicializador=(os.path.abspath(DB_PATH),)
+    )
     
-    conn.close()
+    relatorios = []
+    for resultado in resultados:
+        relatorio = {'id_chamado': resultado['item'], 'status': resultado['status']}
+        if resultado['status'] == 'success':
+            relatorio['pdf_path'] = resultado['resultado']
+        else:
+            relatorio['message'] = resultado['message']
+        relatorios.append(relatorio)
     
+    return relatorios
+
+def gerar_relatorios_pendentes(processos=1):
+    """Gera relatórios para todos os chamados resolvidos sem relatório
+
+    Com processos > 1 (ou None, um por CPU), as renderizações são distribuídas
+    entre vários processos.
+    """
     relatorios_gerados = []
     
-    for chamado in chamados:
-        try:
-            pdf_path = gerar_relatorio_pdf(chamado['id_chamado'])
+    for relatorio in gerar_relatorios_em_lote(processos=processos):
+        if relatorio['status'] == 'success':
             relatorios_gerados.append({
-                'id_chamado': chamado['id_chamado'],
-                'pdf_path': pdf_path
+                'id_chamado': relatorio['id_chamado'],
+                'pdf_path': relatorio['pdf_path']
             })
-        except Exception as e:
-            print(f"Erro ao gerar relatório para chamado {chamado['id_chamado']}: {str(e)}")
+        else:
+            print(f"Erro ao gerar relatório para chamado {relatorio['id_chamado']}: {relatorio['message']}")
     
     return relatorios_gerados
 
@@ -300,8 +361,9 @@ if __name__ == "__main__":
         pdf_path = gerar_relatorio_pdf(1)
         print(f"Relatório gerado com sucesso: {pdf_path}")
         
-        # Gera relatórios pendentes
-        relatorios = gerar_relatorios_pendentes()
+        # Gera relatórios pendentes (opcionalmente: python pdf_generator.py <processos>)
+        processos = int(sys.argv[1]) if len(sys.argv) > 1 else None
+        relatorios = gerar_relatorios_pendentes(processos=processos)
         print(f"Relatórios pendentes gerados: {len(relatorios)}")
         for relatorio in relatorios:
             print(f"- Chamado {relatorio['id_chamado']}: {relatorio['pdf_path']}")
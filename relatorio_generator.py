@@ -1,8 +1,88 @@
 import os
-import sqlite3
+import functools
+import database
+import lote
 from datetime import datetime
-from weasyprint import HTML, CSS
-from jinja2 import Environment, FileSystemLoader
+from renderizador_pdf import RenderizadorPDF
+
+# Folha de estilo dos relatórios PDF
+CSS_RELATORIO = '''
+    @page {
+        size: A4;
+        margin: 2cm;
+        @top-center {
+            content: "Relatório de Atendimento ao Cliente";
+            font-size: 10pt;
+        }
+        @bottom-right {
+            content: "Página " counter(page) " de " counter(pages);
+            font-size: 9pt;
+        }
+    }
+    body {
+        font-family: "Noto Sans", sans-serif;
+        font-size: 11pt;
+        line-height: 1.4;
+    }
+    .header {
+        text-align: center;
+        margin-bottom: 20px;
+    }
+    .logo {
+        max-width: 200px;
+        max-height: 80px;
+    }
+    h1 {
+        font-size: 18pt;
+        margin: 10px 0;
+        color: #003366;
+    }
+    .section {
+        margin-bottom: 15px;
+        border: 1px solid #ddd;
+        padding: 10px;
+    }
+    .section-title {
+        background-color: #f0f0f0;
+        padding: 5px;
+        margin-bottom: 10px;
+        font-weight: bold;
+    }
+    table {
+        width: 100%;
+        border-collapse: collapse;
+    }
+    table, th, td {
+        border: 1px solid #ddd;
+    }
+    th, td {
+        padding: 8px;
+        text-align: left;
+    }
+    th {
+        background-color: #f0f0f0;
+    }
+    .footer {
+        margin-top: 30px;
+        text-align: center;
+        font-size: 9pt;
+        color: #666;
+    }
+'''
+
+# Renderizador do processo atual (criado no primeiro relatório)
+_renderizador = None
+
+def obter_renderizador():
+    """Retorna o renderizador de PDF do processo, criando-o na primeira chamada"""
+    global _renderizador
+    if _renderizador is None:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        _renderizador = RenderizadorPDF(os.path.join(base_dir, 'templates'), CSS_RELATORIO, logos={
+            'esquerdo': os.path.join(base_dir, 'static/img/logo_left.png'),
+            'direito': os.path.join(base_dir, 'static/img/logo_right.png')
+        })
+    return _renderizador
 
 class RelatorioGenerator:
     def __init__(self, db_path='chamados.db'):
@@ -13,42 +93,34 @@ class RelatorioGenerator:
         # Cria o diretório de saída se não existir
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
-        
-        # Configura o ambiente Jinja2
-        self.env = Environment(loader=FileSystemLoader(self.templates_dir))
     
     def get_db_connection(self):
-        """Cria uma conexão com o banco de dados"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Obtém a conexão compartilhada da thread (usar com `with`)"""
+        return database.get_db_connection(self.db_path)
     
     def get_chamado_data(self, id_chamado):
         """Obtém todos os dados de um chamado específico"""
-        conn = self.get_db_connection()
-        
-        # Consulta que une as tabelas para obter todas as informações do chamado
-        chamado = conn.execute("""
-            SELECT 
-                c.id_chamado, c.data_hora, c.tipo, c.prioridade, 
-                c.descricao, c.ambiente, c.tempo_ocorrencia,
-                c.analise, c.procedimentos, c.solucao, c.status,
-                c.tempo_atendimento, c.observacoes, c.recomendacoes,
-                c.data_fechamento,
-                cl.nome as cliente, cl.cnpj_cpf, cl.contato, cl.telefone, cl.email,
-                p.nome as plantonista,
-                cat.nome as categoria,
-                proj.sigla as projeto_sigla, proj.nome as projeto_nome,
-                proj.gerente as gerente_projeto, proj.email_gerente, proj.telefone_gerente
-            FROM chamado c
-            JOIN cliente cl ON c.id_cliente = cl.id_cliente
-            JOIN plantonista p ON c.id_plantonista = p.id_plantonista
-            JOIN categoria cat ON c.id_categoria = cat.id_categoria
-            LEFT JOIN projeto proj ON c.id_projeto = proj.id_projeto
-            WHERE c.id_chamado = ?
-        """, (id_chamado,)).fetchone()
-        
-        conn.close()
+        with self.get_db_connection() as conn:
+            # Consulta que une as tabelas para obter todas as informações do chamado
+            chamado = conn.execute("""
+                SELECT 
+                    c.id_chamado, c.numero_rac, c.data_hora, c.tipo, c.prioridade, 
+                    c.descricao, c.ambiente, c.tempo_ocorrencia,
+                    c.analise, c.procedimentos, c.solucao, c.status,
+                    c.tempo_atendimento, c.observacoes, c.recomendacoes,
+                    c.data_fechamento,
+                    cl.nome as cliente, cl.cnpj_cpf, cl.contato, cl.telefone, cl.email,
+                    p.nome as plantonista,
+                    cat.nome as categoria,
+                    proj.sigla as projeto_sigla, proj.nome as projeto_nome,
+                    proj.gerente as gerente_projeto, proj.email_gerente, proj.telefone_gerente
+                FROM chamado c
+                JOIN cliente cl ON c.id_cliente = cl.id_cliente
+                JOIN plantonista p ON c.id_plantonista = p.id_plantonista
+                JOIN categoria cat ON c.id_categoria = cat.id_categoria
+                LEFT JOIN projeto proj ON c.id_projeto = proj.id_projeto
+                WHERE c.id_chamado = ?
+            """, (id_chamado,)).fetchone()
         
         if chamado is None:
             return None
@@ -56,8 +128,13 @@ class RelatorioGenerator:
         # Converte o objeto Row para dicionário
         return dict(chamado)
     
-    def generate_pdf(self, id_chamado):
-        """Gera um relatório PDF para um chamado específico"""
+    def generate_pdf(self, id_chamado, force=False):
+        """Gera e registra o relatório PDF de um chamado específico
+
+        Se os dados do chamado e o layout não mudaram desde a última geração
+        (mesmo hash de conteúdo) e o arquivo ainda existe, retorna o PDF
+        existente sem renderizar novamente. Com force=True, sempre renderiza.
+        """
         # Obtém os dados do chamado
         chamado_data = self.get_chamado_data(id_chamado)
         
@@ -87,145 +164,129 @@ class RelatorioGenerator:
         else:
             chamado_data['tempo_formatado'] = 'N/A'
         
-        # Carrega o template
-        template = self.env.get_template('relatorio_template.html')
+        renderizador = obter_renderizador()
+        content_hash = renderizador.calcular_hash(chamado_data)
         
-        # Renderiza o HTML com os dados do chamado
-        html_content = template.render(chamado=chamado_data)
+        # Reaproveita o PDF existente quando o conteúdo não mudou
+        if not force:
+            report = self.get_report(id_chamado)
+            if (report is not None and report['hash_conteudo'] == content_hash
+                    and os.path.exists(report['caminho_pdf'])):
+                return report['caminho_pdf']
         
         # Define o caminho de saída do PDF
-        rac_id = id_chamado if isinstance(id_chamado, str) else f"RAC{id_chamado:04d}"
+        rac_id = chamado_data['numero_rac']
         output_path = os.path.join(self.output_dir, f"{rac_id}.pdf")
         
-        # Gera o PDF
-        HTML(string=html_content).write_pdf(
-            output_path,
-            stylesheets=[
-                CSS(string='''
-                    @page {
-                        size: A4;
-                        margin: 2cm;
-                        @top-center {
-                            content: "Relatório de Atendimento ao Cliente";
-                            font-size: 10pt;
-                        }
-                        @bottom-right {
-                            content: "Página " counter(page) " de " counter(pages);
-                            font-size: 9pt;
-                        }
-                    }
-                    body {
-                        font-family: "Noto Sans", sans-serif;
-                        font-size: 11pt;
-                        line-height: 1.4;
-                    }
-                    .header {
-                        text-align: center;
-                        margin-bottom: 20px;
-                    }
-                    .logo {
-                        max-width: 200px;
-                        max-height: 80px;
-                    }
-                    h1 {
-                        font-size: 18pt;
-                        margin: 10px 0;
-                        color: #003366;
-                    }
-                    .section {
-                        margin-bottom: 15px;
-                        border: 1px solid #ddd;
-                        padding: 10px;
-                    }
-                    .section-title {
-                        background-color: #f0f0f0;
-                        padding: 5px;
-                        margin-bottom: 10px;
-                        font-weight: bold;
-                    }
-                    table {
-                        width: 100%;
-                        border-collapse: collapse;
-                    }
-                    table, th, td {
-                        border: 1px solid #ddd;
-                    }
-                    th, td {
-                        padding: 8px;
-                        text-align: left;
-                    }
-                    th {
-                        background-color: #f0f0f0;
-                    }
-                    .footer {
-                        margin-top: 30px;
-                        text-align: center;
-                        font-size: 9pt;
-                        color: #666;
-                    }
-                ''')
-            ]
-        )
+        # Gera o PDF com o renderizador do processo
+        renderizador.gerar_pdf(chamado_data, output_path)
+        
+        # Registra o relatório no banco de dados
+        self.register_report(id_chamado, output_path, content_hash)
         
         return output_path
     
-    def generate_all_pending_reports(self):
-        """Gera relatórios para todos os chamados resolvidos sem relatório"""
-        conn = self.get_db_connection()
+    def get_report(self, id_chamado):
+        """Retorna o caminho do PDF e o hash de conteúdo do relatório do chamado"""
+        with self.get_db_connection() as conn:
+            return conn.execute("""
+                SELECT caminho_pdf, hash_conteudo FROM relatorio WHERE id_chamado = ?
+            """, (id_chamado,)).fetchone()
+    
+    def get_pending_ids(self):
+        """Retorna os IDs dos chamados resolvidos que ainda não têm relatório"""
+        with self.get_db_connection() as conn:
+            chamados = conn.execute("""
+                SELECT c.id_chamado
+                FROM chamado c
+                LEFT JOIN relatorio r ON c.id_chamado = r.id_chamado
+                WHERE c.status = 'Resolvido' AND r.id_relatorio IS NULL
+            """).fetchall()
+        
+        return [chamado['id_chamado'] for chamado in chamados]
+    
+    def generate_reports_batch(self, ids_chamados=None, processes=None, force=False):
+        """Gera e registra os relatórios de vários chamados em um pool de processos
+
+        Sem ids_chamados, gera os relatórios pendentes. Cada processo cria seu
+        próprio RelatorioGenerator uma única vez; relatórios sem mudanças são
+        reaproveitados, a menos que force=True. Retorna um item por chamado
+        com 'status' ('success' ou 'error') e 'pdf_path' ou 'message'.
+        """
+        if ids_chamados is None:
+            ids_chamados = self.get_pending_ids()
         
-        # Busca chamados resolvidos que não têm relatório
-        chamados = conn.execute("""
-            SELECT c.id_chamado
-            FROM chamado c
-            LEFT JOIN relatorio r ON c.id_chamado = r.id_chamado
-            WHERE c.status = 'Resolvido' AND r.id_relatorio IS NULL
-        """).fetchall()
+        resultados = lote.executar_em_lote(
+            functools.partial(_gerar_relatorio_processo, force=force), ids_chamados,
+            processos=processes,
+            inicializador=_inicializar_processo,
+            argumentos_inicializador=(os.path.abspath(self.db_path),)
+        )
         
-        conn.close()
+        reports = []
+        for resultado in resultados:
+            report = {'id_chamado': resultado['item'], 'status': resultado['status']}
+            if resultado['status'] == 'success':
+                report['pdf_path'] = resultado['resultado']
+            else:
+                report['message'] = resultado['message']
+            reports.append(report)
         
+        return reports
+    
+    def generate_all_pending_reports(self, processes=1):
+        """Gera relatórios para todos os chamados resolvidos sem relatório
+
+        Com processes > 1 (ou None, um por CPU), as renderizações são
+        distribuídas entre vários processos.
+        """
         generated_reports = []
         
-        for chamado in chamados:
-            try:
-                pdf_path = self.generate_pdf(chamado['id_chamado'])
-                
-                # Registra o relatório no banco de dados
-                self.register_report(chamado['id_chamado'], pdf_path)
-                
+        for report in self.generate_reports_batch(processes=processes):
+            if report['status'] == 'success':
                 generated_reports.append({
-                    'id_chamado': chamado['id_chamado'],
-                    'pdf_path': pdf_path
+                    'id_chamado': report['id_chamado'],
+                    'pdf_path': report['pdf_path']
                 })
-            except Exception as e:
-                print(f"Erro ao gerar relatório para chamado {chamado['id_chamado']}: {str(e)}")
+            else:
+                print(f"Erro ao gerar relatório para chamado {report['id_chamado']}: {report['message']}")
         
         return generated_reports
     
-    def register_report(self, id_chamado, pdf_path):
+    def register_report(self, id_chamado, pdf_path, content_hash=None):
         """Registra o relatório gerado no banco de dados"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        
-        # Verifica se já existe um relatório para este chamado
-        cursor.execute("SELECT id_relatorio FROM relatorio WHERE id_chamado = ?", (id_chamado,))
-        relatorio = cursor.fetchone()
-        
-        if relatorio is None:
-            # Insere novo registro
-            cursor.execute("""
-                INSERT INTO relatorio (id_chamado, caminho_pdf, data_geracao)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
-            """, (id_chamado, pdf_path))
-        else:
-            # Atualiza registro existente
-            cursor.execute("""
-                UPDATE relatorio
-                SET caminho_pdf = ?, data_geracao = CURRENT_TIMESTAMP
-                WHERE id_chamado = ?
-            """, (pdf_path, id_chamado))
-        
-        conn.commit()
-        conn.close()
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Verifica se já existe um relatório para este chamado
+            cursor.execute("SELECT id_relatorio FROM relatorio WHERE id_chamado = ?", (id_chamado,))
+            relatorio = cursor.fetchone()
+            
+            if relatorio is None:
+                # Insere novo registro
+                cursor.execute("""
+                    INSERT INTO relatorio (id_chamado, caminho_pdf, data_geracao, hash_conteudo)
+                    VALUES (?, ?, CURRENT_TIMESTAMP, ?)
+                """, (id_chamado, pdf_path, content_hash))
+            else:
+                # Atualiza registro existente
+                cursor.execute("""
+                    UPDATE relatorio
+                    SET caminho_pdf = ?, data_geracao = CURRENT_TIMESTAMP, hash_conteudo = ?
+                    WHERE id_chamado = ?
+                """, (pdf_path, content_hash, id_chamado))
+
+# Gerador do processo atual na geração em lote (criado uma vez por processo)
+_gerador_processo = None
+
+def _inicializar_processo(db_path):
+    """Cria o gerador reaproveitado por todos os chamados deste processo"""
+    global _gerador_processo
+    _gerador_processo = RelatorioGenerator(db_path)
+
+def _gerar_relatorio_processo(id_chamado, force=False):
+    """Gera e registra o relatório de um chamado no processo atual"""
+    return _gerador_processo.generate_pdf(id_chamado, force=force)
 
 # Função para testar a geração de relatórios
 def test_report_generation():
@@ -1,11 +1,18 @@
 import os
 import smtplib
-import sqlite3
+import database
+from sessao_smtp import SessaoSMTP
 import requests
 import json
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.application import MIMEApplication
+import time
+import random
+import threading
+import despacho
+from cliente_whatsapp import ClienteWhatsApp
+from confirmacoes import ConfirmacoesEnvio
+from anexos import MensagemAnexos, tamanho_anexo
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 class RelatorioSender:
@@ -17,52 +24,247 @@ class RelatorioSender:
         self.email_config = {
             'smtp_server': 'smtp.gmail.com',
             'smtp_port': 587,
+            'starttls': True,
             'username': 'seu_email@gmail.com',
             'password': 'sua_senha_ou_token',
             'from_email': 'seu_email@gmail.com',
             'from_name': 'Sistema de Chamados'
         }
         
-        # Configurações do WhatsApp (usando API externa)
+        # Configurações do WhatsApp (usando API externa); sem api_token o envio é simulado
         self.whatsapp_config = {
             'api_url': 'https://api.whatsapp.com/send',
-            'phone_number': '+5511977123444'  # Número fornecido pelo usuário
+            'phone_number': '+5511977123444',  # Número fornecido pelo usuário
+            'api_token': None,
+            'codigo_pais': '55',
+            'validade_midia_dias': 25  # ids de mídia reaproveitados por até N dias
+        }
+        self._whatsapp_client = None
+        self._whatsapp_lock = threading.Lock()
+        
+        # Fila de envio: tentativas antes do descarte e espera entre elas (segundos)
+        self.retry_config = {
+            'max_tentativas': 6,
+            'atraso_base': 60,
+            'atraso_maximo': 6 * 3600
+        }
+        
+        # Resultados dos envios gravados no banco em lotes desse tamanho
+        # (uma transação por lote; ver open_acknowledgements)
+        self.ack_config = {
+            'tamanho_lote': 100
+        }
+        
+        # Agrupamento por destinatário: relatórios gerados dentro da janela seguem
+        # em uma única mensagem; resumo_gerente troca o Cc por um resumo por gerente
+        self.coalesce_config = {
+            'janela_minutos': 24 * 60,
+            'max_anexos': 10,
+            'resumo_gerente': False
+        }
+        
+        # Anexos: tamanho máximo de uma mensagem (bytes já codificados) e total de
+        # bytes de anexos em trânsito somando os envios simultâneos
+        self.attachment_config = {
+            'max_mensagem': 20 * 1024 * 1024,
+            'max_em_transito': 64 * 1024 * 1024
+        }
+        self.attachment_budget = despacho.LimiteBytes(self.attachment_config['max_em_transito'])
+        
+        # Envio concorrente: vagas simultâneas e limite de taxa (envios/s e rajada)
+        # por canal, de acordo com as cotas dos provedores
+        self.dispatch_config = {
+            'Email': {'concorrencia': 4, 'taxa': 5.0, 'rajada': 5},
+            'WhatsApp': {'concorrencia': 2, 'taxa': 1.0, 'rajada': 3}
         }
     
     def get_db_connection(self):
-        """Cria uma conexão com o banco de dados"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
-    
-    def get_pending_reports(self):
-        """Obtém relatórios pendentes de envio"""
-        conn = self.get_db_connection()
-        
-        # Busca relatórios gerados mas não enviados
-        relatorios = conn.execute("""
-            SELECT r.id_relatorio, r.id_chamado, r.caminho_pdf, 
-                   c.id_cliente, cl.nome as cliente, cl.email, cl.telefone,
-                   c.id_projeto, p.email_gerente
-            FROM relatorio r
-            JOIN chamado c ON r.id_chamado = c.id_chamado
-            JOIN cliente cl ON c.id_cliente = cl.id_cliente
-            LEFT JOIN projeto p ON c.id_projeto = p.id_projeto
-            WHERE r.enviado = 0
-        """).fetchall()
-        
-        conn.close()
+        """Obtém a conexão compartilhada da thread (usar com `with`)"""
+        return database.get_db_connection(self.db_path)
+    
+    def get_pending_reports(self, limit=None):
+        """Obtém relatórios pendentes de envio cuja próxima tentativa já venceu
+
+        Relatórios descartados ou reagendados para mais tarde não são lidos
+        (o índice parcial idx_relatorio_fila cobre apenas a fila pendente).
+        """
+        with self.get_db_connection() as conn:
+            # Busca relatórios gerados mas não enviados, na ordem da fila
+            relatorios = conn.execute("""
+                SELECT r.id_relatorio, r.id_chamado, c.numero_rac, r.caminho_pdf, r.tentativas,
+                       r.data_geracao, c.id_cliente, cl.nome as cliente, cl.email, cl.telefone,
+                       c.id_projeto, p.email_gerente, p.telefone_gerente
+                FROM relatorio r
+                JOIN chamado c ON r.id_chamado = c.id_chamado
+                JOIN cliente cl ON c.id_cliente = cl.id_cliente
+                LEFT JOIN projeto p ON c.id_projeto = p.id_projeto
+                WHERE r.status_envio = 'Pendente' AND r.proxima_tentativa <= datetime('now')
+                ORDER BY r.proxima_tentativa
+                LIMIT ?
+            """, (limit if limit is not None else -1,)).fetchall()
         
         # Converte para lista de dicionários
         return [dict(relatorio) for relatorio in relatorios]
     
-    def send_report_by_email(self, relatorio):
-        """Envia relatório por email"""
+    def build_email_message(self, relatorio, cc_manager=True):
+        """Monta a mensagem do relatório para o cliente, com o gerente do projeto em Cc (com cc_manager)"""
+        # Corpo do email
+        body = f"""
+            Prezado(a) {relatorio['cliente']},
+            
+            Segue em anexo o Relatório de Atendimento ao Cliente (RAC) referente ao chamado {relatorio['numero_rac']}.
+            
+            Agradecemos pela confiança em nossos serviços.
+            
+            Atenciosamente,
+            Equipe de Suporte
+            """
+        
+        # O PDF é anexado por referência e lido do disco somente no envio
+        return MensagemAnexos(
+            self.sender_address(),
+            relatorio['email'],
+            f"Relatório de Atendimento - {relatorio['numero_rac']}",
+            body,
+            anexos=[relatorio['caminho_pdf']],
+            cc=relatorio.get('email_gerente') if cc_manager else None
+        )
+    
+    def sender_address(self):
+        """Remetente das mensagens (nome e email)"""
+        return f"{self.email_config['from_name']} <{self.email_config['from_email']}>"
+    
+    def build_group_message(self, relatorios, cc_manager=True):
+        """Monta uma única mensagem com os relatórios de um mesmo destinatário
+
+        Com cc_manager, o gerente do projeto (o mesmo para todo o grupo) vai em Cc.
+        """
+        if len(relatorios) == 1:
+            return self.build_email_message(relatorios[0], cc_manager)
+        
+        primeiro = relatorios[0]
+        numeros = ', '.join(relatorio['numero_rac'] for relatorio in relatorios)
+        
+        # Corpo do email
+        body = f"""
+            Prezado(a) {primeiro['cliente']},
+            
+            Seguem em anexo os Relatórios de Atendimento ao Cliente (RAC) referentes aos chamados {numeros}.
+            
+            Agradecemos pela confiança em nossos serviços.
+            
+            Atenciosamente,
+            Equipe de Suporte
+            """
+        
+        return MensagemAnexos(
+            self.sender_address(),
+            primeiro['email'],
+            f"Relatórios de Atendimento - {numeros}",
+            body,
+            anexos=[relatorio['caminho_pdf'] for relatorio in relatorios],
+            cc=primeiro.get('email_gerente') if cc_manager else None
+        )
+    
+    def build_manager_digest(self, email_gerente, relatorios):
+        """Monta o resumo para o gerente com os relatórios enviados aos clientes no lote"""
+        linhas = '\n'.join(
+            f"            - {relatorio['numero_rac']}: {relatorio['cliente']}" for relatorio in relatorios)
+        body = f"""
+            Prezado(a) gerente,
+            
+            Seguem em anexo os Relatórios de Atendimento ao Cliente (RAC) enviados hoje:
+            
+{linhas}
+            
+            Atenciosamente,
+            Sistema de Chamados
+            """
+        
+        return MensagemAnexos(
+            self.sender_address(),
+            email_gerente,
+            f"Resumo de Relatórios de Atendimento - {datetime.now().strftime('%d/%m/%Y')}",
+            body,
+            anexos=[relatorio['caminho_pdf'] for relatorio in relatorios]
+        )
+    
+    def split_by_size(self, relatorios):
+        """Divide relatórios em partes cujos anexos cabem em uma mensagem (max_mensagem)
+
+        Um relatório que sozinho excede o limite fica em uma parte própria.
+        """
+        limite = self.attachment_config['max_mensagem']
+        partes = []
+        parte, tamanho = [], 0
+        for relatorio in relatorios:
+            anexo = tamanho_anexo(relatorio['caminho_pdf'])
+            if parte and tamanho + anexo > limite:
+                partes.append(parte)
+                parte, tamanho = [], 0
+            parte.append(relatorio)
+            tamanho += anexo
+        if parte:
+            partes.append(parte)
+        return partes
+    
+    def group_reports(self, relatorios, key):
+        """Agrupa relatórios por destinatário dentro da janela de agrupamento
+
+        key(relatorio) identifica o destinatário. Um grupo reúne relatórios
+        gerados até janela_minutos depois do primeiro e no máximo max_anexos.
+        """
+        janela = self.coalesce_config['janela_minutos'] * 60
+        max_anexos = self.coalesce_config['max_anexos']
+        
+        def geracao(relatorio):
+            if not relatorio.get('data_geracao'):
+                return 0
+            return datetime.strptime(relatorio['data_geracao'], '%Y-%m-%d %H:%M:%S').timestamp()
+        
+        grupos = []
+        abertos = {}
+        for relatorio in sorted(relatorios, key=geracao):
+            chave = key(relatorio)
+            grupo = abertos.get(chave)
+            if (grupo is None or len(grupo) >= max_anexos
+                    or geracao(relatorio) - geracao(grupo[0]) > janela):
+                grupo = abertos[chave] = []
+                grupos.append(grupo)
+            grupo.append(relatorio)
+        
+        return grupos
+    
+    def send_email(self, session, msg):
+        """Envia a mensagem pela sessão respeitando os limites de attachment_config
+
+        Mensagens acima de max_mensagem são recusadas antes da leitura dos
+        anexos; as demais aguardam espaço no limite de bytes em trânsito.
+        """
+        tamanho = msg.tamanho()
+        limite = self.attachment_config['max_mensagem']
+        if tamanho > limite:
+            raise ValueError(f"Mensagem de {tamanho / 1048576:.1f} MB excede o limite de {limite / 1048576:.1f} MB")
+        
+        with self.attachment_budget.reservar(tamanho):
+            return session.enviar(msg)
+    
+    def open_email_session(self):
+        """Cria uma sessão SMTP para enviar vários relatórios pela mesma conexão"""
+        return SessaoSMTP(self.email_config)
+    
+    def send_report_by_email(self, relatorio, session=None, cc_manager=True):
+        """Envia relatório por email (cliente em To e, com cc_manager, gerente do projeto em Cc)
+
+        Com session (ver open_email_session), reaproveita a conexão autenticada;
+        sem ela, abre uma conexão apenas para este envio.
+        """
         try:
             # Verifica se o cliente tem email cadastrado
             if not relatorio.get('email'):
                 return {
                     'success': False,
+                    'permanent': True,
                     'message': f"Cliente {relatorio['cliente']} não possui email cadastrado"
                 }
             
@@ -71,49 +273,26 @@ class RelatorioSender:
             if not os.path.exists(pdf_path):
                 return {
                     'success': False,
+                    'permanent': True,
                     'message': f"Arquivo não encontrado: {pdf_path}"
                 }
             
-            # Configura a mensagem
-            msg = MIMEMultipart()
-            msg['From'] = f"{self.email_config['from_name']} <{self.email_config['from_email']}>"
-            msg['To'] = relatorio['email']
-            msg['Subject'] = f"Relatório de Atendimento - {relatorio['id_chamado']}"
+            msg = self.build_email_message(relatorio, cc_manager)
             
-            # Corpo do email
-            body = f"""
-            Prezado(a) {relatorio['cliente']},
-            
-            Segue em anexo o Relatório de Atendimento ao Cliente (RAC) referente ao chamado {relatorio['id_chamado']}.
-            
-            Agradecemos pela confiança em nossos serviços.
+            # Relatório grande demais para email: falha definitiva (segue para o WhatsApp)
+            if msg.tamanho() > self.attachment_config['max_mensagem']:
+                return {
+                    'success': False,
+                    'permanent': True,
+                    'message': f"Relatório {relatorio['numero_rac']} excede o tamanho máximo de email"
+                }
             
-            Atenciosamente,
-            Equipe de Suporte
-            """
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # Anexa o PDF
-            with open(pdf_path, 'rb') as file:
-                attachment = MIMEApplication(file.read(), _subtype="pdf")
-                attachment.add_header('Content-Disposition', 'attachment', filename=os.path.basename(pdf_path))
-                msg.attach(attachment)
-            
-            # Envia o email
-            with smtplib.SMTP(self.email_config['smtp_server'], self.email_config['smtp_port']) as server:
-                server.starttls()
-                server.login(self.email_config['username'], self.email_config['password'])
-                server.send_message(msg)
-            
-            # Adiciona o gerente em cópia se existir
-            if relatorio.get('email_gerente'):
-                msg['To'] = relatorio['email_gerente']
-                msg['Subject'] = f"[Cópia] Relatório de Atendimento - {relatorio['id_chamado']}"
-                
-                with smtplib.SMTP(self.email_config['smtp_server'], self.email_config['smtp_port']) as server:
-                    server.starttls()
-                    server.login(self.email_config['username'], self.email_config['password'])
-                    server.send_message(msg)
+            # Envia uma única mensagem para o cliente e o gerente
+            if session is not None:
+                self.send_email(session, msg)
+            else:
+                with self.open_email_session() as sessao:
+                    self.send_email(sessao, msg)
             
             return {
                 'success': True,
@@ -126,13 +305,37 @@ class RelatorioSender:
                 'message': f"Erro ao enviar email: {str(e)}"
             }
     
+    def whatsapp_client(self):
+        """Cliente do gateway do WhatsApp, criado no primeiro uso e compartilhado entre threads"""
+        with self._whatsapp_lock:
+            if self._whatsapp_client is None:
+                self._whatsapp_client = ClienteWhatsApp(
+                    self.whatsapp_config,
+                    db_path=self.db_path,
+                    conexoes=self.dispatch_config['WhatsApp']['concorrencia']
+                )
+            return self._whatsapp_client
+    
+    def format_phone(self, telefone):
+        """Número no formato do WhatsApp: só dígitos, com o código do país"""
+        numero = ''.join(filter(str.isdigit, telefone))
+        if len(numero) <= 11:
+            numero = self.whatsapp_config['codigo_pais'] + numero
+        return numero
+    
     def send_report_by_whatsapp(self, relatorio):
-        """Envia relatório por WhatsApp (simulação)"""
+        """Envia relatório por WhatsApp ao cliente e ao gerente do projeto
+
+        O PDF é enviado ao gateway uma única vez e o mesmo id de mídia serve
+        para as duas mensagens (ver ClienteWhatsApp). Sem api_token configurado,
+        o envio é apenas simulado.
+        """
         try:
             # Verifica se o cliente tem telefone cadastrado
             if not relatorio.get('telefone'):
                 return {
                     'success': False,
+                    'permanent': True,
                     'message': f"Cliente {relatorio['cliente']} não possui telefone cadastrado"
                 }
             
@@ -141,34 +344,41 @@ class RelatorioSender:
             if not os.path.exists(pdf_path):
                 return {
                     'success': False,
+                    'permanent': True,
                     'message': f"Arquivo não encontrado: {pdf_path}"
                 }
             
-            # Em um ambiente real, aqui seria implementada a integração com a API do WhatsApp Business
-            # Como estamos em um ambiente de simulação, apenas logamos a ação
-            
             # Formata o número de telefone (remove caracteres não numéricos)
             telefone = ''.join(filter(str.isdigit, relatorio['telefone']))
             
-            # Simula o envio
-            print(f"[SIMULAÇÃO] Enviando relatório {relatorio['id_chamado']} por WhatsApp para {telefone}")
-            print(f"[SIMULAÇÃO] Arquivo: {pdf_path}")
-            
-            # Em um ambiente real, usaríamos algo como:
-            # response = requests.post(
-            #     self.whatsapp_config['api_url'],
-            #     headers={'Authorization': f"Bearer {self.whatsapp_config['api_token']}"},
-            #     json={
-            #         'phone': telefone,
-            #         'message': f"Relatório de Atendimento - {relatorio['id_chamado']}",
-            #         'document': {'url': pdf_path}
-            #     }
-            # )
-            # response.raise_for_status()
+            if not self.whatsapp_config.get('api_token'):
+                # Sem credenciais do gateway, apenas simula o envio
+                print(f"[SIMULAÇÃO] Enviando relatório {relatorio['numero_rac']} por WhatsApp para {telefone}")
+                print(f"[SIMULAÇÃO] Arquivo: {pdf_path}")
+                
+                return {
+                    'success': True,
+                    'message': f"WhatsApp enviado com sucesso para {telefone} (simulação)"
+                }
+            
+            cliente = self.whatsapp_client()
+            media_id = cliente.obter_midia(pdf_path)
+            legenda = f"Relatório de Atendimento - {relatorio['numero_rac']}"
+            cliente.enviar_documento(self.format_phone(relatorio['telefone']), media_id,
+                                     os.path.basename(pdf_path), legenda)
+            mensagem = f"WhatsApp enviado com sucesso para {telefone}"
+            
+            # Cópia para o gerente com a mesma mídia; uma falha aqui não desfaz o envio ao cliente
+            if relatorio.get('telefone_gerente'):
+                try:
+                    cliente.enviar_documento(self.format_phone(relatorio['telefone_gerente']), media_id,
+                                             os.path.basename(pdf_path), legenda)
+                except requests.RequestException as e:
+                    mensagem += f" (cópia para o gerente não enviada: {str(e)})"
             
             return {
                 'success': True,
-                'message': f"WhatsApp enviado com sucesso para {telefone} (simulação)"
+                'message': mensagem
             }
             
         except Exception as e:
@@ -177,64 +387,281 @@ class RelatorioSender:
                 'message': f"Erro ao enviar WhatsApp: {str(e)}"
             }
     
-    def mark_as_sent(self, id_relatorio, metodo_envio):
-        """Marca o relatório como enviado no banco de dados"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+    def open_acknowledgements(self):
+        """Abre o registro em lote dos resultados de envio (usar com `with`)
+
+        Resultados de uma execução anterior interrompida são gravados na
+        abertura; por isso o registro deve ser aberto antes de ler a fila.
+        """
+        return ConfirmacoesEnvio(self.db_path, tamanho_lote=self.ack_config['tamanho_lote'])
+    
+    def mark_as_sent(self, id_relatorio, metodo_envio, acks=None):
+        """Marca o relatório como enviado no banco de dados
+
+        Com acks (ver open_acknowledgements), a marcação entra no próximo lote.
+        """
+        if acks is not None:
+            acks.registrar_envio(id_relatorio, metodo_envio)
+            return
+        
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE relatorio
+                SET enviado = 1, metodo_envio = ?, data_envio = CURRENT_TIMESTAMP,
+                    status_envio = 'Enviado', ultimo_erro = NULL
+                WHERE id_relatorio = ?
+            """, (metodo_envio, id_relatorio))
+    
+    def retry_delay(self, tentativas):
+        """Espera (em segundos) antes da próxima tentativa: exponencial com jitter
+
+        A espera dobra a cada tentativa, até atraso_maximo, e é sorteada entre
+        metade e o valor cheio para que falhas simultâneas não voltem juntas.
+        """
+        atraso = min(self.retry_config['atraso_maximo'],
+                     self.retry_config['atraso_base'] * 2 ** (tentativas - 1))
+        return atraso * random.uniform(0.5, 1.0)
+    
+    def mark_as_failed(self, relatorio, erro, permanente=False, acks=None):
+        """Registra uma falha de envio e reagenda ou descarta o relatório
+
+        Falhas definitivas e relatórios que atingiram max_tentativas são
+        descartados (status_envio = 'Descartado'). Com acks, o registro entra
+        no próximo lote. Retorna o novo status_envio.
+        """
+        tentativas = relatorio.get('tentativas', 0) + 1
+        if permanente or tentativas >= self.retry_config['max_tentativas']:
+            status_envio = 'Descartado'
+        else:
+            status_envio = 'Pendente'
+        
+        if acks is not None:
+            acks.registrar_falha(relatorio['id_relatorio'], tentativas, erro, status_envio,
+                                 self.retry_delay(tentativas))
+            return status_envio
         
-        cursor.execute("""
-            UPDATE relatorio
-            SET enviado = 1, metodo_envio = ?, data_envio = CURRENT_TIMESTAMP
-            WHERE id_relatorio = ?
-        """, (metodo_envio, id_relatorio))
+        with self.get_db_connection() as conn:
+            conn.execute("""
+                UPDATE relatorio
+                SET tentativas = ?, ultimo_erro = ?, status_envio = ?,
+                    proxima_tentativa = datetime('now', ?)
+                WHERE id_relatorio = ?
+            """, (tentativas, erro, status_envio,
+                  f"+{int(self.retry_delay(tentativas))} seconds", relatorio['id_relatorio']))
+        
+        return status_envio
+    
+    def get_discarded_reports(self):
+        """Lista os relatórios descartados, com o último erro registrado"""
+        with self.get_db_connection() as conn:
+            relatorios = conn.execute("""
+                SELECT r.id_relatorio, r.id_chamado, c.numero_rac, r.tentativas, r.ultimo_erro
+                FROM relatorio r
+                JOIN chamado c ON r.id_chamado = c.id_chamado
+                WHERE r.status_envio = 'Descartado'
+            """).fetchall()
         
-        conn.commit()
-        conn.close()
+        return [dict(relatorio) for relatorio in relatorios]
+    
+    def requeue_report(self, id_relatorio):
+        """Devolve um relatório descartado para a fila de envio, zerando as tentativas"""
+        with self.get_db_connection() as conn:
+            conn.execute("""
+                UPDATE relatorio
+                SET status_envio = 'Pendente', tentativas = 0, proxima_tentativa = '1970-01-01 00:00:00'
+                WHERE id_relatorio = ? AND status_envio = 'Descartado'
+            """, (id_relatorio,))
     
     def process_pending_reports(self):
-        """Processa todos os relatórios pendentes de envio"""
-        relatorios = self.get_pending_reports()
-        resultados = []
+        """Processa todos os relatórios pendentes de envio
+
+        Todos os emails do lote usam a mesma sessão SMTP autenticada e os
+        resultados são gravados em lote (ver open_acknowledgements).
+        """
+        with self.open_acknowledgements() as acks:
+            relatorios = self.get_pending_reports()
+            
+            with self.open_email_session() as sessao:
+                return [self.process_report(relatorio, sessao, acks=acks) for relatorio in relatorios]
+    
+    def send_coalesced_reports(self):
+        """Envia os relatórios pendentes agrupados por destinatário
+
+        Relatórios de um mesmo cliente (e gerente) seguem em uma única mensagem
+        com vários anexos (ver coalesce_config). Com resumo_gerente, o gerente
+        não vai em Cc e recebe um único resumo do lote com todos os relatórios
+        enviados aos clientes dos seus projetos. Cada relatório continua sendo
+        marcado como enviado individualmente; relatórios sem email ou sem PDF
+        seguem pelo fluxo normal (process_report). Grupos cujos anexos passam
+        de max_mensagem são divididos em várias mensagens.
+        """
+        with self.open_acknowledgements() as acks:
+            relatorios = self.get_pending_reports()
+            resumo_gerente = self.coalesce_config['resumo_gerente']
+            
+            agrupaveis = [r for r in relatorios if r.get('email') and os.path.exists(r['caminho_pdf'])]
+            individuais = [r for r in relatorios if not (r.get('email') and os.path.exists(r['caminho_pdf']))]
+            
+            def destinatario(relatorio):
+                gerente = None if resumo_gerente else (relatorio.get('email_gerente') or '').lower()
+                return (relatorio['email'].strip().lower(), gerente)
+            
+            resultados = []
+            resumos = []
+            enviados = []
+            mensagens = 0
+            
+            with self.open_email_session() as sessao:
+                grupos = [parte for grupo in self.group_reports(agrupaveis, destinatario)
+                          for parte in self.split_by_size(grupo)]
+                for grupo in grupos:
+                    try:
+                        self.send_email(sessao, self.build_group_message(grupo, cc_manager=not resumo_gerente))
+                        mensagens += 1
+                    except Exception:
+                        # Falha no envio agrupado: cada relatório segue o fluxo normal
+                        individuais.extend(grupo)
+                        continue
+                
+                    for relatorio in grupo:
+                        self.mark_as_sent(relatorio['id_relatorio'], 'Email', acks)
+                        enviados.append(relatorio)
+                        resultados.append({
+                            'id_relatorio': relatorio['id_relatorio'],
+                            'id_chamado': relatorio['id_chamado'],
+                            'metodo': 'Email',
+                            'resultado': {
+                                'success': True,
+                                'message': f"Email enviado com sucesso para {relatorio['email']} ({len(grupo)} relatório(s) na mensagem)"
+                            }
+                        })
+            
+                # Com resumo_gerente, o gerente também fica fora do Cc destes: recebe só o resumo
+                for relatorio in individuais:
+                    resultado = self.process_report(relatorio, sessao, acks=acks, cc_manager=not resumo_gerente)
+                    if resultado['metodo'] == 'Email':
+                        mensagens += 1
+                        enviados.append(relatorio)
+                    resultados.append(resultado)
+            
+                # Resumo do lote para cada gerente
+                if resumo_gerente:
+                    com_gerente = [r for r in enviados if r.get('email_gerente')]
+                    grupos = [parte for grupo in self.group_reports(com_gerente, lambda r: r['email_gerente'].strip().lower())
+                              for parte in self.split_by_size(grupo)]
+                    for grupo in grupos:
+                        email_gerente = grupo[0]['email_gerente']
+                        try:
+                            self.send_email(sessao, self.build_manager_digest(email_gerente, grupo))
+                            mensagens += 1
+                            resumos.append({'email_gerente': email_gerente, 'relatorios': len(grupo), 'success': True})
+                        except Exception as e:
+                            resumos.append({
+                                'email_gerente': email_gerente, 'relatorios': len(grupo), 'success': False,
+                                'message': f"Erro ao enviar resumo: {str(e)}"
+                            })
+            
+            return {
+                'resultados': resultados,
+                'resumos_gerente': resumos,
+                'mensagens_email': mensagens
+            }
+    
+    
+    def dispatch_pending_reports(self, workers=None):
+        """Envia os relatórios pendentes em paralelo, com limites por canal
+
+        Cada canal (Email, WhatsApp) tem seu número de envios simultâneos e seu
+        limite de taxa em dispatch_config; cada vaga do canal de email mantém a
+        própria sessão SMTP. A ordem email → WhatsApp de cada relatório é mantida.
+        Retorna os resultados (como em process_pending_reports) e as estatísticas
+        de vazão e latência.
+        """
+        with self.open_acknowledgements() as acks:
+            relatorios = self.get_pending_reports()
+            
+            channels = {
+                nome: despacho.Canal(nome, **config)
+                for nome, config in self.dispatch_config.items()
+            }
+            channels['Email'].fabrica_recurso = self.open_email_session
+            
+            if workers is None:
+                workers = sum(config['concorrencia'] for config in self.dispatch_config.values())
+            
+            inicio = time.monotonic()
+            try:
+                with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+                    resultados = list(executor.map(
+                        lambda relatorio: self.process_report(relatorio, channels=channels, acks=acks),
+                        relatorios))
+            finally:
+                for canal in channels.values():
+                    canal.fechar()
+            
+            return {
+                'resultados': resultados,
+                'estatisticas': despacho.resumir(resultados, channels, time.monotonic() - inicio)
+            }
+    
+    def process_report(self, relatorio, session=None, channels=None, acks=None, cc_manager=True):
+        """Envia um relatório por email ou, se não for possível, por WhatsApp
+
+        Com channels (ver dispatch_pending_reports), cada envio ocupa uma vaga
+        do canal correspondente e respeita seu limite de taxa. Se nenhum envio
+        der certo, a falha é registrada na fila (ver mark_as_failed). Com acks,
+        o resultado é gravado no lote em vez de imediatamente. Sem cc_manager,
+        o gerente do projeto não vai em Cc do email.
+        """
+        resultado_email = resultado_whatsapp = None
         
-        for relatorio in relatorios:
-            # Tenta enviar por email
-            if relatorio.get('email'):
-                resultado_email = self.send_report_by_email(relatorio)
-                if resultado_email['success']:
-                    self.mark_as_sent(relatorio['id_relatorio'], 'Email')
-                    resultados.append({
-                        'id_relatorio': relatorio['id_relatorio'],
-                        'id_chamado': relatorio['id_chamado'],
-                        'metodo': 'Email',
-                        'resultado': resultado_email
-                    })
-                    continue
-            
-            # Se não conseguiu enviar por email ou não tem email, tenta por WhatsApp
-            if relatorio.get('telefone'):
+        # Tenta enviar por email
+        if relatorio.get('email'):
+            with channels['Email'].reservar() if channels else nullcontext(session) as sessao:
+                resultado_email = self.send_report_by_email(relatorio, sessao, cc_manager)
+            if resultado_email['success']:
+                self.mark_as_sent(relatorio['id_relatorio'], 'Email', acks)
+                return {
+                    'id_relatorio': relatorio['id_relatorio'],
+                    'id_chamado': relatorio['id_chamado'],
+                    'metodo': 'Email',
+                    'resultado': resultado_email
+                }
+        
+        # Se não conseguiu enviar por email ou não tem email, tenta por WhatsApp
+        if relatorio.get('telefone'):
+            with channels['WhatsApp'].reservar() if channels else nullcontext():
                 resultado_whatsapp = self.send_report_by_whatsapp(relatorio)
-                if resultado_whatsapp['success']:
-                    self.mark_as_sent(relatorio['id_relatorio'], 'WhatsApp')
-                    resultados.append({
-                        'id_relatorio': relatorio['id_relatorio'],
-                        'id_chamado': relatorio['id_chamado'],
-                        'metodo': 'WhatsApp',
-                        'resultado': resultado_whatsapp
-                    })
-                    continue
-            
-            # Se não conseguiu enviar por nenhum método
-            resultados.append({
-                'id_relatorio': relatorio['id_relatorio'],
-                'id_chamado': relatorio['id_chamado'],
-                'metodo': 'Falha',
-                'resultado': {
-                    'success': False,
-                    'message': 'Não foi possível enviar por nenhum método'
+            if resultado_whatsapp['success']:
+                self.mark_as_sent(relatorio['id_relatorio'], 'WhatsApp', acks)
+                return {
+                    'id_relatorio': relatorio['id_relatorio'],
+                    'id_chamado': relatorio['id_chamado'],
+                    'metodo': 'WhatsApp',
+                    'resultado': resultado_whatsapp
                 }
-            })
         
-        return resultados
+        # Se não conseguiu enviar por nenhum método: sem canal disponível ou só
+        # falhas definitivas (ex.: PDF inexistente) descartam o relatório; as
+        # demais voltam para a fila com espera crescente
+        falhas = [r for r in (resultado_email, resultado_whatsapp) if r is not None]
+        permanente = all(r.get('permanent') for r in falhas)
+        erro = '; '.join(r['message'] for r in falhas) or f"Cliente {relatorio['cliente']} não possui email nem telefone cadastrado"
+        status_envio = self.mark_as_failed(relatorio, erro, permanente, acks)
+        
+        return {
+            'id_relatorio': relatorio['id_relatorio'],
+            'id_chamado': relatorio['id_chamado'],
+            'metodo': 'Falha',
+            'resultado': {
+                'success': False,
+                'message': 'Não foi possível enviar por nenhum método',
+                'erro': erro,
+                'status_envio': status_envio
+            }
+        }
 
 # Função para testar o envio de relatórios
 def test_report_sending():
@@ -245,10 +672,16 @@ def test_report_sending():
     print(f"Relatórios pendentes: {len(relatorios)}")
     
     # Processa os relatórios pendentes
-    resultados = sender.process_pending_reports()
+    despacho_lote = sender.dispatch_pending_reports()
     print(f"Resultados do processamento:")
-    for resultado in resultados:
+    for resultado in despacho_lote['resultados']:
         print(f"- Relatório {resultado['id_chamado']} enviado por {resultado['metodo']}: {resultado['resultado']['message']}")
+    
+    estatisticas = despacho_lote['estatisticas']
+    print(f"Estatísticas: {estatisticas['enviados']}/{estatisticas['total']} enviados em "
+          f"{estatisticas['duracao_s']}s ({estatisticas['relatorios_por_segundo']} relatórios/s)")
+    for nome, canal in estatisticas['canais'].items():
+        print(f"- {nome}: {canal}")
 
 if __name__ == "__main__":
     test_report_sending()
@@ -0,0 +1,68 @@
+import os
+import json
+import base64
+import hashlib
+import mimetypes
+from jinja2 import Environment, FileSystemLoader
+from weasyprint import HTML, CSS
+from weasyprint.text.fonts import FontConfiguration
+
+class RenderizadorPDF:
+    """Renderizador de relatórios com template, CSS e logos preparados uma única vez
+
+    Uma instância por processo: o template Jinja2 é compilado, a folha de estilo
+    é analisada e os logos são lidos do disco apenas na criação. As imagens já
+    decodificadas pelo WeasyPrint ficam em cache e são reaproveitadas entre os
+    relatórios.
+    """
+
+    def __init__(self, templates_dir, css, logos=None, template='relatorio_template.html'):
+        self.env = Environment(loader=FileSystemLoader(templates_dir))
+        self.template = self.env.get_template(template)
+
+        self.font_config = FontConfiguration()
+        self.stylesheet = CSS(string=css, font_config=self.font_config)
+
+        # Logos embutidos como data URI (nome -> URI), disponíveis no template como `logos`
+        self.logos = {}
+        for nome, caminho in (logos or {}).items():
+            if os.path.exists(caminho):
+                self.logos[nome] = self.carregar_imagem(caminho)
+
+        # Cache de imagens do WeasyPrint (URL -> imagem decodificada)
+        self.cache_imagens = {}
+
+        # Versão do layout: muda quando o template, o CSS ou os logos mudam
+        fonte_template = self.env.loader.get_source(self.env, template)[0]
+        self.versao = hashlib.sha256(
+            json.dumps([fonte_template, css, self.logos], sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+    @staticmethod
+    def carregar_imagem(caminho):
+        """Lê uma imagem do disco e a converte em data URI"""
+        tipo = mimetypes.guess_type(caminho)[0] or 'image/png'
+        with open(caminho, 'rb') as f:
+            conteudo = base64.b64encode(f.read()).decode('ascii')
+        return f"data:{tipo};base64,{conteudo}"
+
+    def calcular_hash(self, chamado):
+        """Hash dos dados do chamado e da versão do layout usados na renderização
+
+        Dois relatórios com o mesmo hash geram o mesmo PDF.
+        """
+        conteudo = json.dumps({'versao': self.versao, 'chamado': chamado}, sort_keys=True, default=str)
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+    def renderizar_html(self, chamado):
+        """Renderiza o HTML do relatório com os dados do chamado"""
+        return self.template.render(chamado=chamado, logos=self.logos)
+
+    def gerar_pdf(self, chamado, output_path=None):
+        """Gera o PDF do chamado em output_path (ou retorna os bytes, sem caminho)"""
+        return HTML(string=self.renderizar_html(chamado)).write_pdf(
+            output_path,
+            stylesheets=[self.stylesheet],
+            font_config=self.font_config,
+            cache=self.cache_imagens
+        )
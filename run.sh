@@ -20,20 +20,36 @@ if [ ! -f "chamados.db" ]; then
     echo -e "${BLUE}Criando banco de dados...${NC}"
     sqlite3 chamados.db < schema.sql
     sqlite3 chamados.db < schema_projeto.sql
+    sqlite3 chamados.db < schema_busca.sql
+    sqlite3 chamados.db < schema_indices.sql
+    sqlite3 chamados.db < schema_estatisticas.sql
+    sqlite3 chamados.db < schema_rac.sql
+    sqlite3 chamados.db < schema_relatorio.sql
+    sqlite3 chamados.db < schema_envio.sql
+    sqlite3 chamados.db < schema_whatsapp.sql
+    sqlite3 chamados.db < schema_conversa.sql
+    sqlite3 chamados.db < schema_cadastros.sql
+    sqlite3 chamados.db < schema_importacao.sql
+    sqlite3 chamados.db < schema_ingestao.sql
+    sqlite3 chamados.db < schema_importacao_whatsapp.sql
+    sqlite3 chamados.db < schema_historico.sql
+    sqlite3 chamados.db < schema_importacao_whatsapp_posicao.sql
+    sqlite3 chamados.db < schema_consulta_cursor.sql
     
     echo -e "${GREEN}Banco de dados inicializado com sucesso!${NC}"
 else
     echo -e "${GREEN}Banco de dados encontrado.${NC}"
+    # Aplica os schemas que o banco ainda não recebeu
+    python3 database.py chamados.db
 fi
 
 # Cria diretórios necessários
 mkdir -p relatorios
-mkdir -p exportacoes
 mkdir -p static/img
 
 # Verifica se as dependências estão instaladas
 echo -e "${BLUE}Verificando dependências...${NC}"
-pip3 install flask weasyprint jinja2 pillow pandas requests
+pip3 install flask weasyprint jinja2 pillow requests
 
 # Menu de opções
 while true; do
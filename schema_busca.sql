@@ -0,0 +1,80 @@
+-- Índice de busca textual (FTS5) para o histórico de chamados
+
+-- Tabela virtual com os campos pesquisáveis do chamado e do cliente
+-- rowid = id_chamado
+CREATE VIRTUAL TABLE IF NOT EXISTS chamado_fts USING fts5(
+    descricao,
+    ambiente,
+    analise,
+    procedimentos,
+    solucao,
+    observacoes,
+    recomendacoes,
+    cliente,
+    contato,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+-- Mantém o índice sincronizado com a tabela chamado
+DROP TRIGGER IF EXISTS chamado_fts_insert;
+CREATE TRIGGER chamado_fts_insert
+AFTER INSERT ON chamado
+BEGIN
+    INSERT INTO chamado_fts (
+        rowid, descricao, ambiente, analise, procedimentos, solucao,
+        observacoes, recomendacoes, cliente, contato
+    ) VALUES (
+        NEW.id_chamado, NEW.descricao, NEW.ambiente, NEW.analise, NEW.procedimentos, NEW.solucao,
+        NEW.observacoes, NEW.recomendacoes,
+        (SELECT nome FROM cliente WHERE id_cliente = NEW.id_cliente),
+        (SELECT contato FROM cliente WHERE id_cliente = NEW.id_cliente)
+    );
+END;
+
+-- Só dispara quando um campo indexado muda (mudanças de status não reindexam)
+DROP TRIGGER IF EXISTS chamado_fts_update;
+CREATE TRIGGER chamado_fts_update
+AFTER UPDATE OF descricao, ambiente, analise, procedimentos, solucao,
+                observacoes, recomendacoes, id_cliente ON chamado
+BEGIN
+    DELETE FROM chamado_fts WHERE rowid = OLD.id_chamado;
+    INSERT INTO chamado_fts (
+        rowid, descricao, ambiente, analise, procedimentos, solucao,
+        observacoes, recomendacoes, cliente, contato
+    ) VALUES (
+        NEW.id_chamado, NEW.descricao, NEW.ambiente, NEW.analise, NEW.procedimentos, NEW.solucao,
+        NEW.observacoes, NEW.recomendacoes,
+        (SELECT nome FROM cliente WHERE id_cliente = NEW.id_cliente),
+        (SELECT contato FROM cliente WHERE id_cliente = NEW.id_cliente)
+    );
+END;
+
+DROP TRIGGER IF EXISTS chamado_fts_delete;
+CREATE TRIGGER chamado_fts_delete
+AFTER DELETE ON chamado
+BEGIN
+    DELETE FROM chamado_fts WHERE rowid = OLD.id_chamado;
+END;
+
+-- Propaga alterações de nome/contato do cliente para os chamados dele
+DROP TRIGGER IF EXISTS cliente_fts_update;
+CREATE TRIGGER cliente_fts_update
+AFTER UPDATE OF nome, contato ON cliente
+BEGIN
+    UPDATE chamado_fts
+    SET cliente = NEW.nome, contato = NEW.contato
+    WHERE rowid IN (SELECT id_chamado FROM chamado WHERE id_cliente = NEW.id_cliente);
+END;
+
+-- (Re)constrói o índice a partir dos dados existentes
+DELETE FROM chamado_fts;
+INSERT INTO chamado_fts (
+    rowid, descricao, ambiente, analise, procedimentos, solucao,
+    observacoes, recomendacoes, cliente, contato
+)
+SELECT
+    c.id_chamado, c.descricao, c.ambiente, c.analise, c.procedimentos, c.solucao,
+    c.observacoes, c.recomendacoes, cl.nome, cl.contato
+FROM chamado c
+LEFT JOIN cliente cl ON c.id_cliente = cl.id_cliente;
@@ -0,0 +1,201 @@
+-- Chaves normalizadas e versão dos cadastros usados na abertura de chamados
+
+-- Clientes e plantonistas são identificados pelo nome, sem diferenciar
+-- maiúsculas de minúsculas (ASCII) nem espaços nas pontas. Registros repetidos
+-- de bancos existentes são unificados no de menor id antes da criação dos índices:
+-- cada registro removido fica guardado em cadastro_unificado e os dados que
+-- faltam no registro mantido são completados com os dele. Repetidos com
+-- CNPJ/CPF (clientes) ou email (plantonistas) diferentes são outras empresas ou
+-- pessoas: não são unificados, ficam listados em cadastro_conflito e a criação
+-- dos índices é interrompida até que sejam renomeados
+
+-- Tabela: cadastro_conflito
+-- Nomes repetidos que não podem ser unificados (refeita a cada aplicação)
+CREATE TABLE IF NOT EXISTS cadastro_conflito (
+    tabela TEXT NOT NULL CHECK (tabela IN ('cliente', 'plantonista')),
+    chave TEXT NOT NULL,
+    ids TEXT NOT NULL,
+    documentos TEXT NOT NULL,
+    PRIMARY KEY (tabela, chave)
+) WITHOUT ROWID;
+
+DELETE FROM cadastro_conflito;
+
+INSERT INTO cadastro_conflito (tabela, chave, ids, documentos)
+SELECT 'cliente', lower(trim(nome)), group_concat(id_cliente, ', '), group_concat(cnpj_cpf, ', ')
+FROM cliente
+GROUP BY lower(trim(nome))
+HAVING COUNT(DISTINCT cnpj_cpf) > 1;
+
+INSERT INTO cadastro_conflito (tabela, chave, ids, documentos)
+SELECT 'plantonista', lower(trim(nome)), group_concat(id_plantonista, ', '), group_concat(email, ', ')
+FROM plantonista
+GROUP BY lower(trim(nome))
+HAVING COUNT(DISTINCT email) > 1;
+
+-- Tabela: cadastro_unificado
+-- Cópia (em JSON) dos clientes e plantonistas removidos na unificação
+CREATE TABLE IF NOT EXISTS cadastro_unificado (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tabela TEXT NOT NULL CHECK (tabela IN ('cliente', 'plantonista')),
+    id_removido INTEGER NOT NULL,
+    id_mantido INTEGER NOT NULL,
+    dados TEXT NOT NULL,
+    mesclado INTEGER NOT NULL DEFAULT 0,
+    data_unificacao DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO cadastro_unificado (tabela, id_removido, id_mantido, dados)
+SELECT 'cliente', c.id_cliente,
+       (SELECT MIN(d.id_cliente) FROM cliente d WHERE lower(trim(d.nome)) = lower(trim(c.nome))),
+       json_object('id_cliente', c.id_cliente, 'nome', c.nome, 'cnpj_cpf', c.cnpj_cpf, 'contato', c.contato,
+                   'telefone', c.telefone, 'email', c.email, 'endereco', c.endereco,
+                   'data_cadastro', c.data_cadastro)
+FROM cliente c
+WHERE EXISTS (SELECT 1 FROM cliente d
+              WHERE lower(trim(d.nome)) = lower(trim(c.nome)) AND d.id_cliente < c.id_cliente)
+  AND lower(trim(c.nome)) NOT IN (SELECT chave FROM cadastro_conflito WHERE tabela = 'cliente');
+
+UPDATE chamado SET id_cliente = (
+    SELECT MIN(c2.id_cliente) FROM cliente c1
+    JOIN cliente c2 ON lower(trim(c2.nome)) = lower(trim(c1.nome))
+    WHERE c1.id_cliente = chamado.id_cliente
+)
+WHERE id_cliente IN (
+    SELECT c.id_cliente FROM cliente c
+    WHERE EXISTS (SELECT 1 FROM cliente d
+                  WHERE lower(trim(d.nome)) = lower(trim(c.nome)) AND d.id_cliente < c.id_cliente)
+      AND lower(trim(c.nome)) NOT IN (SELECT chave FROM cadastro_conflito WHERE tabela = 'cliente')
+);
+DELETE FROM cliente
+WHERE EXISTS (SELECT 1 FROM cliente d
+              WHERE lower(trim(d.nome)) = lower(trim(cliente.nome)) AND d.id_cliente < cliente.id_cliente)
+  AND lower(trim(cliente.nome)) NOT IN (SELECT chave FROM cadastro_conflito WHERE tabela = 'cliente');
+
+-- Campos vazios do registro mantido recebem o primeiro valor preenchido entre os removidos
+-- (depois da exclusão, para não repetir os valores únicos como cnpj_cpf)
+UPDATE cliente SET
+    cnpj_cpf = COALESCE(cnpj_cpf, (SELECT json_extract(u.dados, '$.cnpj_cpf') FROM cadastro_unificado u
+        WHERE u.tabela = 'cliente' AND u.mesclado = 0 AND u.id_mantido = cliente.id_cliente
+          AND json_extract(u.dados, '$.cnpj_cpf') IS NOT NULL ORDER BY u.id_removido LIMIT 1)),
+    contato = COALESCE(contato, (SELECT json_extract(u.dados, '$.contato') FROM cadastro_unificado u
+        WHERE u.tabela = 'cliente' AND u.mesclado = 0 AND u.id_mantido = cliente.id_cliente
+          AND json_extract(u.dados, '$.contato') IS NOT NULL ORDER BY u.id_removido LIMIT 1)),
+    telefone = COALESCE(telefone, (SELECT json_extract(u.dados, '$.telefone') FROM cadastro_unificado u
+        WHERE u.tabela = 'cliente' AND u.mesclado = 0 AND u.id_mantido = cliente.id_cliente
+          AND json_extract(u.dados, '$.telefone') IS NOT NULL ORDER BY u.id_removido LIMIT 1)),
+    email = COALESCE(email, (SELECT json_extract(u.dados, '$.email') FROM cadastro_unificado u
+        WHERE u.tabela = 'cliente' AND u.mesclado = 0 AND u.id_mantido = cliente.id_cliente
+          AND json_extract(u.dados, '$.email') IS NOT NULL ORDER BY u.id_removido LIMIT 1)),
+    endereco = COALESCE(endereco, (SELECT json_extract(u.dados, '$.endereco') FROM cadastro_unificado u
+        WHERE u.tabela = 'cliente' AND u.mesclado = 0 AND u.id_mantido = cliente.id_cliente
+          AND json_extract(u.dados, '$.endereco') IS NOT NULL ORDER BY u.id_removido LIMIT 1))
+WHERE id_cliente IN (SELECT id_mantido FROM cadastro_unificado WHERE tabela = 'cliente' AND mesclado = 0);
+
+INSERT INTO cadastro_unificado (tabela, id_removido, id_mantido, dados)
+SELECT 'plantonista', p.id_plantonista,
+       (SELECT MIN(d.id_plantonista) FROM plantonista d WHERE lower(trim(d.nome)) = lower(trim(p.nome))),
+       json_object('id_plantonista', p.id_plantonista, 'nome', p.nome, 'email', p.email,
+                   'telefone', p.telefone, 'status', p.status, 'data_cadastro', p.data_cadastro)
+FROM plantonista p
+WHERE EXISTS (SELECT 1 FROM plantonista d
+              WHERE lower(trim(d.nome)) = lower(trim(p.nome)) AND d.id_plantonista < p.id_plantonista)
+  AND lower(trim(p.nome)) NOT IN (SELECT chave FROM cadastro_conflito WHERE tabela = 'plantonista');
+
+UPDATE chamado SET id_plantonista = (
+    SELECT MIN(p2.id_plantonista) FROM plantonista p1
+    JOIN plantonista p2 ON lower(trim(p2.nome)) = lower(trim(p1.nome))
+    WHERE p1.id_plantonista = chamado.id_plantonista
+)
+WHERE id_plantonista IN (
+    SELECT p.id_plantonista FROM plantonista p
+    WHERE EXISTS (SELECT 1 FROM plantonista d
+                  WHERE lower(trim(d.nome)) = lower(trim(p.nome)) AND d.id_plantonista < p.id_plantonista)
+      AND lower(trim(p.nome)) NOT IN (SELECT chave FROM cadastro_conflito WHERE tabela = 'plantonista')
+);
+DELETE FROM plantonista
+WHERE EXISTS (SELECT 1 FROM plantonista d
+              WHERE lower(trim(d.nome)) = lower(trim(plantonista.nome)) AND d.id_plantonista < plantonista.id_plantonista)
+  AND lower(trim(plantonista.nome)) NOT IN (SELECT chave FROM cadastro_conflito WHERE tabela = 'plantonista');
+
+UPDATE plantonista SET
+    email = COALESCE(email, (SELECT json_extract(u.dados, '$.email') FROM cadastro_unificado u
+        WHERE u.tabela = 'plantonista' AND u.mesclado = 0 AND u.id_mantido = plantonista.id_plantonista
+          AND json_extract(u.dados, '$.email') IS NOT NULL ORDER BY u.id_removido LIMIT 1)),
+    telefone = COALESCE(telefone, (SELECT json_extract(u.dados, '$.telefone') FROM cadastro_unificado u
+        WHERE u.tabela = 'plantonista' AND u.mesclado = 0 AND u.id_mantido = plantonista.id_plantonista
+          AND json_extract(u.dados, '$.telefone') IS NOT NULL ORDER BY u.id_removido LIMIT 1))
+WHERE id_plantonista IN (SELECT id_mantido FROM cadastro_unificado WHERE tabela = 'plantonista' AND mesclado = 0);
+
+UPDATE cadastro_unificado SET mesclado = 1 WHERE mesclado = 0;
+
+-- Repetidos que não puderam ser unificados impedem os índices únicos: a
+-- aplicação é interrompida aqui (os demais já foram unificados)
+CREATE TEMP TABLE IF NOT EXISTS verificacao_cadastro (conflitos INTEGER);
+DROP TRIGGER IF EXISTS temp.verificacao_cadastro_conflito;
+CREATE TEMP TRIGGER verificacao_cadastro_conflito BEFORE INSERT ON verificacao_cadastro
+WHEN NEW.conflitos > 0
+BEGIN
+    SELECT RAISE(ABORT, 'Clientes ou plantonistas com o mesmo nome e CNPJ/CPF ou email diferentes (ver tabela cadastro_conflito): renomeie-os e aplique schema_cadastros.sql novamente');
+END;
+INSERT INTO verificacao_cadastro SELECT COUNT(*) FROM cadastro_conflito;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cliente_nome ON cliente (lower(trim(nome)));
+CREATE UNIQUE INDEX IF NOT EXISTS idx_plantonista_nome ON plantonista (lower(trim(nome)));
+
+-- Versão de cada cadastro: muda quando um nome (ou sigla) é alterado ou um
+-- registro é excluído, para que os caches dos processos descartem os ids guardados
+CREATE TABLE IF NOT EXISTS versao_cadastro (
+    tabela TEXT PRIMARY KEY,
+    versao INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO versao_cadastro (tabela) VALUES ('cliente'), ('plantonista'), ('projeto'), ('categoria');
+
+DROP TRIGGER IF EXISTS cliente_versao_update;
+CREATE TRIGGER cliente_versao_update AFTER UPDATE OF nome ON cliente
+BEGIN
+    UPDATE versao_cadastro SET versao = versao + 1 WHERE tabela = 'cliente';
+END;
+
+DROP TRIGGER IF EXISTS cliente_versao_delete;
+CREATE TRIGGER cliente_versao_delete AFTER DELETE ON cliente
+BEGIN
+    UPDATE versao_cadastro SET versao = versao + 1 WHERE tabela = 'cliente';
+END;
+
+DROP TRIGGER IF EXISTS plantonista_versao_update;
+CREATE TRIGGER plantonista_versao_update AFTER UPDATE OF nome ON plantonista
+BEGIN
+    UPDATE versao_cadastro SET versao = versao + 1 WHERE tabela = 'plantonista';
+END;
+
+DROP TRIGGER IF EXISTS plantonista_versao_delete;
+CREATE TRIGGER plantonista_versao_delete AFTER DELETE ON plantonista
+BEGIN
+    UPDATE versao_cadastro SET versao = versao + 1 WHERE tabela = 'plantonista';
+END;
+
+DROP TRIGGER IF EXISTS projeto_versao_update;
+CREATE TRIGGER projeto_versao_update AFTER UPDATE OF sigla ON projeto
+BEGIN
+    UPDATE versao_cadastro SET versao = versao + 1 WHERE tabela = 'projeto';
+END;
+
+DROP TRIGGER IF EXISTS projeto_versao_delete;
+CREATE TRIGGER projeto_versao_delete AFTER DELETE ON projeto
+BEGIN
+    UPDATE versao_cadastro SET versao = versao + 1 WHERE tabela = 'projeto';
+END;
+
+DROP TRIGGER IF EXISTS categoria_versao_update;
+CREATE TRIGGER categoria_versao_update AFTER UPDATE OF nome ON categoria
+BEGIN
+    UPDATE versao_cadastro SET versao = versao + 1 WHERE tabela = 'categoria';
+END;
+
+DROP TRIGGER IF EXISTS categoria_versao_delete;
+CREATE TRIGGER categoria_versao_delete AFTER DELETE ON categoria
+BEGIN
+    UPDATE versao_cadastro SET versao = versao + 1 WHERE tabela = 'categoria';
+END;
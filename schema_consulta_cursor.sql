@@ -0,0 +1,14 @@
+-- Continuação das consultas ao histórico via WhatsApp (comando "mais")
+
+-- Mesmas colunas da tabela conversa (lida pelo EstadoSQLite): o comando da
+-- última consulta do remetente em `estado` e o termo, o cursor da próxima
+-- página e os chamados já exibidos em `formulario` (JSON). Tabela própria
+-- porque a validade é outra (consulta_historica.TTL_CURSOR)
+CREATE TABLE IF NOT EXISTS consulta_cursor (
+    remetente TEXT PRIMARY KEY,
+    estado TEXT NOT NULL,
+    formulario TEXT NOT NULL DEFAULT '{}',
+    atualizado_em REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_consulta_cursor_atualizado_em ON consulta_cursor (atualizado_em);
@@ -0,0 +1,13 @@
+-- Estado das conversas do bot do WhatsApp (formulários de chamado em andamento)
+
+-- Uma linha por remetente com o passo atual e os dados já informados (JSON);
+-- atualizado_em (segundos desde 1970) controla a validade e o descarte das
+-- conversas mais antigas
+CREATE TABLE IF NOT EXISTS conversa (
+    remetente TEXT PRIMARY KEY,
+    estado TEXT NOT NULL,
+    formulario TEXT NOT NULL DEFAULT '{}',
+    atualizado_em REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_conversa_atualizado_em ON conversa (atualizado_em);
@@ -0,0 +1,40 @@
+-- Fila de envio dos relatórios (outbox) com novas tentativas e descarte
+
+-- Situação do envio: Pendente (na fila), Enviado ou Descartado (falha
+-- definitiva, fora da fila até ser reativado)
+ALTER TABLE relatorio ADD COLUMN status_envio TEXT NOT NULL DEFAULT 'Pendente'
+    CHECK (status_envio IN ('Pendente', 'Enviado', 'Descartado'));
+ALTER TABLE relatorio ADD COLUMN tentativas INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE relatorio ADD COLUMN ultimo_erro TEXT;
+-- Momento (UTC) a partir do qual o envio pode ser tentado; o padrão deixa os
+-- relatórios novos disponíveis imediatamente
+ALTER TABLE relatorio ADD COLUMN proxima_tentativa DATETIME NOT NULL DEFAULT '1970-01-01 00:00:00';
+
+UPDATE relatorio SET status_envio = 'Enviado' WHERE enviado = 1;
+
+-- Cada execução lê apenas os itens pendentes já vencidos, em ordem
+CREATE INDEX IF NOT EXISTS idx_relatorio_fila ON relatorio (proxima_tentativa)
+WHERE status_envio = 'Pendente';
+
+-- Um relatório descartado volta para a fila quando o PDF é gerado novamente...
+DROP TRIGGER IF EXISTS relatorio_reativar_envio;
+CREATE TRIGGER relatorio_reativar_envio
+AFTER UPDATE OF caminho_pdf ON relatorio
+WHEN NEW.status_envio = 'Descartado'
+BEGIN
+    UPDATE relatorio
+    SET status_envio = 'Pendente', tentativas = 0, proxima_tentativa = '1970-01-01 00:00:00'
+    WHERE id_relatorio = NEW.id_relatorio;
+END;
+
+-- ...ou quando o cliente ganha um email ou telefone
+DROP TRIGGER IF EXISTS cliente_reativar_envio;
+CREATE TRIGGER cliente_reativar_envio
+AFTER UPDATE OF email, telefone ON cliente
+WHEN IFNULL(NEW.email, '') <> IFNULL(OLD.email, '') OR IFNULL(NEW.telefone, '') <> IFNULL(OLD.telefone, '')
+BEGIN
+    UPDATE relatorio
+    SET status_envio = 'Pendente', tentativas = 0, proxima_tentativa = '1970-01-01 00:00:00'
+    WHERE status_envio = 'Descartado'
+      AND id_chamado IN (SELECT id_chamado FROM chamado WHERE id_cliente = NEW.id_cliente);
+END;
@@ -0,0 +1,72 @@
+-- Estatísticas de chamados por projeto mantidas de forma incremental
+
+-- Tabela: estatistica_projeto
+-- Uma linha por (projeto, status) com a contagem de chamados e a soma/contagem
+-- de tempo_atendimento, atualizada pelas triggers abaixo
+CREATE TABLE IF NOT EXISTS estatistica_projeto (
+    id_projeto INTEGER NOT NULL REFERENCES projeto(id_projeto),
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    soma_tempo INTEGER NOT NULL DEFAULT 0,
+    total_com_tempo INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_projeto, status)
+) WITHOUT ROWID;
+
+DROP TRIGGER IF EXISTS estatistica_projeto_insert;
+CREATE TRIGGER estatistica_projeto_insert
+AFTER INSERT ON chamado
+WHEN NEW.id_projeto IS NOT NULL
+BEGIN
+    INSERT INTO estatistica_projeto (id_projeto, status, total, soma_tempo, total_com_tempo)
+    SELECT NEW.id_projeto, IFNULL(NEW.status, ''), 1,
+           IFNULL(NEW.tempo_atendimento, 0), NEW.tempo_atendimento IS NOT NULL
+    WHERE 1
+    ON CONFLICT (id_projeto, status) DO UPDATE SET
+        total = total + 1,
+        soma_tempo = soma_tempo + excluded.soma_tempo,
+        total_com_tempo = total_com_tempo + excluded.total_com_tempo;
+END;
+
+DROP TRIGGER IF EXISTS estatistica_projeto_delete;
+CREATE TRIGGER estatistica_projeto_delete
+AFTER DELETE ON chamado
+WHEN OLD.id_projeto IS NOT NULL
+BEGIN
+    UPDATE estatistica_projeto
+    SET total = total - 1,
+        soma_tempo = soma_tempo - IFNULL(OLD.tempo_atendimento, 0),
+        total_com_tempo = total_com_tempo - (OLD.tempo_atendimento IS NOT NULL)
+    WHERE id_projeto = OLD.id_projeto AND status = IFNULL(OLD.status, '');
+END;
+
+-- Mudanças de projeto, status ou tempo: remove a contribuição antiga e soma a nova
+-- (também dispara nas atualizações feitas por atualiza_data_fechamento e
+-- calcula_tempo_atendimento)
+DROP TRIGGER IF EXISTS estatistica_projeto_update;
+CREATE TRIGGER estatistica_projeto_update
+AFTER UPDATE OF id_projeto, status, tempo_atendimento ON chamado
+BEGIN
+    UPDATE estatistica_projeto
+    SET total = total - 1,
+        soma_tempo = soma_tempo - IFNULL(OLD.tempo_atendimento, 0),
+        total_com_tempo = total_com_tempo - (OLD.tempo_atendimento IS NOT NULL)
+    WHERE id_projeto = OLD.id_projeto AND status = IFNULL(OLD.status, '');
+
+    INSERT INTO estatistica_projeto (id_projeto, status, total, soma_tempo, total_com_tempo)
+    SELECT NEW.id_projeto, IFNULL(NEW.status, ''), 1,
+           IFNULL(NEW.tempo_atendimento, 0), NEW.tempo_atendimento IS NOT NULL
+    WHERE NEW.id_projeto IS NOT NULL
+    ON CONFLICT (id_projeto, status) DO UPDATE SET
+        total = total + 1,
+        soma_tempo = soma_tempo + excluded.soma_tempo,
+        total_com_tempo = total_com_tempo + excluded.total_com_tempo;
+END;
+
+-- (Re)constrói a tabela a partir dos chamados existentes
+DELETE FROM estatistica_projeto;
+INSERT INTO estatistica_projeto (id_projeto, status, total, soma_tempo, total_com_tempo)
+SELECT id_projeto, IFNULL(status, ''), COUNT(*),
+       IFNULL(SUM(tempo_atendimento), 0), COUNT(tempo_atendimento)
+FROM chamado
+WHERE id_projeto IS NOT NULL
+GROUP BY id_projeto, IFNULL(status, '');
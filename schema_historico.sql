@@ -0,0 +1,59 @@
+-- Versão do histórico de chamados consultado pelo WhatsApp
+
+-- Tabela: versao_historico
+-- Contador único que muda a cada escrita capaz de alterar a resposta de uma
+-- consulta ao histórico (chamados, nomes e contatos de clientes, siglas de
+-- projetos); as respostas guardadas em cache com outra versão são descartadas
+CREATE TABLE IF NOT EXISTS versao_historico (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    versao INTEGER NOT NULL
+);
+
+-- Começa em um valor aleatório: um banco recriado no mesmo caminho não repete
+-- as versões do anterior (cujas respostas ainda podem estar em cache)
+INSERT OR IGNORE INTO versao_historico (id, versao) VALUES (1, abs(random() % 1000000000));
+
+DROP TRIGGER IF EXISTS historico_chamado_insert;
+CREATE TRIGGER historico_chamado_insert AFTER INSERT ON chamado
+BEGIN
+    UPDATE versao_historico SET versao = versao + 1 WHERE id = 1;
+END;
+
+-- Só as colunas exibidas ou pesquisadas nas consultas
+DROP TRIGGER IF EXISTS historico_chamado_update;
+CREATE TRIGGER historico_chamado_update
+AFTER UPDATE OF numero_rac, data_hora, status, descricao, ambiente, analise, procedimentos, solucao,
+                observacoes, recomendacoes, id_cliente, id_projeto ON chamado
+BEGIN
+    UPDATE versao_historico SET versao = versao + 1 WHERE id = 1;
+END;
+
+DROP TRIGGER IF EXISTS historico_chamado_delete;
+CREATE TRIGGER historico_chamado_delete AFTER DELETE ON chamado
+BEGIN
+    UPDATE versao_historico SET versao = versao + 1 WHERE id = 1;
+END;
+
+DROP TRIGGER IF EXISTS historico_cliente_update;
+CREATE TRIGGER historico_cliente_update AFTER UPDATE OF nome, contato ON cliente
+BEGIN
+    UPDATE versao_historico SET versao = versao + 1 WHERE id = 1;
+END;
+
+DROP TRIGGER IF EXISTS historico_cliente_delete;
+CREATE TRIGGER historico_cliente_delete AFTER DELETE ON cliente
+BEGIN
+    UPDATE versao_historico SET versao = versao + 1 WHERE id = 1;
+END;
+
+DROP TRIGGER IF EXISTS historico_projeto_update;
+CREATE TRIGGER historico_projeto_update AFTER UPDATE OF sigla ON projeto
+BEGIN
+    UPDATE versao_historico SET versao = versao + 1 WHERE id = 1;
+END;
+
+DROP TRIGGER IF EXISTS historico_projeto_delete;
+CREATE TRIGGER historico_projeto_delete AFTER DELETE ON projeto
+BEGIN
+    UPDATE versao_historico SET versao = versao + 1 WHERE id = 1;
+END;
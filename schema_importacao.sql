@@ -0,0 +1,12 @@
+-- Manutenção adiada durante importações em massa de chamados
+
+-- Tabela: importacao_adiada
+-- Triggers e índices de chamado removidos no início de uma importação, com o
+-- SQL para recriá-los; importacao.restaurar_manutencao() os recria, completa o
+-- índice de busca e as estatísticas e esvazia a tabela (também após uma
+-- importação interrompida: `python importacao.py restaurar`)
+CREATE TABLE IF NOT EXISTS importacao_adiada (
+    nome TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL CHECK (tipo IN ('trigger', 'index')),
+    sql TEXT NOT NULL
+) WITHOUT ROWID;
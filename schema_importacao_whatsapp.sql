@@ -0,0 +1,14 @@
+-- Importação incremental das conversas exportadas do grupo do WhatsApp
+
+-- Tabela: importacao_whatsapp
+-- Última mensagem já importada de cada conversa (data e ordem entre as
+-- mensagens do mesmo minuto) e os formulários ainda em andamento naquele
+-- ponto; gravada na mesma transação dos chamados, para que a próxima
+-- exportação da conversa continue de onde a anterior parou
+CREATE TABLE IF NOT EXISTS importacao_whatsapp (
+    chat TEXT PRIMARY KEY,
+    ultima_data TEXT NOT NULL,
+    ultima_ordem INTEGER NOT NULL,
+    conversas TEXT NOT NULL DEFAULT '{}',
+    atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
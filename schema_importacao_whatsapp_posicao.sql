@@ -0,0 +1,9 @@
+-- Identificação da última mensagem importada de cada conversa
+
+-- A ordem entre as mensagens do mesmo minuto recomeça em cada arquivo exportado
+-- (e muda quando a exportação começa no meio do minuto): a última mensagem é
+-- reconhecida pelo hash do remetente e do texto e pela repetição (quantas
+-- mensagens iguais vieram antes dela no mesmo minuto). Posições gravadas antes
+-- destas colunas (hash nulo) continuam usando a ordem
+ALTER TABLE importacao_whatsapp ADD COLUMN ultima_mensagem TEXT;
+ALTER TABLE importacao_whatsapp ADD COLUMN ultima_repeticao INTEGER NOT NULL DEFAULT 0;
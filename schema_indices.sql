@@ -0,0 +1,13 @@
+-- Índices compostos para as combinações de filtros das listagens de chamados
+-- As listagens ordenam por data_hora DESC, id_chamado DESC; como o rowid
+-- (id_chamado) faz parte de todo índice, (filtro, data_hora) atende tanto ao
+-- filtro quanto à ordenação, sem B-tree temporária.
+
+CREATE INDEX IF NOT EXISTS idx_chamado_status_data ON chamado (status, data_hora);
+CREATE INDEX IF NOT EXISTS idx_chamado_cliente_data ON chamado (id_cliente, data_hora);
+CREATE INDEX IF NOT EXISTS idx_chamado_projeto_data ON chamado (id_projeto, data_hora);
+
+-- Os índices de coluna única abaixo são prefixos dos compostos e ficam redundantes
+DROP INDEX IF EXISTS idx_chamado_status;
+DROP INDEX IF EXISTS idx_chamado_cliente;
+DROP INDEX IF EXISTS idx_chamado_projeto;
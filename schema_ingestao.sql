@@ -0,0 +1,14 @@
+-- Ingestão dos RACs antigos em PDF
+
+-- Tabela: ingestao_pdf
+-- Um registro por arquivo já processado, pelo hash do conteúdo, gravado na
+-- mesma transação dos chamados do lote; uma ingestão interrompida recomeça
+-- pelos arquivos que ainda não estão aqui (os com erro são tentados de novo)
+CREATE TABLE IF NOT EXISTS ingestao_pdf (
+    hash_arquivo TEXT PRIMARY KEY,
+    caminho TEXT NOT NULL,
+    numero_rac TEXT,
+    status TEXT NOT NULL CHECK (status IN ('importado', 'rejeitado', 'erro')),
+    erro TEXT,
+    data_processamento DATETIME DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
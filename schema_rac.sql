@@ -0,0 +1,50 @@
+-- Numeração sequencial dos RACs (Relatório de Atendimento ao Cliente)
+
+-- Tabela: sequencia
+-- Um contador por nome; o próximo RAC é reservado com UPDATE ... RETURNING na
+-- mesma transação do INSERT do chamado, sem varrer a tabela chamado
+CREATE TABLE IF NOT EXISTS sequencia (
+    nome TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+-- Número do RAC armazenado no chamado (ex.: RAC0001)
+ALTER TABLE chamado ADD COLUMN numero_rac TEXT;
+
+-- Numera os chamados já existentes na ordem de criação
+UPDATE chamado
+SET numero_rac = printf('RAC%04d', id_chamado)
+WHERE numero_rac IS NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_chamado_numero_rac ON chamado (numero_rac);
+
+-- A sequência continua a partir do maior número já utilizado
+INSERT INTO sequencia (nome, valor)
+SELECT 'rac', IFNULL(MAX(CAST(substr(numero_rac, 4) AS INTEGER)), 0) FROM chamado
+WHERE 1
+ON CONFLICT (nome) DO UPDATE SET valor = MAX(valor, excluded.valor);
+
+-- Chamados inseridos sem numero_rac (cargas diretas no banco) recebem o próximo
+-- número da mesma sequência
+DROP TRIGGER IF EXISTS chamado_numero_rac;
+CREATE TRIGGER chamado_numero_rac
+AFTER INSERT ON chamado
+WHEN NEW.numero_rac IS NULL
+BEGIN
+    UPDATE sequencia SET valor = valor + 1 WHERE nome = 'rac';
+    UPDATE chamado
+    SET numero_rac = (SELECT printf('RAC%04d', valor) FROM sequencia WHERE nome = 'rac')
+    WHERE id_chamado = NEW.id_chamado;
+END;
+
+-- Números informados explicitamente (importações) avançam a sequência, para que
+-- os próximos RACs reservados não colidam com eles
+DROP TRIGGER IF EXISTS chamado_numero_rac_informado;
+CREATE TRIGGER chamado_numero_rac_informado
+AFTER INSERT ON chamado
+WHEN NEW.numero_rac GLOB 'RAC[0-9]*'
+BEGIN
+    UPDATE sequencia
+    SET valor = MAX(valor, CAST(substr(NEW.numero_rac, 4) AS INTEGER))
+    WHERE nome = 'rac';
+END;
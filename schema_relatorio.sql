@@ -0,0 +1,6 @@
+-- Hash do conteúdo renderizado de cada relatório
+
+-- Hash (SHA-256) dos dados do chamado, cliente e projeto usados na renderização
+-- e da versão do template/CSS/logos; quando o hash não muda, o PDF existente é
+-- reaproveitado em vez de renderizado novamente
+ALTER TABLE relatorio ADD COLUMN hash_conteudo TEXT;
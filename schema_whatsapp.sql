@@ -0,0 +1,10 @@
+-- Mídias já enviadas ao gateway do WhatsApp
+
+-- Cada PDF é enviado uma única vez: o id devolvido pelo gateway fica registrado
+-- pelo hash (SHA-256) do arquivo e é reaproveitado para todos os destinatários
+-- (cliente e gerente) enquanto estiver dentro da validade configurada
+CREATE TABLE IF NOT EXISTS midia_whatsapp (
+    hash_arquivo TEXT PRIMARY KEY,
+    media_id TEXT NOT NULL,
+    data_envio DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
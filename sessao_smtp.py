@@ -0,0 +1,124 @@
+import re
+import smtplib
+from anexos import MensagemAnexos
+
+# Erros que indicam conexão perdida (vale reconectar e reenviar a mensagem)
+ERROS_CONEXAO = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+class SessaoSMTP:
+    """Sessão SMTP autenticada reaproveitada entre vários envios
+
+    A conexão (com STARTTLS e login) é aberta no primeiro envio e mantida até
+    fechar(); se o servidor derrubar a sessão no meio do lote, ela é reaberta e
+    a mensagem reenviada. Uso:
+
+        with SessaoSMTP(email_config) as sessao:
+            for msg in mensagens:
+                sessao.enviar(msg)
+    """
+
+    def __init__(self, config, tentativas=2, timeout=30):
+        self.config = config
+        self.tentativas = tentativas
+        self.timeout = timeout
+        self.servidor = None
+        self.conexoes = 0
+
+    def conectar(self):
+        """Abre a conexão, negocia TLS e autentica conforme a configuração"""
+        servidor = smtplib.SMTP(self.config['smtp_server'], self.config['smtp_port'], timeout=self.timeout)
+        try:
+            if self.config.get('starttls', True):
+                servidor.starttls()
+            if self.config.get('username'):
+                servidor.login(self.config['username'], self.config['password'])
+        except Exception:
+            servidor.close()
+            raise
+        self.servidor = servidor
+        self.conexoes += 1
+
+    def enviar(self, msg):
+        """Envia a mensagem (com todos os destinatários de To e Cc) pela sessão
+
+        Aceita uma mensagem do pacote email ou uma MensagemAnexos, transmitida
+        em blocos (ver enviar_blocos). Retorna o dicionário de destinatários
+        recusados de smtplib.
+        """
+        for tentativa in range(self.tentativas):
+            if self.servidor is None:
+                self.conectar()
+            try:
+                if isinstance(msg, MensagemAnexos):
+                    return self.enviar_blocos(msg)
+                return self.servidor.send_message(msg)
+            except ERROS_CONEXAO:
+                if self.servidor is not None:
+                    self.servidor.close()
+                self.servidor = None
+                if tentativa == self.tentativas - 1:
+                    raise
+
+    def enviar_blocos(self, msg):
+        """Transmite uma MensagemAnexos bloco a bloco, sem montá-la em memória
+
+        O tamanho é anunciado no MAIL FROM (extensão SIZE), de modo que o
+        servidor recusa mensagens grandes demais antes da leitura dos anexos.
+        """
+        servidor = self.servidor
+        servidor.ehlo_or_helo_if_needed()
+        remetente = msg.remetente()
+        destinatarios = msg.destinatarios()
+        
+        opcoes = [f"SIZE={msg.tamanho()}"] if servidor.has_extn('size') else []
+        codigo, resposta = servidor.mail(remetente, opcoes)
+        if codigo != 250:
+            servidor.rset()
+            raise smtplib.SMTPSenderRefused(codigo, resposta, remetente)
+        
+        recusados = {}
+        for destinatario in destinatarios:
+            codigo, resposta = servidor.rcpt(destinatario)
+            if codigo not in (250, 251):
+                recusados[destinatario] = (codigo, resposta)
+        if len(recusados) == len(destinatarios):
+            servidor.rset()
+            raise smtplib.SMTPRecipientsRefused(recusados)
+        
+        codigo, resposta = servidor.docmd('data')
+        if codigo != 354:
+            servidor.rset()
+            raise smtplib.SMTPDataError(codigo, resposta)
+        
+        try:
+            ultimo = b''
+            for bloco in msg.blocos():
+                # Cada bloco começa em início de linha: basta duplicar os pontos iniciais
+                servidor.send(re.sub(rb'(?m)^\.', b'..', bloco))
+                ultimo = bloco
+            servidor.send(b'.\r\n' if ultimo.endswith(b'\r\n') else b'\r\n.\r\n')
+        except Exception:
+            # Transmissão interrompida no meio do DATA: a sessão não pode ser reaproveitada
+            servidor.close()
+            self.servidor = None
+            raise
+        
+        codigo, resposta = servidor.getreply()
+        if codigo != 250:
+            raise smtplib.SMTPDataError(codigo, resposta)
+        return recusados
+
+    def fechar(self):
+        """Encerra a sessão (QUIT), ignorando uma conexão que já caiu"""
+        if self.servidor is not None:
+            try:
+                self.servidor.quit()
+            except (smtplib.SMTPException, OSError):
+                self.servidor.close()
+            self.servidor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
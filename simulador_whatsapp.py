@@ -0,0 +1,137 @@
+import sys
+import json
+import time
+import hashlib
+import threading
+from email import message_from_bytes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Uso: python simulador_whatsapp.py [porta]
+# Gateway do WhatsApp simulado para testes e benchmarks: implementa POST /media
+# e POST /messages no formato da WhatsApp Cloud API, sem enviar nada
+
+class _Requisicao(BaseHTTPRequestHandler):
+    # HTTP/1.1: a conexão fica aberta entre requisições (keep-alive)
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalhos e corpo saem em escritas separadas: sem TCP_NODELAY, o algoritmo
+    # de Nagle atrasaria cada resposta de uma conexão reaproveitada
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.gateway.registrar_conexao()
+
+    def log_message(self, *args):
+        pass
+
+    def responder(self, status, dados):
+        corpo = json.dumps(dados).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        gateway = self.server.gateway
+
+        if gateway.latencia:
+            time.sleep(gateway.latencia)
+        if gateway.consumir_falha():
+            return self.responder(503, {'error': {'message': 'Serviço indisponível (simulado)'}})
+
+        if self.path.endswith('/media'):
+            self.responder(200, {'id': gateway.registrar_midia(self.headers['Content-Type'], corpo)})
+        elif self.path.endswith('/messages'):
+            self.responder(200, {
+                'messaging_product': 'whatsapp',
+                'messages': [{'id': gateway.registrar_mensagem(json.loads(corpo))}]
+            })
+        else:
+            self.responder(404, {'error': {'message': f'Caminho desconhecido: {self.path}'}})
+
+class GatewaySimulado:
+    """Servidor HTTP local que simula o gateway do WhatsApp
+
+    Registra os arquivos recebidos (`uploads`, com nome, hash e tamanho), as
+    mensagens (`mensagens`) e as conexões TCP abertas (`conexoes`). `latencia`
+    atrasa cada resposta e `falhas` faz as próximas requisições responderem 503.
+    Uso:
+
+        with GatewaySimulado() as gateway:
+            config = {'api_url': gateway.url, 'api_token': 'teste'}
+    """
+
+    def __init__(self, host='127.0.0.1', porta=0, latencia=0.0):
+        self.latencia = latencia
+        self.falhas = 0
+        self.uploads = []
+        self.mensagens = []
+        self.conexoes = 0
+        self._lock = threading.Lock()
+
+        self.servidor = ThreadingHTTPServer((host, porta), _Requisicao)
+        self.servidor.daemon_threads = True
+        self.servidor.gateway = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, porta = self.servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def registrar_conexao(self):
+        with self._lock:
+            self.conexoes += 1
+
+    def consumir_falha(self):
+        with self._lock:
+            if self.falhas > 0:
+                self.falhas -= 1
+                return True
+            return False
+
+    def registrar_midia(self, content_type, corpo):
+        """Extrai o arquivo do corpo multipart e retorna o id da mídia"""
+        mensagem = message_from_bytes(b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + corpo)
+        arquivo = next(parte for parte in mensagem.walk() if parte.get_filename())
+        conteudo = arquivo.get_payload(decode=True)
+        with self._lock:
+            self.uploads.append({
+                'nome': arquivo.get_filename(),
+                'hash': hashlib.sha256(conteudo).hexdigest(),
+                'tamanho': len(conteudo)
+            })
+            return f"midia-{len(self.uploads)}"
+
+    def registrar_mensagem(self, dados):
+        with self._lock:
+            self.mensagens.append(dados)
+            return f"wamid.simulado.{len(self.mensagens)}"
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+if __name__ == "__main__":
+    porta = int(sys.argv[1]) if len(sys.argv) > 1 else 8088
+    gateway = GatewaySimulado(porta=porta).iniciar()
+    print(f"Gateway do WhatsApp simulado em {gateway.url} (Ctrl+C para encerrar)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        gateway.parar()
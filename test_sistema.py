@@ -1,14 +1,53 @@
 import unittest
+import unittest.mock
 import os
 import sqlite3
 import tempfile
 import shutil
+import json
+import re
+import threading
+import socket
 from datetime import datetime
 
 # Importa os módulos do sistema
+import pdf_generator
+from renderizador_pdf import RenderizadorPDF
 from pdf_generator import gerar_relatorio_pdf, obter_dados_chamado
+import numeracao
+import cadastros
+import cache_consultas
+import lote
+import despacho
+import anexos
+from confirmacoes import ConfirmacoesEnvio
+from simulador_whatsapp import GatewaySimulado
+from cliente_whatsapp import ClienteWhatsApp
+from estado_conversa import EstadoMemoria, EstadoSQLite
+import whatsapp_bot_fixed
+from fila_mensagens import FilaPorRemetente
+import queue
+import hmac
+import hashlib
+import tracemalloc
+from email import message_from_bytes
+import time
+import math
 from relatorio_sender import RelatorioSender
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # servidor SMTP local usado apenas nos testes de envio
+    Controller = None
 from consulta_historica import ConsultaHistorica
+import database
+import paginacao
+import estatisticas_projeto
+import importacao
+import ingestao_pdf
+import importacao_whatsapp
+import io
+import exportacao
+from paginacao import montar_consulta_chamados
 
 class TestSistemaChamados(unittest.TestCase):
     def setUp(self):
@@ -19,10 +58,7 @@ class TestSistemaChamados(unittest.TestCase):
         
         # Copia o esquema do banco de dados
         self.conn = sqlite3.connect(self.db_path)
-        with open('schema.sql', 'r') as f:
-            self.conn.executescript(f.read())
-        with open('schema_projeto.sql', 'r') as f:
-            self.conn.executescript(f.read())
+        database.aplicar_schemas(self.conn)
         
         # Insere dados de teste
         self.inserir_dados_teste()
@@ -30,6 +66,7 @@ class TestSistemaChamados(unittest.TestCase):
     def tearDown(self):
         """Limpeza após os testes"""
         self.conn.close()
+        database.close_all_pools()
         shutil.rmtree(self.temp_dir)
     
     def inserir_dados_teste(self):
@@ -53,15 +90,16 @@ class TestSistemaChamados(unittest.TestCase):
             INSERT INTO projeto (sigla, nome, gerente, email_gerente, telefone_gerente)
             VALUES (?, ?, ?, ?, ?)
         """, ('TST', 'Projeto Teste', 'Gerente Teste', 'gerente@empresa.com.br', '(11) 92345-6789'))
+        id_projeto = cursor.lastrowid
         
         # Insere chamado de teste
         cursor.execute("""
             INSERT INTO chamado (
-                id_chamado, id_cliente, id_plantonista, id_categoria, id_projeto,
+                id_cliente, id_plantonista, id_categoria, id_projeto,
                 data_hora, tipo, prioridade, descricao, analise, solucao, status
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
-            'RAC0001', 1, 1, 1, 1,
+            1, 1, 1, id_projeto,
             datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'Suporte Técnico', 'Alta',
             'Sistema fora do ar para testes',
@@ -75,15 +113,14 @@ class TestSistemaChamados(unittest.TestCase):
     def test_obter_dados_chamado(self):
         """Testa a obtenção de dados de um chamado"""
         # Configura o caminho do banco de dados para teste
-        global DB_PATH
-        DB_PATH = self.db_path
+        pdf_generator.DB_PATH = self.db_path
         
         # Testa a função
-        chamado = obter_dados_chamado('RAC0001')
+        chamado = obter_dados_chamado(1)
         
         # Verifica se os dados foram obtidos corretamente
         self.assertIsNotNone(chamado)
-        self.assertEqual(chamado['id_chamado'], 'RAC0001')
+        self.assertEqual(chamado['numero_rac'], 'RAC0001')
         self.assertEqual(chamado['cliente'], 'Empresa Teste')
         self.assertEqual(chamado['plantonista'], 'Plantonista Teste')
         self.assertEqual(chamado['projeto_sigla'], 'TST')
@@ -97,7 +134,7 @@ class TestSistemaChamados(unittest.TestCase):
         # Testa busca por texto
         resultados = consulta.buscar_por_texto('servidor')
         self.assertGreaterEqual(len(resultados), 1)
-        self.assertEqual(resultados[0]['id_chamado'], 'RAC0001')
+        self.assertEqual(resultados[0]['numero_rac'], 'RAC0001')
         
         # Testa busca por cliente
         resultados = consulta.buscar_por_cliente('Empresa Teste')
@@ -113,6 +150,1136 @@ class TestSistemaChamados(unittest.TestCase):
         resposta = consulta.processar_consulta_whatsapp('consultar servidor')
         self.assertIn('RAC0001', resposta)
     
+    def test_indice_busca_sincronizado(self):
+        """Testa a manutenção do índice FTS5 pelas triggers"""
+        consulta = ConsultaHistorica(db_path=self.db_path)
+        
+        # Busca sem acentos encontra o texto acentuado e retorna o trecho destacado
+        resultados = consulta.buscar_por_texto('reinicializacao')
+        self.assertEqual(len(resultados), 1)
+        self.assertIn('*Reinicialização*', resultados[0]['trecho'])
+        
+        # Alterações no chamado e no cliente refletem no índice
+        self.conn.execute("UPDATE chamado SET descricao = 'Rede indisponível'")
+        self.conn.execute("UPDATE cliente SET nome = 'Cliente Renomeado'")
+        self.conn.commit()
+        self.assertEqual(len(consulta.buscar_por_texto('fora do ar')), 0)
+        self.assertEqual(len(consulta.buscar_por_texto('rede')), 1)
+        self.assertEqual(len(consulta.buscar_por_texto('renomeado')), 1)
+        
+        # Exclusões removem o chamado do índice
+        self.conn.execute("DELETE FROM chamado")
+        self.conn.commit()
+        self.assertEqual(consulta.buscar_por_texto('rede'), [])
+    
+    def test_pool_conexoes(self):
+        """Testa o pool de conexões compartilhado"""
+        with database.get_db_connection(self.db_path) as conn:
+            modo = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            self.assertEqual(modo, 'wal')
+            
+            # Blocos aninhados reutilizam a mesma conexão e transação
+            with database.get_db_connection(self.db_path) as interna:
+                self.assertIs(interna, conn)
+                interna.execute("UPDATE cliente SET contato = 'Novo' WHERE id_cliente = 1")
+            self.assertTrue(conn.in_transaction)
+        
+        # Erros dentro do bloco desfazem a transação
+        with self.assertRaises(ValueError):
+            with database.get_db_connection(self.db_path) as conn:
+                conn.execute("UPDATE cliente SET contato = 'Descartado' WHERE id_cliente = 1")
+                raise ValueError()
+        
+        with database.get_db_connection(self.db_path) as conn:
+            contato = conn.execute("SELECT contato FROM cliente WHERE id_cliente = 1").fetchone()[0]
+        self.assertEqual(contato, 'Novo')
+    
+    def test_paginacao_cursor(self):
+        """Testa a paginação por cursor (keyset) e a serialização em streaming"""
+        cursor = paginacao.codificar_cursor('2024-01-02 10:00:00', 15)
+        self.assertEqual(paginacao.decodificar_cursor(cursor), ('2024-01-02 10:00:00', 15))
+        with self.assertRaises(ValueError):
+            paginacao.decodificar_cursor('invalido')
+        
+        linhas = [{'id_chamado': i, 'data_hora': f'2024-01-0{i} 10:00:00'} for i in (3, 2, 1)]
+        pagina, proximo = paginacao.montar_pagina(linhas, 2)
+        self.assertEqual([linha['id_chamado'] for linha in pagina], [3, 2])
+        self.assertEqual(paginacao.decodificar_cursor(proximo), ('2024-01-02 10:00:00', 2))
+        
+        texto = ''.join(paginacao.gerar_json({'status': 'success'}, 'chamados', iter(linhas)))
+        self.assertEqual(json.loads(texto)['chamados'], linhas)
+    
+    def test_plano_consulta_chamados(self):
+        """Garante que os filtros da listagem de chamados usam os índices compostos"""
+        casos = [
+            ({'status': 'Resolvido', 'data_inicio': '2024-01-01', 'data_fim': '2024-01-31'}, 'idx_chamado_status_data'),
+            ({'status': 'Aberto'}, 'idx_chamado_status_data'),
+            ({'id_cliente': '1'}, 'idx_chamado_cliente_data'),
+            ({'id_projeto': '1'}, 'idx_chamado_projeto_data'),
+            ({'data_inicio': '2024-01-01'}, 'idx_chamado_data'),
+        ]
+        
+        for filtros, indice in casos:
+            for cursor in (None, ('2024-01-15 00:00:00', 10)):
+                query, parametros = montar_consulta_chamados(filtros, cursor)
+                plano = ' | '.join(
+                    linha[3] for linha in self.conn.execute('EXPLAIN QUERY PLAN ' + query, parametros)
+                )
+                self.assertIn(f'SEARCH c USING INDEX {indice}', plano)
+                self.assertNotIn('SCAN c', plano)
+                self.assertNotIn('TEMP B-TREE', plano)
+        
+        # Sem filtros, a ordenação percorre o índice de data em vez de ordenar a tabela
+        query, parametros = montar_consulta_chamados({})
+        plano = ' | '.join(linha[3] for linha in self.conn.execute('EXPLAIN QUERY PLAN ' + query, parametros))
+        self.assertIn('SCAN c USING INDEX idx_chamado_data', plano)
+        self.assertNotIn('TEMP B-TREE', plano)
+    
+    def test_filtro_datas_chamados(self):
+        """Testa que data_fim inclui o dia inteiro"""
+        hoje = datetime.now().strftime('%Y-%m-%d')
+        query, parametros = montar_consulta_chamados({'data_inicio': hoje, 'data_fim': hoje})
+        self.assertEqual(len(self.conn.execute(query, parametros).fetchall()), 1)
+        
+        query, parametros = montar_consulta_chamados({'data_fim': '2000-01-01'})
+        self.assertEqual(len(self.conn.execute(query, parametros).fetchall()), 0)
+    
+    def test_estatisticas_projeto(self):
+        """Testa a manutenção incremental das estatísticas por projeto"""
+        self.conn.row_factory = sqlite3.Row
+        
+        # Novo chamado aberto no projeto de teste e posterior fechamento
+        self.conn.execute("""
+            INSERT INTO chamado (id_cliente, id_plantonista, id_categoria, id_projeto,
+                                 data_hora, descricao, status)
+            VALUES (1, 1, 1, (SELECT id_projeto FROM projeto WHERE sigla = 'TST'),
+                    datetime('now', '-90 minutes'), 'Outro chamado', 'Aberto')
+        """)
+        self.conn.execute("UPDATE chamado SET status = 'Resolvido' WHERE descricao = 'Outro chamado'")
+        self.conn.commit()
+        
+        estatisticas = estatisticas_projeto.obter_estatisticas(self.conn)
+        tst = [item for item in estatisticas['chamados_por_projeto'] if item['sigla'] == 'TST'][0]
+        self.assertEqual(tst['total_chamados'], 2)
+        self.assertIn({'sigla': 'TST', 'status': 'Resolvido', 'total': 2}, estatisticas['status_por_projeto'])
+        self.assertEqual(estatisticas_projeto.verificar_estatisticas(self.conn), [])
+        
+        # Exclusões e trocas de projeto também são refletidas
+        self.conn.execute("UPDATE chamado SET id_projeto = 2 WHERE descricao = 'Outro chamado'")
+        self.conn.execute("DELETE FROM chamado WHERE descricao <> 'Outro chamado'")
+        self.conn.commit()
+        self.assertEqual(estatisticas_projeto.verificar_estatisticas(self.conn), [])
+        
+        # A reconstrução corrige divergências
+        self.conn.execute("UPDATE estatistica_projeto SET total = total + 5")
+        self.assertNotEqual(estatisticas_projeto.verificar_estatisticas(self.conn), [])
+        estatisticas_projeto.reconstruir_estatisticas(self.conn)
+        self.assertEqual(estatisticas_projeto.verificar_estatisticas(self.conn), [])
+    
+    def test_exportacao_csv(self):
+        """Testa a exportação de chamados em CSV direto do cursor"""
+        query, parametros = exportacao.montar_consulta_chamados({'status': 'Resolvido'})
+        blocos = list(exportacao.gerar_csv(self.conn.execute(query, parametros)))
+        conteudo = ''.join(blocos)
+        
+        self.assertTrue(conteudo.startswith('\ufeffid_chamado,numero_rac,data_hora,status'))
+        linhas = conteudo.lstrip('\ufeff').splitlines()
+        self.assertEqual(len(linhas), 2)
+        self.assertIn('Empresa Teste', linhas[1])
+        
+        # Os filtros são os mesmos da listagem (montador único)
+        query, parametros = exportacao.montar_consulta_chamados({'cliente': 'Inexistente'})
+        self.assertEqual(self.conn.execute(query, parametros).fetchall(), [])
+    
+    def test_numeracao_rac(self):
+        """Testa a reserva atômica dos números de RAC"""
+        # O chamado do setUp foi numerado pela trigger
+        numero = self.conn.execute("SELECT numero_rac FROM chamado WHERE id_chamado = 1").fetchone()[0]
+        self.assertEqual(numero, 'RAC0001')
+        
+        # Números informados explicitamente avançam a sequência
+        self.conn.execute("""
+            INSERT INTO chamado (numero_rac, id_cliente, id_plantonista, id_categoria, descricao)
+            VALUES ('RAC0010', 1, 1, 1, 'Chamado importado')
+        """)
+        self.conn.commit()
+        
+        # Vários escritores simultâneos nunca recebem o mesmo número
+        def abrir_chamados():
+            for _ in range(20):
+                with database.get_db_connection(self.db_path) as conn:
+                    numero_rac = numeracao.proximo_numero_rac(conn)
+                    conn.execute("""
+                        INSERT INTO chamado (numero_rac, id_cliente, id_plantonista, id_categoria, descricao)
+                        VALUES (?, 1, 1, 1, 'Chamado concorrente')
+                    """, (numero_rac,))
+        
+        threads = [threading.Thread(target=abrir_chamados) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        numeros = [linha[0] for linha in self.conn.execute(
+            "SELECT numero_rac FROM chamado WHERE descricao = 'Chamado concorrente'")]
+        self.assertEqual(len(numeros), 80)
+        self.assertEqual(sorted(numeros), [numeracao.formatar_rac(n) for n in range(11, 91)])
+
+        # Os schemas com colunas novas podem ser reaplicados
+        database.aplicar_schemas(self.conn, ['schema_rac.sql', 'schema_relatorio.sql', 'schema_envio.sql'])
+        self.assertEqual(self.conn.execute("PRAGMA user_version").fetchone()[0], len(database.SCHEMAS))
+
+        # Banco anterior ao controle de versão (só com os schemas iniciais) é atualizado
+        antigo = sqlite3.connect(os.path.join(self.temp_dir, 'antigo.db'))
+        database.aplicar_schemas(antigo, database.SCHEMAS[:database.SCHEMAS_INICIAIS])
+        antigo.execute("INSERT INTO cliente (nome) VALUES ('Cliente Antigo')")
+        antigo.execute("""
+            INSERT INTO chamado (id_cliente, id_plantonista, id_categoria, descricao)
+            VALUES (1, 1, 1, 'Chamado antigo')
+        """)
+        antigo.commit()
+        database.aplicar_schemas(antigo)
+        database.aplicar_schemas(antigo)
+        self.assertEqual(antigo.execute("SELECT numero_rac FROM chamado").fetchall(), [('RAC0001',)])
+        self.assertEqual(antigo.execute("PRAGMA user_version").fetchone()[0], len(database.SCHEMAS))
+        antigo.close()
+
+    def test_execucao_em_lote(self):
+        """Testa a execução em lote com resultado individual por item"""
+        resultados = lote.executar_em_lote(math.sqrt, [4, -1, 9], processos=2)
+        
+        self.assertEqual([r['status'] for r in resultados], ['success', 'error', 'success'])
+        self.assertEqual(resultados[0]['resultado'], 2.0)
+        self.assertEqual(resultados[1]['item'], -1)
+        self.assertIn('message', resultados[1])
+        
+        # Com um único processo a execução é feita no próprio processo
+        self.assertEqual(lote.executar_em_lote(math.sqrt, [16], processos=1)[0]['resultado'], 4.0)
+    
+    def test_renderizador_pdf(self):
+        """Testa o renderizador com template e logos preparados uma única vez"""
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        logo = os.path.join(self.temp_dir, 'logo.png')
+        with open(logo, 'wb') as f:
+            f.write(b'\x89PNG teste')
+        
+        renderizador = RenderizadorPDF(base_dir, pdf_generator.CSS_RELATORIO, logos={'esquerdo': logo})
+        html = renderizador.renderizar_html({'numero_rac': 'RAC0001', 'data_formatada': '01/01/2025'})
+        
+        self.assertIn('RAC0001 - 01/01/2025', html)
+        self.assertIn('src="data:image/png;base64,', html)
+        # Logo ausente mantém o caminho padrão do template
+        self.assertIn('src="static/img/logo_right.png"', html)
+    
+    def test_cache_relatorio_por_hash(self):
+        """Testa o reaproveitamento do PDF quando o conteúdo não mudou"""
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        renderizador = RenderizadorPDF(base_dir, pdf_generator.CSS_RELATORIO)
+        renderizacoes = []
+        
+        def gerar_pdf(chamado, output_path=None):
+            renderizacoes.append(chamado['numero_rac'])
+            with open(output_path, 'wb') as f:
+                f.write(b'%PDF')
+        
+        renderizador.gerar_pdf = gerar_pdf
+        pdf_generator.DB_PATH = self.db_path
+        pdf_generator._renderizador = renderizador
+        caminho = None
+        try:
+            caminho = pdf_generator.gerar_relatorio_pdf(1)
+            self.assertEqual(pdf_generator.gerar_relatorio_pdf(1), caminho)
+            self.assertEqual(len(renderizacoes), 1)
+            
+            # Forçar renderiza mesmo sem mudanças
+            pdf_generator.gerar_relatorio_pdf(1, forcar=True)
+            self.assertEqual(len(renderizacoes), 2)
+            
+            # Mudança nos dados do cliente invalida o hash
+            self.conn.execute("UPDATE cliente SET contato = 'Outro Contato' WHERE id_cliente = 1")
+            self.conn.commit()
+            pdf_generator.gerar_relatorio_pdf(1)
+            self.assertEqual(len(renderizacoes), 3)
+        finally:
+            pdf_generator._renderizador = None
+            if caminho and os.path.exists(caminho):
+                os.remove(caminho)
+    
+    def iniciar_servidor_smtp(self):
+        """Inicia um servidor SMTP local (aiosmtpd); retorna a porta e a caixa de entrada"""
+        class Caixa:
+            def __init__(self):
+                self.envelopes = []
+            
+            async def handle_DATA(self, server, session, envelope):
+                self.envelopes.append(envelope)
+                return '250 OK'
+        
+        # Porta livre para o servidor SMTP local
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            porta = sock.getsockname()[1]
+        
+        caixa = Caixa()
+        controller = Controller(caixa, hostname='127.0.0.1', port=porta)
+        controller.start()
+        self.addCleanup(controller.stop)
+        return porta, caixa
+    
+    def criar_relatorios_pendentes(self, quantidade):
+        """Cria relatórios pendentes (com PDF) para cópias do chamado de teste"""
+        for numero in range(quantidade):
+            if numero:
+                self.conn.execute("""
+                    INSERT INTO chamado (id_cliente, id_plantonista, id_categoria, id_projeto, descricao, status)
+                    SELECT id_cliente, id_plantonista, id_categoria, id_projeto, descricao, status
+                    FROM chamado WHERE id_chamado = 1
+                """)
+            pdf_path = os.path.join(self.temp_dir, f'relatorio{numero}.pdf')
+            with open(pdf_path, 'wb') as f:
+                f.write(b'%PDF')
+            self.conn.execute("INSERT INTO relatorio (id_chamado, caminho_pdf) VALUES (?, ?)", (numero + 1, pdf_path))
+        self.conn.commit()
+    
+    @unittest.skipIf(Controller is None, "aiosmtpd não instalado")
+    def test_envio_email_sessao_unica(self):
+        """Testa o envio do lote em uma única sessão SMTP, com o gerente em Cc"""
+        porta, caixa = self.iniciar_servidor_smtp()
+        self.criar_relatorios_pendentes(3)
+        
+        sender = RelatorioSender(db_path=self.db_path)
+        sender.email_config.update(smtp_server='127.0.0.1', smtp_port=porta, starttls=False, username=None)
+        sessoes = []
+        abrir_sessao = sender.open_email_session
+        sender.open_email_session = lambda: sessoes.append(abrir_sessao()) or sessoes[-1]
+        
+        resultados = sender.process_pending_reports()
+        
+        self.assertEqual([r['metodo'] for r in resultados], ['Email'] * 3)
+        self.assertEqual(sessoes[0].conexoes, 1)
+        self.assertEqual(len(caixa.envelopes), 3)
+        self.assertEqual(caixa.envelopes[0].rcpt_tos, ['contato@empresateste.com.br', 'gerente@empresa.com.br'])
+        
+        # Conexão derrubada no meio do lote é reaberta automaticamente
+        relatorio = {
+            'cliente': 'Empresa Teste', 'email': 'contato@empresateste.com.br', 'numero_rac': 'RAC0001',
+            'caminho_pdf': os.path.join(self.temp_dir, 'relatorio0.pdf')
+        }
+        with sender.open_email_session() as sessao:
+            self.assertTrue(sender.send_report_by_email(relatorio, sessao)['success'])
+            sessao.servidor.sock.shutdown(socket.SHUT_RDWR)
+            self.assertTrue(sender.send_report_by_email(relatorio, sessao)['success'])
+            self.assertEqual(sessao.conexoes, 2)
+        self.assertEqual(len(caixa.envelopes), 5)
+    
+    def test_limite_taxa(self):
+        """Testa o balde de fichas do despacho de relatórios"""
+        limite = despacho.LimiteTaxa(taxa=50, rajada=2)
+        inicio = time.monotonic()
+        esperas = [limite.aguardar() for _ in range(6)]
+        duracao = time.monotonic() - inicio
+        
+        # A rajada passa sem espera; as demais fichas saem a 50 por segundo
+        self.assertEqual(esperas[:2], [0.0, 0.0])
+        self.assertGreaterEqual(duracao, 4 / 50 * 0.9)
+        self.assertLess(duracao, 0.5)
+    
+    @unittest.skipIf(Controller is None, "aiosmtpd não instalado")
+    def test_despacho_concorrente(self):
+        """Testa o despacho paralelo com vagas por canal e estatísticas agregadas"""
+        porta, caixa = self.iniciar_servidor_smtp()
+        self.criar_relatorios_pendentes(6)
+        
+        # Relatório sem email cai para o WhatsApp
+        self.conn.execute("UPDATE cliente SET email = NULL WHERE id_cliente = 1")
+        self.conn.execute("""
+            INSERT INTO cliente (nome, email, telefone) VALUES ('Outro Cliente', 'outro@cliente.com.br', '(11) 90000-0000')
+        """)
+        self.conn.execute("UPDATE chamado SET id_cliente = 2 WHERE id_chamado > 1")
+        self.conn.commit()
+        
+        sender = RelatorioSender(db_path=self.db_path)
+        sender.email_config.update(smtp_server='127.0.0.1', smtp_port=porta, starttls=False, username=None)
+        sender.dispatch_config['Email'] = {'concorrencia': 2, 'taxa': 100, 'rajada': 2}
+        
+        despacho_lote = sender.dispatch_pending_reports()
+        estatisticas = despacho_lote['estatisticas']
+        
+        self.assertEqual(estatisticas['total'], 6)
+        self.assertEqual(estatisticas['por_metodo'], {'Email': 5, 'WhatsApp': 1})
+        self.assertEqual(estatisticas['canais']['Email']['envios'], 5)
+        self.assertIn('latencia_p95_ms', estatisticas['canais']['Email'])
+        self.assertEqual(len(caixa.envelopes), 5)
+        self.assertEqual(sender.get_pending_reports(), [])
+    
+    def test_fila_envio_relatorios(self):
+        """Testa novas tentativas com espera e descarte de falhas definitivas"""
+        sender = RelatorioSender(db_path=self.db_path)
+        pdf_path = os.path.join(self.temp_dir, 'relatorio.pdf')
+        self.conn.execute("INSERT INTO relatorio (id_chamado, caminho_pdf) VALUES (1, ?)", (pdf_path,))
+        self.conn.commit()
+        
+        # PDF inexistente é falha definitiva: o relatório sai da fila
+        resultado = sender.process_pending_reports()[0]
+        self.assertEqual(resultado['resultado']['status_envio'], 'Descartado')
+        self.assertEqual(sender.get_pending_reports(), [])
+        self.assertEqual(sender.get_discarded_reports()[0]['tentativas'], 1)
+        
+        # Gerar o PDF novamente reativa o envio
+        with open(pdf_path, 'wb') as f:
+            f.write(b'%PDF')
+        self.conn.execute("UPDATE relatorio SET caminho_pdf = ? WHERE id_chamado = 1", (pdf_path,))
+        self.conn.commit()
+        self.assertEqual(len(sender.get_pending_reports()), 1)
+        
+        # Falha temporária (servidor SMTP fora do ar, sem WhatsApp) é reagendada
+        self.conn.execute("UPDATE cliente SET telefone = NULL WHERE id_cliente = 1")
+        self.conn.commit()
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            porta_fechada = sock.getsockname()[1]
+        sender.email_config.update(smtp_server='127.0.0.1', smtp_port=porta_fechada, starttls=False, username=None)
+        resultado = sender.process_pending_reports()[0]
+        self.assertEqual(resultado['resultado']['status_envio'], 'Pendente')
+        self.assertIn('Erro ao enviar email', resultado['resultado']['erro'])
+        self.assertEqual(sender.get_pending_reports(), [])
+        
+        # Vencida a espera, a última tentativa permitida descarta o relatório
+        sender.retry_config['max_tentativas'] = 2
+        self.conn.execute("UPDATE relatorio SET proxima_tentativa = datetime('now', '-1 second')")
+        self.conn.commit()
+        self.assertEqual(sender.process_pending_reports()[0]['resultado']['status_envio'], 'Descartado')
+        
+        # Reenvio manual
+        sender.requeue_report(resultado['id_relatorio'])
+        self.assertEqual(sender.get_pending_reports()[0]['tentativas'], 0)
+        
+        # Espera exponencial com jitter, limitada ao máximo
+        self.assertTrue(120 <= sender.retry_delay(3) <= 240)
+        self.assertLessEqual(sender.retry_delay(30), sender.retry_config['atraso_maximo'])
+    
+    @unittest.skipIf(Controller is None, "aiosmtpd não instalado")
+    def test_agrupamento_por_destinatario(self):
+        """Testa o envio de vários relatórios do mesmo destinatário em uma mensagem"""
+        porta, caixa = self.iniciar_servidor_smtp()
+        self.criar_relatorios_pendentes(4)
+        self.conn.execute("INSERT INTO cliente (nome, email) VALUES ('Outro Cliente', 'outro@cliente.com.br')")
+        self.conn.execute("UPDATE chamado SET id_cliente = 2 WHERE id_chamado = 4")
+        self.conn.commit()
+        
+        sender = RelatorioSender(db_path=self.db_path)
+        sender.email_config.update(smtp_server='127.0.0.1', smtp_port=porta, starttls=False, username=None)
+        
+        envio = sender.send_coalesced_reports()
+        
+        # Três relatórios do mesmo cliente em uma mensagem (gerente em Cc) e um avulso
+        self.assertEqual(envio['mensagens_email'], 2)
+        self.assertEqual(len(envio['resultados']), 4)
+        self.assertEqual(sender.get_pending_reports(), [])
+        self.assertEqual(caixa.envelopes[0].rcpt_tos, ['contato@empresateste.com.br', 'gerente@empresa.com.br'])
+        self.assertEqual(caixa.envelopes[0].content.count(b'filename="relatorio'), 3)
+        
+        # Com resumo do gerente: clientes sem Cc e um único resumo para o gerente
+        self.conn.execute("UPDATE relatorio SET status_envio = 'Pendente', enviado = 0")
+        self.conn.commit()
+        sender.coalesce_config['resumo_gerente'] = True
+        envio = sender.send_coalesced_reports()
+        
+        self.assertEqual(envio['mensagens_email'], 3)
+        self.assertEqual(envio['resumos_gerente'], [
+            {'email_gerente': 'gerente@empresa.com.br', 'relatorios': 4, 'success': True}])
+        self.assertEqual(caixa.envelopes[2].rcpt_tos, ['contato@empresateste.com.br'])
+        self.assertEqual(caixa.envelopes[-1].rcpt_tos, ['gerente@empresa.com.br'])
+
+        # Falha no envio agrupado: os reenvios avulsos também ficam sem o gerente em Cc
+        self.conn.execute("UPDATE relatorio SET status_envio = 'Pendente', enviado = 0")
+        self.conn.commit()
+        anteriores = len(caixa.envelopes)
+        with unittest.mock.patch.object(sender, 'build_group_message', side_effect=OSError('falha')):
+            envio = sender.send_coalesced_reports()
+        self.assertEqual(envio['mensagens_email'], 5)
+        self.assertEqual(envio['resumos_gerente'][0]['relatorios'], 4)
+        self.assertEqual([envelope.rcpt_tos for envelope in caixa.envelopes[anteriores:-1]],
+                         [['contato@empresateste.com.br']] * 3 + [['outro@cliente.com.br']])
+
+        # A janela e o limite de anexos separam os grupos
+        sender.coalesce_config['max_anexos'] = 2
+        grupos = sender.group_reports([
+            {'email': 'a@a.com', 'data_geracao': '2025-01-01 08:00:00'},
+            {'email': 'a@a.com', 'data_geracao': '2025-01-01 09:00:00'},
+            {'email': 'a@a.com', 'data_geracao': '2025-01-01 10:00:00'},
+            {'email': 'a@a.com', 'data_geracao': '2025-01-03 10:00:00'}
+        ], lambda r: r['email'])
+        self.assertEqual([len(grupo) for grupo in grupos], [2, 1, 1])
+    
+    @unittest.skipIf(Controller is None, "aiosmtpd não instalado")
+    def test_anexos_em_blocos(self):
+        """Testa o envio de anexos lidos do disco aos poucos, com limites de tamanho"""
+        porta, caixa = self.iniciar_servidor_smtp()
+        self.criar_relatorios_pendentes(3)
+        conteudo = os.urandom(3 * 1024 * 1024 + 7)
+        pdf_grande = os.path.join(self.temp_dir, 'relatorio0.pdf')
+        with open(pdf_grande, 'wb') as f:
+            f.write(conteudo)
+        
+        sender = RelatorioSender(db_path=self.db_path)
+        sender.email_config.update(smtp_server='127.0.0.1', smtp_port=porta, starttls=False, username=None)
+        relatorio = sender.get_pending_reports()[0]
+        msg = sender.build_email_message(relatorio)
+        
+        # O tamanho é conhecido antes da leitura e a codificação não carrega o arquivo inteiro
+        tracemalloc.start()
+        try:
+            tamanho = sum(len(bloco) for bloco in msg.blocos())
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(msg.tamanho(), tamanho)
+        self.assertLess(pico, 1024 * 1024)
+        
+        with sender.open_email_session() as sessao:
+            sender.send_email(sessao, msg)
+        recebida = message_from_bytes(caixa.envelopes[0].original_content)
+        anexo = [parte for parte in recebida.walk() if parte.get_filename()][0]
+        self.assertEqual(anexo.get_payload(decode=True), conteudo)
+        self.assertEqual(caixa.envelopes[0].rcpt_tos, ['contato@empresateste.com.br', 'gerente@empresa.com.br'])
+        
+        # Relatório acima do limite é recusado antes do envio; os demais são divididos
+        sender.attachment_config['max_mensagem'] = 2 * 1024 * 1024
+        resultado = sender.send_report_by_email(relatorio)
+        self.assertFalse(resultado['success'])
+        self.assertTrue(resultado['permanent'])
+        self.assertEqual(len(caixa.envelopes), 1)
+        
+        sender.attachment_config['max_mensagem'] = anexos.tamanho_anexo(pdf_grande) + 100
+        pendentes = sorted(sender.get_pending_reports(), key=lambda r: r['id_relatorio'])
+        partes = sender.split_by_size(pendentes)
+        self.assertEqual([len(parte) for parte in partes], [1, 2])
+        
+        # Limite de bytes em trânsito entre envios simultâneos
+        limite = despacho.LimiteBytes(100)
+        def reservar():
+            with limite.reservar(60):
+                time.sleep(0.02)
+        threads = [threading.Thread(target=reservar) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(limite.pico, 60)
+        self.assertEqual(limite.em_uso, 0)
+    
+    def test_confirmacoes_em_lote(self):
+        """Testa a gravação em lote dos resultados de envio e a recuperação do diário"""
+        self.criar_relatorios_pendentes(5)
+        sender = RelatorioSender(db_path=self.db_path)
+        
+        def status():
+            return [linha[0] for linha in self.conn.execute(
+                "SELECT status_envio FROM relatorio ORDER BY id_relatorio")]
+        
+        # Um lote de 3 é gravado em uma transação; o quarto fica só no diário
+        confirmacoes = ConfirmacoesEnvio(self.db_path, tamanho_lote=3)
+        for id_relatorio in range(1, 5):
+            confirmacoes.registrar_envio(id_relatorio, 'Email')
+        self.assertEqual(confirmacoes.transacoes, 1)
+        self.assertEqual(status(), ['Enviado'] * 3 + ['Pendente'] * 2)
+        
+        # Outro despacho não abre (nem reaplica) o diário em uso
+        with self.assertRaises(ValueError):
+            ConfirmacoesEnvio(self.db_path)
+        self.assertEqual(status(), ['Enviado'] * 3 + ['Pendente'] * 2)
+        
+        # Queda do processo (com uma linha incompleta no diário; a trava é liberada com ele):
+        # a próxima abertura grava o resultado anotado antes de a fila ser lida
+        confirmacoes._diario.write('{"id_relatorio": 5, "sta')
+        confirmacoes._diario.close()
+        confirmacoes._trava.close()
+        confirmacoes = ConfirmacoesEnvio(self.db_path)
+        self.assertEqual(confirmacoes.recuperados, 1)
+        self.assertEqual(status(), ['Enviado'] * 4 + ['Pendente'])
+        self.assertEqual(len(sender.get_pending_reports()), 1)
+        
+        confirmacoes.registrar_falha(5, 1, 'Erro de teste', 'Pendente', 60)
+        confirmacoes.fechar()
+        self.assertFalse(os.path.exists(confirmacoes.diario_path))
+        self.assertEqual(self.conn.execute(
+            "SELECT tentativas, ultimo_erro FROM relatorio WHERE id_relatorio = 5").fetchone(), (1, 'Erro de teste'))
+        self.assertEqual(sender.get_pending_reports(), [])
+        
+        # Despacho completo: todos os resultados gravados ao final
+        self.conn.execute("UPDATE relatorio SET status_envio = 'Pendente', proxima_tentativa = '1970-01-01 00:00:00'")
+        self.conn.execute("UPDATE cliente SET email = NULL")
+        self.conn.commit()
+        resultados = sender.process_pending_reports()
+        self.assertEqual([r['metodo'] for r in resultados], ['WhatsApp'] * 5)
+        self.assertEqual(status(), ['Enviado'] * 5)
+    
+    def test_cliente_whatsapp(self):
+        """Testa o envio pelo gateway do WhatsApp com conexão reaproveitada e mídia única"""
+        self.criar_relatorios_pendentes(3)
+        with open(os.path.join(self.temp_dir, 'relatorio2.pdf'), 'wb') as f:
+            f.write(b'%PDF outro conteudo')
+        self.conn.execute("UPDATE cliente SET email = NULL")
+        self.conn.commit()
+        
+        with GatewaySimulado() as gateway:
+            sender = RelatorioSender(db_path=self.db_path)
+            sender.whatsapp_config.update(api_url=gateway.url, api_token='teste')
+            gateway.falhas = 1
+            
+            resultados = sender.process_pending_reports()
+            
+            # Dois conteúdos distintos: dois uploads para seis mensagens (cliente e gerente)
+            self.assertEqual([r['metodo'] for r in resultados], ['WhatsApp'] * 3)
+            self.assertEqual(len(gateway.uploads), 2)
+            self.assertEqual(len(gateway.mensagens), 6)
+            self.assertEqual({m['document']['id'] for m in gateway.mensagens}, {'midia-1', 'midia-2'})
+            self.assertEqual(gateway.mensagens[0]['to'], '5511987654321')
+            self.assertEqual(gateway.mensagens[1]['to'], '5511923456789')
+            self.assertEqual(gateway.conexoes, 1)
+            
+            # Ids de mídia ficam registrados no banco para as próximas execuções
+            self.conn.execute("UPDATE relatorio SET status_envio = 'Pendente'")
+            self.conn.commit()
+            sender = RelatorioSender(db_path=self.db_path)
+            sender.whatsapp_config.update(api_url=gateway.url, api_token='teste')
+            sender.process_pending_reports()
+            self.assertEqual(len(gateway.uploads), 2)
+            self.assertEqual(len(gateway.mensagens), 12)
+        
+        # Mensagens (não idempotentes) só são repetidas quando o gateway garante que não as aceitou;
+        # o upload de mídia também é repetido após 502/504. A conexão é a mesma
+        cliente = ClienteWhatsApp({'api_url': 'https://gateway.exemplo/v1'})
+        mensagens = cliente.session.get_adapter('https://gateway.exemplo/v1/messages')
+        midia = cliente.session.get_adapter('https://gateway.exemplo/v1/media')
+        self.assertEqual(tuple(mensagens.max_retries.status_forcelist), (429, 503))
+        self.assertIn(504, midia.max_retries.status_forcelist)
+        self.assertIs(mensagens.poolmanager, midia.poolmanager)
+        cliente.fechar()
+        
+        # Hashes e ids de mídia em memória ficam limitados aos arquivos mais recentes
+        with GatewaySimulado() as gateway, ClienteWhatsApp({'api_url': gateway.url}, max_arquivos=2) as cliente:
+            for numero in range(3):
+                caminho = os.path.join(self.temp_dir, f'anexo{numero}.pdf')
+                with open(caminho, 'wb') as f:
+                    f.write(b'%PDF anexo ' + bytes([48 + numero]))
+                cliente.obter_midia(caminho)
+            cliente.obter_midia(caminho)
+            self.assertEqual((len(cliente.hashes), len(cliente.midias), cliente.uploads), (2, 2, 3))
+            self.assertEqual(cliente._locks_midia, {})
+    
+    def test_estado_conversa(self):
+        """Testa o estado das conversas do bot compartilhado entre processos, com validade e limite"""
+        # Dois processos do bot atrás de um balanceador, com o mesmo banco
+        workers = [whatsapp_bot_fixed.WhatsAppIntegration(EstadoSQLite(self.db_path)) for _ in range(2)]
+        mensagens = ['Novo chamado', 'Empresa Teste', 'Solicitante', 'TST', 'Motivo do chamado',
+                     'Alta', 'Diagnóstico e solução']
+        for numero, mensagem in enumerate(mensagens):
+            workers[numero % 2].process_message('+5585999999999', mensagem)
+        self.assertEqual(workers[0].estado.obter('+5585999999999')[0], 'confirmar')
+        
+        with unittest.mock.patch.object(whatsapp_bot_fixed, 'DB_PATH', self.db_path):
+            resposta = workers[1].process_message('+5585999999999', 'sim')
+        self.assertIn('RAC0002', resposta)
+        self.assertIsNone(workers[0].estado.obter('+5585999999999'))
+        
+        # Consultas ao histórico pelo bot: o "mais" pode chegar a outro processo
+        self.conn.executemany("""
+            INSERT INTO chamado (id_cliente, id_plantonista, id_categoria, descricao, status)
+            VALUES (1, 1, 1, ?, 'Resolvido')
+        """, [(f'Impressora sem papel {numero}',) for numero in range(6)])
+        self.conn.commit()
+        workers = [whatsapp_bot_fixed.WhatsAppIntegration(EstadoSQLite(self.db_path), ConsultaHistorica(self.db_path))
+                   for _ in range(2)]
+        self.assertIn("Envie 'mais'", workers[0].process_message('+5585999999999', 'Consultar impressora'))
+        self.assertIn('6. ', workers[1].process_message('+5585999999999', 'mais'))
+        # Durante um formulário, a resposta é um campo e não uma consulta
+        workers[0].process_message('+5585999999999', 'Novo chamado')
+        self.assertEqual(workers[1].process_message('+5585999999999', 'cliente Empresa Teste'),
+                         whatsapp_bot_fixed.PERGUNTAS['solicitante'])
+        workers[0].estado.remover('+5585999999999')
+        
+        # Conversas abandonadas expiram e o excedente mais antigo é removido
+        estado = EstadoSQLite(self.db_path, ttl=3600, max_conversas=2)
+        for numero in range(4):
+            estado.salvar(f'remetente{numero}', 'cliente', {'numero': numero})
+        self.conn.execute("UPDATE conversa SET atualizado_em = atualizado_em - 7200 WHERE remetente = 'remetente3'")
+        self.conn.commit()
+        self.assertIsNone(estado.obter('remetente3'))
+        self.assertEqual(estado.limpar(), 2)
+        self.assertEqual(estado.obter('remetente2'), ('cliente', {'numero': 2}))
+        
+        memoria = EstadoMemoria(ttl=0.05, max_conversas=2)
+        for numero in range(3):
+            memoria.salvar(f'remetente{numero}', 'cliente', {})
+        memoria.obter('remetente1')
+        self.assertEqual(list(memoria.conversas), ['remetente2', 'remetente1'])
+        time.sleep(0.06)
+        self.assertIsNone(memoria.obter('remetente2'))
+    
+    def test_cache_cadastros(self):
+        """Testa o cache de cadastros usado na abertura de chamados"""
+        cache = cadastros.CacheCadastros(intervalo_verificacao=0)
+        with database.get_db_connection(self.db_path) as conn:
+            # Nome com outra grafia encontra o mesmo cliente, que passa a vir do cache
+            self.assertEqual(cache.id_cliente(conn, ' empresa TESTE '), 1)
+            self.assertEqual(cache.ids['cliente'], {'empresa teste': 1})
+            
+            # Cliente novo é criado, mas só entra no cache depois de consultado já existente
+            id_novo = cache.id_cliente(conn, 'Cliente Novo', contato='Contato')
+            self.assertNotIn('cliente novo', cache.ids['cliente'])
+            self.assertEqual(cache.id_cliente(conn, 'cliente novo'), id_novo)
+            self.assertEqual(cache.ids['cliente']['cliente novo'], id_novo)
+            self.assertEqual(cache.id_plantonista(conn, 'Plantonista Teste'), 1)
+            self.assertIsNone(cache.id_categoria(conn, 'Inexistente'))
+        
+        # Nomes repetidos são recusados pelo índice normalizado
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.conn.execute("INSERT INTO cliente (nome) VALUES ('EMPRESA TESTE')")
+        
+        # Alteração de nome feita por outro processo invalida o cadastro no cache
+        self.conn.execute("UPDATE cliente SET nome = 'Empresa Renomeada' WHERE id_cliente = 1")
+        self.conn.commit()
+        with database.get_db_connection(self.db_path) as conn:
+            self.assertEqual(cache.id_cliente(conn, 'Empresa Renomeada'), 1)
+            self.assertNotEqual(cache.id_cliente(conn, 'Empresa Teste'), 1)
+        
+        cache.invalidar()
+        self.assertEqual(cache.ids['cliente'], {})
+
+        # Banco existente com repetidos: unificados no de menor id, sem perder os dados dos removidos
+        self.conn.executescript("""
+            DROP INDEX idx_cliente_nome;
+            INSERT INTO cliente (nome, cnpj_cpf, telefone) VALUES (' empresa renomeada', '98.765.432/0001-10', '(85) 3333-4444');
+            UPDATE cliente SET cnpj_cpf = NULL, email = NULL WHERE id_cliente = 1;
+            UPDATE chamado SET id_cliente = (SELECT MAX(id_cliente) FROM cliente);
+        """)
+        database.aplicar_schemas(self.conn, ['schema_cadastros.sql'])
+        cliente = self.conn.execute("SELECT cnpj_cpf, telefone, email FROM cliente WHERE id_cliente = 1").fetchone()
+        self.assertEqual(cliente, ('98.765.432/0001-10', '(11) 98765-4321', None))
+        self.assertEqual(self.conn.execute("SELECT DISTINCT id_cliente FROM chamado").fetchall(), [(1,)])
+        removido = self.conn.execute("SELECT id_mantido, json_extract(dados, '$.telefone') FROM cadastro_unificado").fetchall()
+        self.assertEqual(removido, [(1, '(85) 3333-4444')])
+        
+        # Mesmo nome com CNPJ diferente é outra empresa: nada é unificado e a aplicação é interrompida
+        self.conn.executescript("""
+            DROP INDEX idx_cliente_nome;
+            INSERT INTO cliente (nome, cnpj_cpf) VALUES ('Empresa Renomeada ', '11.111.111/0001-11');
+            UPDATE chamado SET id_cliente = (SELECT MAX(id_cliente) FROM cliente);
+        """)
+        with self.assertRaises(sqlite3.IntegrityError) as erro:
+            database.aplicar_schemas(self.conn, ['schema_cadastros.sql'])
+        self.assertIn('cadastro_conflito', str(erro.exception))
+        self.assertEqual(self.conn.execute(
+            "SELECT COUNT(*) FROM cliente WHERE nome LIKE 'Empresa Renomeada%'").fetchone()[0], 2)
+        self.assertNotEqual(self.conn.execute("SELECT DISTINCT id_cliente FROM chamado").fetchall(), [(1,)])
+        self.assertEqual(self.conn.execute("SELECT chave, documentos FROM cadastro_conflito").fetchall(),
+                         [('empresa renomeada', '98.765.432/0001-10, 11.111.111/0001-11')])
+        
+        # Renomeado o homônimo, a aplicação termina
+        self.conn.execute("UPDATE cliente SET nome = 'Empresa Renomeada Filial' WHERE cnpj_cpf = '11.111.111/0001-11'")
+        self.conn.commit()
+        database.aplicar_schemas(self.conn, ['schema_cadastros.sql'])
+        self.assertEqual(self.conn.execute(
+            "SELECT COUNT(*) FROM cliente WHERE nome LIKE 'Empresa Renomeada%'").fetchone()[0], 2)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM cadastro_conflito").fetchone()[0], 0)
+
+    def test_importacao_em_massa(self):
+        """Testa a importação em massa de chamados históricos"""
+        arquivo = io.StringIO(
+            "numero_rac;cliente;solicitante;plantonista;projeto;categoria;prioridade;status;descricao;data_hora;data_fechamento\n"
+            "RAC0100;EMPRESA TESTE;;Plantonista Teste;SUP;Manutenção;alta;Resolvido;Servidor de arquivos parado;2020-05-04 08:00:00;04/05/2020 09:30\n"
+            "RAC0101;Cliente Antigo;Ana;Plantonista Antigo;;;;;Impressora sem rede;2020-05-05T10:00:00;\n"
+            ";Cliente Antigo;;Plantonista Antigo;XYZ;;;;Projeto inexistente;;\n"
+            ";Cliente Antigo;;Plantonista Antigo;DEV;;Urgente;;Prioridade inválida;;\n"
+            ";Cliente Antigo;;Plantonista Antigo;DEV;;;;Sem número de RAC;;\n"
+        )
+        importador = importacao.ImportadorChamados(self.db_path, tamanho_lote=2, adiar=True)
+        resultado = importador.importar(importacao.ler_registros(arquivo, 'csv'))
+        self.assertEqual(resultado['importados'], 3)
+        self.assertEqual([item['linha'] for item in resultado['rejeitados']], [4, 5])
+        self.assertGreater(resultado['linhas_por_segundo'], 0)
+        
+        with database.get_db_connection(self.db_path) as conn:
+            chamado = conn.execute("""
+                SELECT id_cliente, id_projeto, id_categoria, prioridade, status, data_fechamento, tempo_atendimento
+                FROM chamado WHERE numero_rac = 'RAC0100'
+            """).fetchone()
+            self.assertEqual(tuple(chamado), (1, 1, 2, 'Alta', 'Resolvido', '2020-05-04 09:30:00', 90))
+            self.assertEqual(conn.execute("SELECT numero_rac FROM chamado ORDER BY id_chamado DESC LIMIT 1").fetchone()[0],
+                             'RAC0102')
+            
+            # Triggers e índices recriados, busca e estatísticas atualizadas
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM importacao_adiada").fetchone()[0], 0)
+            self.assertEqual(conn.execute("""
+                SELECT COUNT(*) FROM sqlite_master WHERE name IN ('chamado_fts_insert', 'idx_chamado_status_data')
+            """).fetchone()[0], 2)
+            self.assertEqual(conn.execute("SELECT rowid FROM chamado_fts WHERE chamado_fts MATCH 'impressora'").fetchall()[0][0],
+                             conn.execute("SELECT id_chamado FROM chamado WHERE numero_rac = 'RAC0101'").fetchone()[0])
+            self.assertEqual(estatisticas_projeto.verificar_estatisticas(conn), [])
+            self.assertEqual(numeracao.proximo_numero_rac(conn), 'RAC0103')
+        
+        # Repetir a importação não duplica os RACs já gravados
+        linhas = [json.dumps({'numero_rac': 'RAC0100', 'cliente': 'X', 'plantonista': 'Y', 'descricao': 'Z'}), '{inválida']
+        resultado = importador.importar(importacao.ler_registros(io.StringIO("\n".join(linhas)), 'jsonl'))
+        self.assertEqual(resultado['importados'], 0)
+        self.assertEqual([item['erro'] for item in resultado['rejeitados']],
+                         ['numero_rac já existe: RAC0100', 'linha não é um objeto JSON válido'])
+        
+        # Sem adiar (sistema em uso), os triggers continuam ativos durante a carga; um
+        # valor fora do intervalo e um conflito na gravação recusam só a própria linha
+        importador = importacao.ImportadorChamados(self.db_path)
+        with importador.carga(), database.get_db_connection(self.db_path) as conn:
+            self.assertIsNotNone(conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chamado_fts_insert'").fetchone())
+            conn.execute("""
+                CREATE TEMP TRIGGER conflito BEFORE INSERT ON main.chamado WHEN NEW.descricao = 'Conflito'
+                BEGIN SELECT RAISE(ABORT, 'conflito simulado'); END
+            """)
+        linhas = [json.dumps({'cliente': 'X', 'plantonista': 'Y', 'descricao': descricao, 'tempo_atendimento': tempo})
+                  for descricao, tempo in (('Gravado', None), ('Tempo inválido', '1e400'), ('Conflito', None),
+                                           ('Também gravado', None))]
+        resultado = importador.importar(importacao.ler_registros(io.StringIO("\n".join(linhas)), 'jsonl'))
+        self.assertEqual(resultado['importados'], 2)
+        self.assertEqual([item['linha'] for item in resultado['rejeitados']], [2, 3])
+        with database.get_db_connection(self.db_path) as conn:
+            conn.execute("DROP TRIGGER temp.conflito")
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM chamado_fts WHERE chamado_fts MATCH 'gravado'").fetchone()[0], 2)
+        
+        # Só uma carga com a manutenção adiada por vez
+        with importacao.ImportadorChamados(self.db_path, adiar=True).carga():
+            with self.assertRaises(ValueError):
+                with importacao.ImportadorChamados(self.db_path, adiar=True).carga():
+                    pass
+        with database.get_db_connection(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM importacao_adiada").fetchone()[0], 0)
+    
+    def test_ingestao_pdf(self):
+        """Testa a ingestão dos RACs antigos em PDF, retomada pelo hash dos arquivos"""
+        pasta = os.path.join(self.temp_dir, 'racs')
+        os.makedirs(pasta)
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'RAC0142.pdf'), 'rb') as f:
+            original = f.read()
+        for numero in (142, 143):
+            with open(os.path.join(pasta, f'RAC{numero:04d}.pdf'), 'wb') as f:
+                f.write(original.replace(b'(RAC0142)', f'(RAC{numero:04d})'.encode()))
+        with open(os.path.join(pasta, 'corrompido.pdf'), 'wb') as f:
+            f.write(b'conteudo qualquer')
+        
+        campos = ingestao_pdf.extrair_campos(original)
+        self.assertEqual(campos['cliente'], 'Dias Branco - FFT - Fabrica Fortaleza')
+        self.assertEqual(campos['tecnico'], 'Paulo Leal')
+        self.assertTrue(campos['analise'].startswith('Ao acessar remotamente'))
+        
+        progresso = []
+        ingestao = ingestao_pdf.IngestaoPDF(self.db_path, processos=1, tamanho_lote=2,
+                                            progresso=lambda *args: progresso.append(args[:2]))
+        totais = ingestao.ingerir(ingestao_pdf.listar_pdfs(pasta))
+        self.assertEqual((totais['importados'], totais['erros'], totais['ignorados']), (2, 1, 0))
+        self.assertEqual(progresso, [(2, 3), (3, 3)])
+        
+        with database.get_db_connection(self.db_path) as conn:
+            chamado = conn.execute("""
+                SELECT cl.nome, cl.contato, p.nome, c.status, c.data_hora, c.tempo_atendimento
+                FROM chamado c
+                JOIN cliente cl ON c.id_cliente = cl.id_cliente
+                JOIN plantonista p ON c.id_plantonista = p.id_plantonista
+                WHERE c.numero_rac = 'RAC0142'
+            """).fetchone()
+            self.assertEqual(tuple(chamado), ('Dias Branco - FFT - Fabrica Fortaleza', 'Marcos', 'Paulo Leal',
+                                              'Resolvido', '2024-04-05 07:30:00', 120))
+        resultados = ConsultaHistorica(self.db_path).buscar_por_texto('supervisório')
+        self.assertEqual(sorted(r['numero_rac'] for r in resultados), ['RAC0142', 'RAC0143'])
+        
+        # Nova execução: só o arquivo com erro é lido de novo
+        totais = ingestao.ingerir(ingestao_pdf.listar_pdfs(pasta))
+        self.assertEqual((totais['importados'], totais['erros'], totais['ignorados']), (0, 1, 2))
+        with database.get_db_connection(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM chamado WHERE numero_rac IN ('RAC0142', 'RAC0143')").fetchone()[0], 2)
+            self.assertEqual(conn.execute("SELECT erro FROM ingestao_pdf WHERE status = 'erro'").fetchone()[0],
+                             'arquivo não é um PDF')
+    
+    def test_importacao_conversa_whatsapp(self):
+        """Testa a importação em fluxo de uma conversa exportada do WhatsApp, com modo incremental"""
+        exportacao_inicial = [
+            "05/04/2024 07:30 - Caio criou o grupo \"Plantão\"",
+            "05/04/2024 07:30 - Caio: Novo chamado",
+            "05/04/2024 07:30 - +55 11 97712-3444: Novo chamado",
+            "05/04/2024 07:31 - Caio: Empresa Teste",
+            "05/04/2024 07:31 - +55 11 97712-3444: Cliente do Aurélio",
+            "05/04/2024 07:32 - Caio: Marcos",
+            "05/04/2024 07:32 - Caio: SUP",
+            "05/04/2024 07:33 - Caio: Sistema supervisório fora do ar",
+            "05/04/2024 07:33 - Caio: alta",
+            "05/04/2024 07:40 - Caio: Servidor reiniciado pelo CIT.",
+            "Operação normalizada.",
+            "05/04/2024 07:41 - Caio: sim",
+            "05/04/2024 07:42 - Caio: bom dia a todos",
+        ]
+        continuacao = [
+            "05/04/2024 07:50 - +55 11 97712-3444: Ana",
+            "05/04/2024 07:50 - +55 11 97712-3444: XYZ",
+            "05/04/2024 07:51 - +55 11 97712-3444: Impressora sem rede",
+            "05/04/2024 07:51 - +55 11 97712-3444: Baixa",
+            "05/04/2024 07:52 - +55 11 97712-3444: Cabo de rede trocado",
+            "05/04/2024 07:52 - +55 11 97712-3444: sim",
+        ]
+        
+        importador = importacao_whatsapp.ImportadorConversas(self.db_path, tamanho_lote=1)
+        totais = importador.importar(io.StringIO("\n".join(exportacao_inicial)), 'plantao')
+        self.assertEqual((totais['mensagens'], totais['importados'], totais['em_andamento']), (11, 1, 1))
+        
+        with database.get_db_connection(self.db_path) as conn:
+            chamado = conn.execute("""
+                SELECT cl.nome, p.nome, c.prioridade, c.descricao, c.analise, c.data_hora, c.status
+                FROM chamado c
+                JOIN cliente cl ON c.id_cliente = cl.id_cliente
+                JOIN plantonista p ON c.id_plantonista = p.id_plantonista
+                ORDER BY c.id_chamado DESC LIMIT 1
+            """).fetchone()
+            self.assertEqual(tuple(chamado), ('Empresa Teste', 'Caio', 'Alta', 'Sistema supervisório fora do ar',
+                                              'Servidor reiniciado pelo CIT.\nOperação normalizada.',
+                                              '2024-04-05 07:41:00', 'Resolvido'))
+        
+        # Nova exportação (a anterior mais as mensagens seguintes): só as novas são lidas
+        # e o formulário deixado em andamento é concluído
+        totais = importador.importar(io.StringIO("\n".join(exportacao_inicial + continuacao)), 'plantao')
+        self.assertEqual((totais['puladas'], totais['mensagens'], totais['importados']), (11, 6, 1))
+        with database.get_db_connection(self.db_path) as conn:
+            chamado = conn.execute("""
+                SELECT cl.nome, cl.contato, p.nome, c.id_projeto, c.observacoes
+                FROM chamado c
+                JOIN cliente cl ON c.id_cliente = cl.id_cliente
+                JOIN plantonista p ON c.id_plantonista = p.id_plantonista
+                ORDER BY c.id_chamado DESC LIMIT 1
+            """).fetchone()
+            self.assertEqual(tuple(chamado)[:4], ('Cliente do Aurélio', 'Ana', 'Aurélio', None))
+            self.assertIn('projeto informado: XYZ', chamado['observacoes'])
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM chamado").fetchone()[0], 3)
+        
+        totais = importador.importar(io.StringIO("\n".join(exportacao_inicial + continuacao)), 'plantao')
+        self.assertEqual((totais['puladas'], totais['importados']), (17, 0))
+        
+        # Exportação que começa no meio do minuto da última mensagem (a ordem no
+        # minuto muda): a última é reconhecida pelo hash e a seguinte não é pulada
+        truncada = [
+            "05/04/2024 07:52 - +55 11 97712-3444: sim",
+            "05/04/2024 07:52 - Caio: Novo chamado",
+            "05/04/2024 07:53 - Caio: Empresa Teste",
+        ]
+        totais = importador.importar(io.StringIO("\n".join(truncada)), 'plantao')
+        self.assertEqual((totais['puladas'], totais['mensagens'], totais['em_andamento']), (1, 2, 1))
+    
+    def test_cache_consultas(self):
+        """Testa o cache das respostas de consulta ao histórico via WhatsApp"""
+        cache = cache_consultas.CacheRespostas()
+        consulta = ConsultaHistorica(self.db_path, cache=cache)
+
+        # Comando e termo normalizados: a repetição sai do cache
+        resposta = consulta.processar_consulta_whatsapp('consultar servidor')
+        self.assertIn('RAC0001', resposta)
+        self.assertEqual(consulta.processar_consulta_whatsapp('Consultar   servidor '), resposta)
+        self.assertEqual(cache.estatisticas()['acertos'], 1)
+        self.assertEqual(cache.estatisticas()['falhas'], 1)
+        self.assertIn('Para consultar o histórico', consulta.processar_consulta_whatsapp('ajuda'))
+        self.assertEqual(cache.estatisticas()['falhas'], 1)
+
+        # Escritas que não mudam o histórico não invalidam
+        self.conn.execute("INSERT INTO plantonista (nome) VALUES ('Outro Plantonista')")
+        self.conn.execute("UPDATE cliente SET telefone = '(11) 90000-0000'")
+        self.conn.commit()
+        consulta.processar_consulta_whatsapp('cliente Empresa Teste')
+        consulta.processar_consulta_whatsapp('cliente Empresa Teste')
+        self.assertEqual(cache.estatisticas()['acertos'], 2)
+
+        # Novo chamado e alteração de cliente invalidam as respostas
+        self.conn.execute("""
+            INSERT INTO chamado (id_cliente, id_plantonista, id_categoria, data_hora, tipo,
+                                 prioridade, descricao, solucao, status)
+            VALUES (1, 1, 1, '2024-01-02 10:00:00', 'Suporte Técnico', 'Alta',
+                    'Servidor de arquivos lento', 'Disco substituído', 'Resolvido')
+        """)
+        self.conn.commit()
+        resposta = consulta.processar_consulta_whatsapp('consultar servidor')
+        self.assertIn('2. ', resposta)
+
+        self.conn.execute("UPDATE cliente SET nome = 'Empresa Renomeada'")
+        self.conn.commit()
+        self.assertIn('Não encontrei', consulta.processar_consulta_whatsapp('cliente Empresa Teste'))
+        self.assertIn('Empresa Renomeada', consulta.processar_consulta_whatsapp('consultar servidor'))
+        self.assertEqual(cache.estatisticas()['acertos'], 2)
+
+        # Validade e limite de itens
+        cache = cache_consultas.CacheRespostas(ttl=0, max_itens=2)
+        cache.guardar('a', 1, 'resposta')
+        time.sleep(0.01)
+        self.assertIsNone(cache.obter('a', 1))
+        cache.ttl = 60
+        for chave in 'abc':
+            cache.guardar(chave, 1, chave)
+        self.assertIsNone(cache.obter('a', 1))
+        self.assertEqual(cache.obter('c', 1), 'c')
+        self.assertIsNone(cache.obter('c', 2))
+        self.assertEqual(cache.estatisticas()['itens'], 1)
+
+        # Contadores do cache do processo expostos pelo bot
+        with unittest.mock.patch.object(whatsapp_bot_fixed, 'DB_PATH', self.db_path):
+            bot = whatsapp_bot_fixed.WhatsAppIntegration(EstadoSQLite(self.db_path))
+            for _ in range(2):
+                bot.process_message('+5585999999999', 'consultar servidor')
+            estatisticas = whatsapp_bot_fixed.app.test_client().get('/api/busca/cache').get_json()
+        self.assertEqual((estatisticas['acertos'], estatisticas['falhas'], estatisticas['itens']), (1, 1, 1))
+        self.assertEqual(estatisticas['taxa_acerto'], 0.5)
+
+    def test_continuacao_consulta_whatsapp(self):
+        """Testa a continuação "mais" das consultas ao histórico via WhatsApp"""
+        self.conn.executemany("""
+            INSERT INTO chamado (id_cliente, id_plantonista, id_categoria, id_projeto, data_hora,
+                                 tipo, prioridade, descricao, solucao, status)
+            VALUES (1, 1, 1, (SELECT id_projeto FROM projeto WHERE sigla = 'TST'), ?,
+                    'Suporte Técnico', 'Alta', ?, 'Servidor reiniciado', 'Resolvido')
+        """, [(f'2024-01-{dia:02d} 10:00:00', f'Servidor parado {dia} ' + 'x' * 500) for dia in range(1, 12)])
+        self.conn.commit()
+        consulta = ConsultaHistorica(self.db_path, cache=cache_consultas.CacheRespostas())
+
+        # Textos longos chegam truncados do banco
+        resultados = consulta.buscar_por_projeto('TST')
+        self.assertEqual(len(resultados), 12)
+        self.assertTrue(all(len(r['descricao']) <= 100 for r in resultados))
+
+        # Páginas de 5, continuando a numeração, até o fim dos 12 chamados
+        for comando in ('projeto TST', 'consultar servidor', 'cliente Empresa'):
+            respostas = [consulta.processar_consulta_whatsapp(comando, '5511999990001')]
+            while "Envie 'mais'" in respostas[-1]:
+                respostas.append(consulta.processar_consulta_whatsapp('mais', '5511999990001'))
+            self.assertEqual(len(respostas), 3)
+            self.assertIn('1. ', respostas[0])
+            self.assertIn('6. ', respostas[1])
+            self.assertIn('12. ', respostas[2])
+            texto = ''.join(respostas)
+            racs = set(re.findall(r'RAC\d+', texto))
+            self.assertEqual(len(racs), 12, comando)
+            self.assertIn('Não há mais resultados', consulta.processar_consulta_whatsapp('mais', '5511999990001'))
+
+        # O cursor é de cada remetente
+        consulta.processar_consulta_whatsapp('projeto TST', '5511999990001')
+        self.assertIn('Não há mais resultados', consulta.processar_consulta_whatsapp('mais', '5511999990002'))
+        self.assertIn('6. ', consulta.processar_consulta_whatsapp('mais', '5511999990001'))
+        # O cursor fica no banco: outro processo (ou um reinício) continua a consulta
+        consulta.processar_consulta_whatsapp('projeto TST', '5511999990003')
+        outra = ConsultaHistorica(self.db_path, cache=cache_consultas.CacheRespostas())
+        self.assertIn('6. ', outra.processar_consulta_whatsapp('mais', '5511999990003'))
+        
+        # Na busca por texto o cursor é só (relevância, id) do último exibido
+        consulta.processar_consulta_whatsapp('consultar servidor', '5511999990001')
+        self.assertEqual(len(consulta.cursores.obter('5511999990001')[1]['cursor']), 2)
+
+        # Sem remetente não há continuação
+        self.assertIn('Refine sua busca', consulta.processar_consulta_whatsapp('projeto TST'))
+        self.assertIn('só está disponível', consulta.processar_consulta_whatsapp('mais'))
+
+        # Novos chamados não repetem nem pulam os já exibidos na continuação por data
+        # (na busca por texto a relevância de todos muda e a ordem pode se deslocar)
+        for comando, total in (('projeto TST', 12),):
+            primeira = consulta.processar_consulta_whatsapp(comando, '5511999990001')
+            self.conn.execute("""
+                INSERT INTO chamado (id_cliente, id_plantonista, id_categoria, id_projeto, data_hora,
+                                     tipo, prioridade, descricao, status)
+                VALUES (1, 1, 1, (SELECT id_projeto FROM projeto WHERE sigla = 'TST'), '2030-01-01 10:00:00',
+                        'Suporte Técnico', 'Alta', ?, 'Aberto')
+            """, (f'Servidor servidor novo {total}',))
+            self.conn.commit()
+            novos = {linha[0] for linha in self.conn.execute(
+                "SELECT numero_rac FROM chamado WHERE descricao = ?", (f'Servidor servidor novo {total}',))}
+            continuacao = consulta.processar_consulta_whatsapp('mais', '5511999990001') + \
+                consulta.processar_consulta_whatsapp('mais', '5511999990001')
+            self.assertFalse(novos & set(re.findall(r'RAC\d+', primeira + continuacao)), comando)
+            self.assertEqual(len(set(re.findall(r'RAC\d+', primeira + continuacao))), total, comando)
+            self.assertIn(f'{total}. ', continuacao)
+
+    def test_webhook_fila_por_remetente(self):
+        """Testa o webhook com resposta imediata e processamento em ordem por remetente"""
+        processadas = {}
+        simultaneas = [0, 0]
+        lock = threading.Lock()
+        liberar = threading.Event()
+        
+        def processar(remetente, mensagem):
+            liberar.wait()
+            with lock:
+                simultaneas[0] += 1
+                simultaneas[1] = max(simultaneas)
+            time.sleep(0.001)
+            with lock:
+                simultaneas[0] -= 1
+                processadas.setdefault(remetente, []).append(mensagem)
+        
+        fila = FilaPorRemetente(processar, workers=4, max_pendentes=100, lote=3)
+        self.addCleanup(fila.fechar)
+        
+        with unittest.mock.patch.object(whatsapp_bot_fixed, '_fila', fila):
+            cliente = whatsapp_bot_fixed.app.test_client()
+            for numero in range(10):
+                for remetente in ('5585911111111', '5585922222222', '5585933333333'):
+                    resposta = cliente.post('/webhook', json={
+                        'object': 'whatsapp_business_account',
+                        'entry': [{'changes': [{'value': {'messages': [{
+                            'from': remetente, 'id': f'wamid.{remetente}.{numero}',
+                            'type': 'text', 'text': {'body': str(numero)}
+                        }]}}]}]
+                    })
+                    self.assertEqual(resposta.get_json(), {'success': True, 'enfileiradas': 1})
+            
+            # Nada foi processado ainda: o webhook só enfileira
+            self.assertEqual(fila.pendentes, 30)
+            self.assertEqual(cliente.post('/webhook', json={'entry': []}).status_code, 400)
+            
+            # Reenvio do provedor (mesmo id) é ignorado
+            self.assertFalse(fila.enfileirar('5585911111111', '0', 'wamid.5585911111111.0'))
+            
+            # Com o segredo configurado, a assinatura é obrigatória
+            with unittest.mock.patch.dict(whatsapp_bot_fixed.WEBHOOK_CONFIG, app_secret='segredo'):
+                corpo = json.dumps({'object': 'whatsapp_business_account', 'entry': []}).encode('utf-8')
+                assinatura = 'sha256=' + hmac.new(b'segredo', corpo, hashlib.sha256).hexdigest()
+                self.assertEqual(cliente.post('/webhook', data=corpo, content_type='application/json').status_code, 401)
+                self.assertEqual(cliente.post('/webhook', data=corpo, content_type='application/json',
+                                              headers={'X-Hub-Signature-256': assinatura}).status_code, 200)
+        
+        liberar.set()
+        self.assertTrue(fila.aguardar(timeout=10))
+        
+        # Cada remetente em ordem, remetentes diferentes em paralelo
+        self.assertEqual(processadas, {remetente: [str(numero) for numero in range(10)] for remetente in processadas})
+        self.assertEqual(len(processadas), 3)
+        self.assertGreater(simultaneas[1], 1)
+        
+        # Fila cheia recusa sem registrar o id (o reenvio será aceito)
+        liberar.clear()
+        fila.max_pendentes = 1
+        fila.enfileirar('5585944444444', 'a', 'wamid.a')
+        with self.assertRaises(queue.Full):
+            fila.enfileirar('5585944444444', 'b', 'wamid.b')
+        liberar.set()
+        fila.aguardar(timeout=10)
+        self.assertTrue(fila.enfileirar('5585944444444', 'b', 'wamid.b'))
+
+        # Primeiras requisições simultâneas criam uma única fila
+        def criar_fila(*args, **kwargs):
+            time.sleep(0.05)
+            return object()
+
+        with unittest.mock.patch.object(whatsapp_bot_fixed, '_fila', None), \
+                unittest.mock.patch.object(whatsapp_bot_fixed, '_whatsapp', None), \
+                unittest.mock.patch.object(whatsapp_bot_fixed, 'FilaPorRemetente', side_effect=criar_fila) as construtor:
+            filas = []
+            threads = [threading.Thread(target=lambda: filas.append(whatsapp_bot_fixed.obter_fila())) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(construtor.call_count, 1)
+            self.assertEqual(len({id(f) for f in filas}), 1)
+
     def test_integracao_completa(self):
         """Testa o fluxo completo do sistema"""
         # Este teste simula o fluxo completo de um chamado:
@@ -139,19 +1306,19 @@ class TestSistemaChamados(unittest.TestCase):
             cursor.execute("""
                 INSERT INTO relatorio (id_chamado, caminho_pdf, data_geracao)
                 VALUES (?, ?, CURRENT_TIMESTAMP)
-            """, ('RAC0001', pdf_path))
+            """, (1, pdf_path))
             conn.commit()
             conn.close()
             
             # Verifica se o relatório foi registrado
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM relatorio WHERE id_chamado = ?", ('RAC0001',))
+            cursor.execute("SELECT * FROM relatorio WHERE id_chamado = ?", (1,))
             relatorio = cursor.fetchone()
             conn.close()
             
             self.assertIsNotNone(relatorio)
-            self.assertEqual(relatorio[1], 'RAC0001')  # id_chamado
+            self.assertEqual(relatorio[1], 1)  # id_chamado
             
             # Testa a consulta histórica após o fluxo completo
             consulta = ConsultaHistorica(db_path=self.db_path)
@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+import threading
+import database
+import whatsapp_bot_fixed
+from fila_mensagens import FilaPorRemetente
+
+# Uso: python teste_carga_webhook.py [conversas] [threads_do_pool] [clientes_http]
+# Reproduz conversas completas de registro de chamado contra o webhook (em um
+# banco temporário): mede o tempo de resposta do webhook e a vazão do
+# processamento e confere se cada conversa recebeu as respostas na ordem certa
+# e terminou com o chamado registrado
+
+MENSAGENS = ['Novo chamado', 'Empresa {n}', 'Solicitante {n}', 'SUP', 'Motivo da solicitação {n}',
+             'Alta', 'Diagnóstico e solução do chamado {n}', 'sim']
+
+# Início esperado de cada resposta do bot, na ordem das mensagens
+RESPOSTAS = ['Por favor, informe o nome do cliente', 'Informe o nome do solicitante', 'Informe a sigla',
+             'Descreva o motivo', 'Qual a prioridade', 'Informe o diagnóstico', '*Resumo do Chamado:*',
+             'Chamado registrado com sucesso']
+
+def payload(remetente, texto, id_mensagem):
+    """Evento do webhook no formato da WhatsApp Cloud API com uma mensagem de texto"""
+    return {
+        'object': 'whatsapp_business_account',
+        'entry': [{'changes': [{'value': {'messages': [
+            {'from': remetente, 'id': id_mensagem, 'type': 'text', 'text': {'body': texto}}
+        ]}}]}]
+    }
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[int(p * (len(valores) - 1))]
+
+def executar(conversas, workers, clientes):
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(temp_dir, 'carga.db')
+        conn = sqlite3.connect(db_path)
+        database.aplicar_schemas(conn)
+        conn.close()
+
+        # Bot apontando para o banco temporário, com as respostas registradas em memória
+        respostas = {}
+        lock = threading.Lock()
+        def coletar(remetente, texto):
+            with lock:
+                respostas.setdefault(remetente, []).append(texto.strip())
+
+        whatsapp_bot_fixed.DB_PATH = db_path
+        whatsapp_bot_fixed.responder = coletar
+        whatsapp_bot_fixed._whatsapp = whatsapp_bot_fixed.WhatsAppIntegration()
+        whatsapp_bot_fixed._fila = FilaPorRemetente(whatsapp_bot_fixed.processar_mensagem, workers=workers,
+                                                   max_pendentes=conversas * len(MENSAGENS))
+
+        remetentes = [f"55859{n:08d}" for n in range(conversas)]
+        latencias = []
+
+        def enviar(parte):
+            # Cada cliente HTTP envia as conversas de seus remetentes intercaladas, passo a passo
+            cliente = whatsapp_bot_fixed.app.test_client()
+            minhas = []
+            for passo, mensagem in enumerate(MENSAGENS):
+                for remetente in parte:
+                    inicio = time.perf_counter()
+                    resposta = cliente.post('/webhook', json=payload(
+                        remetente, mensagem.format(n=remetente), f"wamid.{remetente}.{passo}"))
+                    minhas.append(time.perf_counter() - inicio)
+                    assert resposta.status_code == 200, resposta.get_json()
+            with lock:
+                latencias.extend(minhas)
+
+        inicio = time.perf_counter()
+        threads = [threading.Thread(target=enviar, args=(remetentes[i::clientes],)) for i in range(clientes)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        recebimento = time.perf_counter() - inicio
+        whatsapp_bot_fixed._fila.aguardar()
+        total = time.perf_counter() - inicio
+        whatsapp_bot_fixed._fila.fechar()
+
+        # Conferência: respostas na ordem das mensagens e um chamado por conversa
+        fora_de_ordem = [
+            remetente for remetente in remetentes
+            if len(respostas.get(remetente, [])) != len(RESPOSTAS)
+            or not all(texto.startswith(esperado) for texto, esperado in zip(respostas[remetente], RESPOSTAS))
+        ]
+        with database.get_db_connection(db_path) as conn:
+            chamados = conn.execute("SELECT COUNT(*) FROM chamado").fetchone()[0]
+        database.close_all_pools()
+
+        mensagens = conversas * len(MENSAGENS)
+        print(f"Conversas: {conversas} ({mensagens} mensagens), {workers} threads, {clientes} clientes HTTP")
+        print(f"Webhook: {mensagens / recebimento:.0f} requisições/s; resposta p50 "
+              f"{percentil(latencias, 0.5) * 1000:.2f} ms, p95 {percentil(latencias, 0.95) * 1000:.2f} ms, "
+              f"máx {max(latencias) * 1000:.2f} ms")
+        print(f"Processamento completo em {total:.2f}s ({mensagens / total:.0f} mensagens/s)")
+        print(f"Chamados registrados: {chamados}; conversas com respostas fora de ordem: {len(fora_de_ordem)}")
+        return chamados == conversas and not fora_de_ordem
+    finally:
+        shutil.rmtree(temp_dir)
+
+if __name__ == "__main__":
+    conversas = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    clientes = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    sys.exit(0 if executar(conversas, workers, clientes) else 1)
@@ -1,61 +1,91 @@
 import os
+import sys
+import hmac
+import queue
+import threading
+import hashlib
 from flask import Flask, request, jsonify, render_template
 import sqlite3
+import database
+import numeracao
+import cadastros
+import cache_consultas
+from estado_conversa import EstadoSQLite
+from consulta_historica import ConsultaHistorica, e_consulta
+from fila_mensagens import FilaPorRemetente
+from cliente_whatsapp import ClienteWhatsApp
 import datetime
 import json
 from werkzeug.utils import secure_filename
 
+# Caminho do banco de dados
+DB_PATH = 'chamados.db'
+
+# Webhook do WhatsApp: token da verificação da assinatura do webhook (GET), segredo
+# do aplicativo para conferir o cabeçalho X-Hub-Signature-256 (None desativa) e
+# threads que processam as mensagens recebidas
+WEBHOOK_CONFIG = {
+    'verify_token': 'seu_token_de_verificacao',
+    'app_secret': None,
+    'workers': 8,
+    'max_pendentes': 10000
+}
+
+# Gateway para as respostas do bot; sem api_token as respostas são apenas exibidas
+WHATSAPP_CONFIG = {
+    'api_url': 'https://graph.facebook.com/v19.0/seu_phone_number_id',
+    'api_token': None
+}
+
+app = Flask(__name__)
+
+# Campos do formulário "Novo chamado", na ordem em que são pedidos, e a
+# pergunta que pede cada um (depois do diagnóstico vem a confirmação)
+CAMPOS_FORMULARIO = ['cliente', 'solicitante', 'projeto', 'motivo', 'prioridade', 'diagnostico']
+PERGUNTAS = {
+    'cliente': "Por favor, informe o nome do cliente:",
+    'solicitante': "Informe o nome do solicitante:",
+    'projeto': "Informe a sigla do projeto (ex: SUP, DEV, INFRA):",
+    'motivo': "Descreva o motivo da solicitação:",
+    'prioridade': "Qual a prioridade? (Baixa, Média, Alta, Crítica):",
+    'diagnostico': "Informe o diagnóstico e solução aplicada:"
+}
+
 # Classe para simular integração com WhatsApp
 class WhatsAppIntegration:
-    def __init__(self):
-        self.conversation_state = {}
-        self.current_form = {}
+    def __init__(self, estado=None, consulta=None):
+        # Conversas em andamento (passo do formulário e dados por remetente),
+        # no banco por padrão para sobreviver a reinícios e servir a vários processos
+        self.estado = estado if estado is not None else EstadoSQLite(DB_PATH)
+        # Consultas ao histórico ("consultar", "cliente", ..., "mais"), uma para todos os remetentes
+        self.consulta = consulta if consulta is not None else ConsultaHistorica(DB_PATH)
     
     def process_message(self, sender, message):
         """Processa mensagens recebidas do WhatsApp"""
         # Verifica se é um novo chamado
         if message.lower() == "novo chamado":
             # Inicia um novo formulário
-            self.conversation_state[sender] = "cliente"
-            self.current_form[sender] = {}
-            return "Por favor, informe o nome do cliente:"
+            self.estado.salvar(sender, CAMPOS_FORMULARIO[0], {})
+            return PERGUNTAS[CAMPOS_FORMULARIO[0]]
         
         # Se já existe uma conversa em andamento
-        if sender in self.conversation_state:
-            current_state = self.conversation_state[sender]
-            
-            # Processa a resposta de acordo com o estado atual
-            if current_state == "cliente":
-                self.current_form[sender]['cliente'] = message
-                self.conversation_state[sender] = "solicitante"
-                return "Informe o nome do solicitante:"
+        conversa = self.estado.obter(sender)
+        if conversa is not None:
+            current_state, form = conversa
             
-            elif current_state == "solicitante":
-                self.current_form[sender]['solicitante'] = message
-                self.conversation_state[sender] = "projeto"
-                return "Informe a sigla do projeto (ex: SUP, DEV, INFRA):"
-            
-            elif current_state == "projeto":
-                self.current_form[sender]['projeto'] = message
-                self.conversation_state[sender] = "motivo"
-                return "Descreva o motivo da solicitação:"
-            
-            elif current_state == "motivo":
-                self.current_form[sender]['motivo'] = message
-                self.conversation_state[sender] = "prioridade"
-                return "Qual a prioridade? (Baixa, Média, Alta, Crítica):"
-            
-            elif current_state == "prioridade":
-                self.current_form[sender]['prioridade'] = message
-                self.conversation_state[sender] = "diagnostico"
-                return "Informe o diagnóstico e solução aplicada:"
+            # Processa a resposta de acordo com o estado atual: cada campo
+            # (exceto o último) guarda a resposta e pede o seguinte
+            if current_state in CAMPOS_FORMULARIO[:-1]:
+                form[current_state] = message
+                proximo = CAMPOS_FORMULARIO[CAMPOS_FORMULARIO.index(current_state) + 1]
+                self.estado.salvar(sender, proximo, form)
+                return PERGUNTAS[proximo]
             
             elif current_state == "diagnostico":
-                self.current_form[sender]['diagnostico'] = message
-                self.conversation_state[sender] = "confirmar"
+                form['diagnostico'] = message
+                self.estado.salvar(sender, "confirmar", form)
                 
                 # Prepara resumo para confirmação
-                form = self.current_form[sender]
                 resumo = f"""
                 *Resumo do Chamado:*
                 
@@ -73,126 +103,192 @@ class WhatsAppIntegration:
             elif current_state == "confirmar":
                 if message.lower() == "sim":
                     # Finaliza o chamado e salva no banco de dados
-                    chamado = self.current_form[sender]
-                    chamado_id = self.salvar_chamado(chamado)
+                    chamado_id = self.salvar_chamado(form)
                     
                     # Limpa o estado da conversa
-                    del self.conversation_state[sender]
-                    del self.current_form[sender]
+                    self.estado.remover(sender)
                     
                     return f"Chamado registrado com sucesso! ID: {chamado_id}\nO relatório será gerado e enviado automaticamente."
                 
                 elif message.lower() == "não":
                     # Reinicia o formulário
-                    self.conversation_state[sender] = "cliente"
-                    return "Vamos recomeçar. Por favor, informe o nome do cliente:"
+                    self.estado.salvar(sender, CAMPOS_FORMULARIO[0], form)
+                    return "Vamos recomeçar. " + PERGUNTAS[CAMPOS_FORMULARIO[0]]
                 
                 else:
                     return "Por favor, responda 'sim' para confirmar ou 'não' para corrigir."
         
+        # Consulta ao histórico (fora de um formulário, cujas respostas são texto livre)
+        if conversa is None and e_consulta(message):
+            return self.consulta.processar_consulta_whatsapp(message, sender)
+        
         # Se não há conversa em andamento e não é um comando conhecido
         return "Para iniciar um novo chamado, envie 'Novo chamado'.\nPara consultar o histórico, envie 'Consultar [termo de busca]'."
     
     def salvar_chamado(self, chamado):
         """Salva o chamado no banco de dados e retorna o ID gerado"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Verifica se o cliente já existe
-        cursor.execute("SELECT id_cliente FROM cliente WHERE nome = ?", (chamado['cliente'],))
-        cliente = cursor.fetchone()
-        
-        # Se o cliente não existir, cria um novo
-        if cliente is None:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Ids dos cadastros pelo cache (cliente e plantonista novos são criados na mesma transação)
+            cache = cadastros.obter_cache(DB_PATH)
+            id_cliente = cache.id_cliente(conn, chamado['cliente'], contato=chamado['solicitante'])
+            id_projeto = cache.id_projeto(conn, chamado['projeto'])
+            
+            # Plantonista padrão (em um sistema real, seria identificado pelo número do WhatsApp)
+            id_plantonista = cache.id_plantonista(conn, "Plantonista de Plantão")
+            
+            # Categoria padrão
+            id_categoria = cache.id_categoria(conn, "Suporte Técnico") or 1
+            
+            # Reserva o número do RAC na mesma transação do INSERT
+            rac_id = numeracao.proximo_numero_rac(conn)
+            
+            # Cria o novo chamado (o id_chamado numérico é gerado pelo SQLite)
             cursor.execute("""
-                INSERT INTO cliente (nome, contato)
-                VALUES (?, ?)
-            """, (chamado['cliente'], chamado['solicitante']))
-            id_cliente = cursor.lastrowid
-        else:
-            id_cliente = cliente[0]
-        
-        # Verifica se o projeto existe
-        cursor.execute("SELECT id_projeto FROM projeto WHERE sigla = ?", (chamado['projeto'],))
-        projeto = cursor.fetchone()
-        id_projeto = projeto[0] if projeto else None
-        
-        # Busca o ID do plantonista (usando o remetente como plantonista neste exemplo)
-        plantonista_nome = "Plantonista de Plantão"  # Em um sistema real, seria identificado pelo número do WhatsApp
-        cursor.execute("SELECT id_plantonista FROM plantonista WHERE nome = ?", (plantonista_nome,))
-        plantonista = cursor.fetchone()
-        
-        # Se o plantonista não existir, cria um novo
-        if plantonista is None:
+                INSERT INTO chamado (
+                    numero_rac, id_cliente, id_plantonista, id_categoria, id_projeto,
+                    prioridade, descricao, analise, status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                rac_id,
+                id_cliente, 
+                id_plantonista, 
+                id_categoria,
+                id_projeto,
+                chamado.get('prioridade', 'Média'),
+                chamado['motivo'],
+                chamado['diagnostico'],
+                'Resolvido'  # Assumindo que o chamado já está resolvido quando registrado
+            ))
+            
+            # Obtém o ID gerado automaticamente
+            id_gerado = cursor.lastrowid
+            
+            # Insere na tabela de relatório para rastrear o RAC ID
             cursor.execute("""
-                INSERT INTO plantonista (nome)
-                VALUES (?)
-            """, (plantonista_nome,))
-            id_plantonista = cursor.lastrowid
-        else:
-            id_plantonista = plantonista[0]
-        
-        # Busca o ID da categoria (usando categoria padrão)
-        cursor.execute("SELECT id_categoria FROM categoria WHERE nome = ?", ("Suporte Técnico",))
-        categoria = cursor.fetchone()
-        id_categoria = categoria[0] if categoria else 1
-        
-        # Gera o ID do chamado no formato RAC####
-        rac_id = gerar_id_chamado()
-        
-        # Cria o novo chamado
-        cursor.execute("""
-            INSERT INTO chamado (
-                id_chamado, id_cliente, id_plantonista, id_categoria, id_projeto,
-                prioridade, descricao, analise, status
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            cursor.lastrowid,  # Deixa o SQLite gerar o ID numérico automaticamente
-            id_cliente, 
-            id_plantonista, 
-            id_categoria,
-            id_projeto,
-            chamado.get('prioridade', 'Média'),
-            chamado['motivo'],
-            chamado['diagnostico'],
-            'Resolvido'  # Assumindo que o chamado já está resolvido quando registrado
-        ))
-        
-        # Obtém o ID gerado automaticamente
-        id_gerado = cursor.lastrowid
-        
-        # Insere na tabela de relatório para rastrear o RAC ID
-        cursor.execute("""
-            INSERT INTO relatorio (id_chamado, caminho_pdf)
-            VALUES (?, ?)
-        """, (id_gerado, f"relatorios/{rac_id}.pdf"))
-        
-        conn.commit()
-        conn.close()
+                INSERT INTO relatorio (id_chamado, caminho_pdf)
+                VALUES (?, ?)
+            """, (id_gerado, f"relatorios/{rac_id}.pdf"))
         
         return rac_id
 
 # Funções auxiliares para o banco de dados
 def get_db_connection():
-    """Cria uma conexão com o banco de dados"""
-    conn = sqlite3.connect('chamados.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Obtém a conexão compartilhada da thread (usar com `with`)"""
+    return database.get_db_connection(DB_PATH)
+
+# Webhook do WhatsApp
+def assinatura_valida(corpo, assinatura, segredo):
+    """Confere o cabeçalho X-Hub-Signature-256 (HMAC-SHA256 do corpo com o segredo do aplicativo)"""
+    esperada = 'sha256=' + hmac.new(segredo.encode('utf-8'), corpo, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(esperada, assinatura or '')
 
-def gerar_id_chamado():
-    """Gera um ID único para o chamado no formato RAC+número sequencial"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def extrair_mensagens(payload):
+    """Extrai (remetente, texto, id) das mensagens de texto de um payload do webhook
+
+    Lança ValueError se o payload não tiver o formato da WhatsApp Cloud API.
+    Notificações sem mensagens de texto (status de entrega, mídia) são ignoradas.
+    """
+    if not isinstance(payload, dict) or payload.get('object') != 'whatsapp_business_account':
+        raise ValueError('Payload não é um evento do WhatsApp Business')
     
-    # Conta o número total de chamados para gerar o próximo número
-    cursor.execute("SELECT COUNT(*) FROM chamado")
-    count = cursor.fetchone()[0]
+    mensagens = []
+    try:
+        for entrada in payload.get('entry', []):
+            for mudanca in entrada.get('changes', []):
+                for mensagem in mudanca.get('value', {}).get('messages', []):
+                    if mensagem.get('type') != 'text':
+                        continue
+                    mensagens.append((str(mensagem['from']), str(mensagem['text']['body']), mensagem.get('id')))
+    except (AttributeError, KeyError, TypeError):
+        raise ValueError('Payload do webhook mal formado')
+    return mensagens
+
+_whatsapp = None
+_fila = None
+_cliente_whatsapp = None
+
+# Criação única da fila e do cliente do gateway, mesmo com requisições simultâneas
+_inicializacao_lock = threading.Lock()
+
+def obter_cliente_whatsapp():
+    """Cliente do gateway, criado no primeiro envio"""
+    global _cliente_whatsapp
+    if _cliente_whatsapp is None:
+        with _inicializacao_lock:
+            if _cliente_whatsapp is None:
+                _cliente_whatsapp = ClienteWhatsApp(WHATSAPP_CONFIG, conexoes=WEBHOOK_CONFIG['workers'])
+    return _cliente_whatsapp
+
+def responder(remetente, texto):
+    """Envia a resposta do bot ao remetente pelo gateway (ou a exibe, sem api_token)"""
+    if not WHATSAPP_CONFIG.get('api_token'):
+        print(f"[Bot -> {remetente}] {texto.strip()}")
+        return
+    obter_cliente_whatsapp().enviar_texto(remetente, texto)
+
+def processar_mensagem(remetente, texto):
+    """Executado pelas threads da fila: conduz a conversa e envia a resposta"""
+    responder(remetente, _whatsapp.process_message(remetente, texto))
+
+def obter_fila():
+    """Fila de mensagens do webhook, criada na primeira requisição
+
+    Uma única fila por processo: com duas, mensagens do mesmo remetente
+    poderiam ser processadas fora de ordem.
+    """
+    global _whatsapp, _fila
+    if _fila is None:
+        with _inicializacao_lock:
+            if _fila is None:
+                _whatsapp = WhatsAppIntegration()
+                _fila = FilaPorRemetente(processar_mensagem, workers=WEBHOOK_CONFIG['workers'],
+                                         max_pendentes=WEBHOOK_CONFIG['max_pendentes'])
+    return _fila
+
+@app.route('/webhook', methods=['GET'])
+def verificar_webhook():
+    """Verificação do webhook pelo provedor (hub.challenge)"""
+    if (request.args.get('hub.mode') == 'subscribe'
+            and request.args.get('hub.verify_token') == WEBHOOK_CONFIG['verify_token']):
+        return request.args.get('hub.challenge', ''), 200
+    return jsonify({'success': False, 'message': 'Token de verificação inválido'}), 403
+
+@app.route('/webhook', methods=['POST'])
+def receber_webhook():
+    """Recebe mensagens do WhatsApp: valida, enfileira e responde imediatamente
+
+    O processamento (conversa, gravação do chamado e resposta ao plantonista)
+    acontece depois, nas threads da fila, em ordem para cada remetente.
+    """
+    segredo = WEBHOOK_CONFIG.get('app_secret')
+    if segredo and not assinatura_valida(request.get_data(), request.headers.get('X-Hub-Signature-256'), segredo):
+        return jsonify({'success': False, 'message': 'Assinatura inválida'}), 401
+    
+    try:
+        mensagens = extrair_mensagens(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
-    conn.close()
+    fila = obter_fila()
+    enfileiradas = 0
+    try:
+        for remetente, texto, id_mensagem in mensagens:
+            enfileiradas += fila.enfileirar(remetente, texto, id_mensagem)
+    except queue.Full:
+        # O provedor reenvia o evento mais tarde; mensagens já aceitas são ignoradas pelo id
+        return jsonify({'success': False, 'message': 'Fila de mensagens cheia'}), 503
     
-    # Gera o próximo número sequencial
-    novo_numero = count + 1
-    return f"RAC{novo_numero:04d}"
+    return jsonify({'success': True, 'enfileiradas': enfileiradas}), 200
+
+@app.route('/api/busca/cache', methods=['GET'])
+def estatisticas_cache_consultas():
+    """Acertos, falhas e tamanho do cache das consultas ao histórico deste processo"""
+    return jsonify({
+        'success': True,
+        **cache_consultas.obter_cache(DB_PATH).estatisticas()
+    })
 
 # Simulação de interação com WhatsApp
 def simular_conversa():
@@ -259,13 +355,8 @@ def init_db():
     if not os.path.exists('chamados.db'):
         conn = sqlite3.connect('chamados.db')
         
-        # Executa o schema principal
-        with open('schema.sql', 'r') as f:
-            conn.executescript(f.read())
-        
-        # Executa o schema de projetos
-        with open('schema_projeto.sql', 'r') as f:
-            conn.executescript(f.read())
+        # Executa os schemas (principal, projetos, busca textual...)
+        database.aplicar_schemas(conn)
             
         # Cria diretório para relatórios
         if not os.path.exists('relatorios'):
@@ -275,9 +366,14 @@ def init_db():
         print("Banco de dados inicializado com sucesso!")
 
 # Função principal para testar o sistema
+# Uso: python whatsapp_bot_fixed.py            (simula uma conversa)
+#      python whatsapp_bot_fixed.py webhook    (recebe o webhook do WhatsApp na porta 5002)
 if __name__ == "__main__":
     # Inicializa o banco de dados
     init_db()
     
-    # Simula uma conversa no WhatsApp
-    simular_conversa()
+    if len(sys.argv) > 1 and sys.argv[1] == 'webhook':
+        app.run(host='0.0.0.0', port=5002, threaded=True)
+    else:
+        # Simula uma conversa no WhatsApp
+        simular_conversa()